@@ -0,0 +1,230 @@
+# axis_detection.py
+"""
+Automatická detekce rámu grafu (os) a hlavních značek (ticků) pro kalibraci.
+
+Rám a značky se hledají z řádkových a sloupcových projekčních profilů
+binarizovaného obrázku (vše vektorizovaně přes NumPy). Výsledek navrhne
+obdélník pro oříznutí a převod pixel <-> data; uživatel pak jen potvrdí
+hodnoty značek, v dávkovém režimu se známé hodnoty použijí rovnou.
+"""
+import numpy as np
+
+from simple_line import binarize_image
+
+
+class AxisFrame:
+    """
+    Nalezený rám grafu.
+
+    Atributy (pixely původního obrázku):
+        left, right (int): Sloupce svislých čar rámu (osa Y a případná pravá strana).
+        top, bottom (int): Řádky vodorovných čar rámu (případná horní strana a osa X).
+        thickness (int): Tloušťka čar rámu.
+        x_ticks (ndarray): Sloupce hlavních značek na ose X.
+        y_ticks (ndarray): Řádky hlavních značek na ose Y.
+    """
+
+    def __init__(self, left, right, top, bottom, thickness, x_ticks, y_ticks):
+        self.left = left
+        self.right = right
+        self.top = top
+        self.bottom = bottom
+        self.thickness = thickness
+        self.x_ticks = x_ticks
+        self.y_ticks = y_ticks
+
+    def crop_rect(self):
+        """
+        Returns:
+            tuple: (x, y, šířka, výška) vnitřku rámu bez čar os.
+        """
+        half = self.thickness // 2 + 1
+        x0, x1 = self.left + half, self.right - half
+        y0, y1 = self.top + half, self.bottom - half
+        return x0, y0, max(1, x1 - x0 + 1), max(1, y1 - y0 + 1)
+
+    def __repr__(self):
+        return (f"AxisFrame(left={self.left}, right={self.right}, top={self.top}, bottom={self.bottom}, "
+                f"x_ticks={len(self.x_ticks)}, y_ticks={len(self.y_ticks)})")
+
+
+def _runs(indices):
+    """Rozdělí seřazené indexy na souvislé úseky. Vrací seznam (začátek, konec) včetně."""
+    if len(indices) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(indices) > 1)
+    starts = np.concatenate([[indices[0]], indices[breaks + 1]])
+    ends = np.concatenate([indices[breaks], [indices[-1]]])
+    return list(zip(starts, ends))
+
+
+def _frame_lines(profile, length, min_fraction):
+    """Vrátí středy a tloušťky úseků, kde profil pokrývá alespoň `min_fraction` délky."""
+    strong = np.flatnonzero(profile >= min_fraction * length)
+    return [((a + b) // 2, b - a + 1) for a, b in _runs(strong)]
+
+
+def _ticks(band, axis, major_ratio=0.7):
+    """
+    Najde značky v pásu kolmém na osu.
+
+    Parameters:
+        band (ndarray): Maska tmavých pixelů v pásu u osy, první index (podle `axis`) míří od osy ven.
+        axis (int): 0 – značky jsou sloupce (osa X), 1 – značky jsou řádky (osa Y).
+
+    Returns:
+        ndarray: Pozice hlavních značek (středy úseků) v rámci pásu.
+    """
+    if band.size == 0:
+        return np.array([], dtype=int)
+    # Délka značky = počet souvislých tmavých pixelů od osy ven
+    along = band if axis == 0 else band.T
+    lengths = np.argmin(np.vstack([along, np.zeros((1, along.shape[1]), dtype=bool)]), axis=0)
+    candidates = np.flatnonzero(lengths >= 2)
+    runs = _runs(candidates)
+    if not runs:
+        return np.array([], dtype=int)
+    centers = np.array([(a + b) / 2 for a, b in runs])
+    tick_len = np.array([lengths[a:b + 1].max() for a, b in runs])
+    # Příliš široké úseky nejsou značky (např. text nebo křivka u osy), stejně jako úseky přes celý pás
+    # (křivka dotýkající se osy), pokud existují i kratší
+    widths = np.array([b - a + 1 for a, b in runs])
+    keep = widths <= max(3, np.median(widths) * 2)
+    full = tick_len >= along.shape[0]
+    if (keep & ~full).any():
+        keep &= ~full
+    centers, tick_len = centers[keep], tick_len[keep]
+    if len(centers) == 0:
+        return np.array([], dtype=int)
+    major = tick_len >= major_ratio * tick_len.max()
+    return np.rint(centers[major]).astype(int)
+
+
+def _complete_corners(ticks, start, end):
+    """
+    Doplní značky, které splývají s rohy rámu.
+
+    Vnitřní značky v rozích rámu leží přímo na kolmé čáře rámu, takže je pás podél
+    osy nevidí. Jsou-li nalezené značky pravidelné a od konce osy je dělí právě jeden
+    krok, konec osy se přidá jako značka – jinak by zadané hodnoty „první/poslední“
+    patřily jiným značkám a kalibrace by byla tiše špatně.
+    """
+    if len(ticks) < 2:
+        return ticks
+    steps = np.diff(ticks)
+    step = float(np.median(steps))
+    tolerance = max(2.0, 0.05 * step)
+    if np.any(np.abs(steps - step) > tolerance):
+        return ticks
+    ticks = list(ticks)
+    if abs(ticks[0] - start - step) <= tolerance:
+        ticks.insert(0, start)
+    if abs(end - ticks[-1] - step) <= tolerance:
+        ticks.append(end)
+    return np.array(ticks, dtype=int)
+
+
+def detect_axes(img, min_fraction=0.5, tick_depth=None, binary=None):
+    """
+    Najde rám grafu a hlavní značky na osách X a Y.
+
+    Parameters:
+        img (ndarray): Obrázek (H, W, 3+).
+        min_fraction (float): Minimální podíl tmavých pixelů v řádku/sloupci, aby šlo o čáru rámu
+            (vztaženo k nejsilnějšímu řádku/sloupci).
+        tick_depth (int, optional): Hloubka pásu pro hledání značek; výchozí 2 % menšího rozměru.
+        binary (ndarray, optional): Již spočtená maska z binarize_image.
+
+    Returns:
+        AxisFrame: Nalezený rám.
+    """
+    if binary is None:
+        binary = binarize_image(img)
+    dark = ~binary
+    height, width = dark.shape
+    row_profile = dark.sum(axis=1)
+    col_profile = dark.sum(axis=0)
+
+    rows = _frame_lines(row_profile, row_profile.max(), min_fraction)
+    cols = _frame_lines(col_profile, col_profile.max(), min_fraction)
+    if not rows or not cols:
+        raise ValueError("Rám grafu (osy) nebyl nalezen.")
+
+    bottom, bottom_thick = rows[-1]
+    left, left_thick = cols[0]
+    # Horní a pravá strana rámu jsou volitelné; bez nich bereme rozsah osy
+    if len(rows) > 1 and bottom - rows[0][0] > 0.1 * height:
+        top = rows[0][0]
+    else:
+        top = int(np.flatnonzero(dark[:, left])[0])
+    if len(cols) > 1 and cols[-1][0] - left > 0.1 * width:
+        right = cols[-1][0]
+    else:
+        right = int(np.flatnonzero(dark[bottom])[-1])
+    thickness = int(max(bottom_thick, left_thick))
+
+    depth = tick_depth or max(4, int(0.02 * min(height, width)))
+    half = thickness // 2 + 1
+    # Značky osy X: pás pod osou (vnější značky), případně nad ní (vnitřní značky).
+    # Ve vnitřním pásu vynecháme čáry rámu, jinak by vypadaly jako nejdelší značky.
+    below = dark[bottom + half:bottom + half + depth, left:right + 1]
+    above = dark[max(0, bottom - half - depth + 1):bottom - half + 1, left + half:right - half + 1][::-1]
+    x_ticks = max((_ticks(below, 0) + left, _ticks(above, 0) + left + half), key=len)
+    # Značky osy Y: pás vlevo od osy, případně vpravo od ní
+    outside = dark[top:bottom + 1, max(0, left - half - depth + 1):left - half + 1][:, ::-1]
+    inside = dark[top + half:bottom - half + 1, left + half:left + half + depth]
+    y_ticks = max((_ticks(outside, 1) + top, _ticks(inside, 1) + top + half), key=len)
+    x_ticks = _complete_corners(x_ticks, left, right)
+    y_ticks = _complete_corners(y_ticks, top, bottom)
+
+    return AxisFrame(int(left), int(right), int(top), int(bottom), thickness, x_ticks, y_ticks)
+
+
+def _tick_values(values, count, axis_name):
+    """Rozšíří (první, poslední) na rovnoměrně rozložené hodnoty, nebo ověří úplný seznam."""
+    values = [float(v) for v in values]
+    if len(values) == count:
+        return np.array(values)
+    if len(values) == 2 and count >= 2:
+        return np.linspace(values[0], values[1], count)
+    raise ValueError(f"Osa {axis_name}: nalezeno {count} značek, zadáno {len(values)} hodnot.")
+
+
+def calibrate_from_ticks(frame, x_tick_values, y_tick_values):
+    """
+    Převede nalezený rám a hodnoty značek na oříznutí a meze os pro zpracování.
+
+    Parameters:
+        frame (AxisFrame): Výsledek detect_axes.
+        x_tick_values (sequence): Hodnoty značek osy X zleva doprava – všechny, nebo jen (první, poslední).
+        y_tick_values (sequence): Hodnoty značek osy Y shora dolů – všechny, nebo jen (první, poslední).
+
+    Returns:
+        dict: 'crop' (x, y, šířka, výška) a meze 'x_min', 'x_max', 'y_min', 'y_max' ve významu
+            vstupních polí Xleft/Xright/Ymin/Ymax (hodnoty na levém/pravém a dolním/horním okraji ořezu).
+    """
+    x_values = _tick_values(x_tick_values, len(frame.x_ticks), 'X')
+    y_values = _tick_values(y_tick_values, len(frame.y_ticks), 'Y')
+    # Lineární převod pixel -> data metodou nejmenších čtverců přes všechny značky
+    x_scale, x_offset = np.polyfit(frame.x_ticks, x_values, 1)
+    y_scale, y_offset = np.polyfit(frame.y_ticks, y_values, 1)
+
+    x, y, w, h = frame.crop_rect()
+    return {
+        'crop': (x, y, w, h),
+        'x_min': x_scale * x + x_offset,
+        'x_max': x_scale * (x + w) + x_offset,
+        'y_max': y_scale * y + y_offset,
+        'y_min': y_scale * (y + h) + y_offset,
+    }
+
+
+def auto_calibrate(img, x_tick_values, y_tick_values, **kwargs):
+    """
+    Dávkový režim bez interakce: detekce rámu a kalibrace se známými hodnotami značek.
+
+    Returns:
+        tuple: (AxisFrame, dict z calibrate_from_ticks)
+    """
+    frame = detect_axes(img, **kwargs)
+    return frame, calibrate_from_ticks(frame, x_tick_values, y_tick_values)
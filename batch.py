@@ -0,0 +1,153 @@
+# batch.py
+"""
+Dávkové zpracování více obrázků nebo více výřezů jednoho obrázku.
+
+Úloha (Job) nese zdroj obrázku, volitelný ořez a parametry zpracování a je
+celá picklovatelná, takže ji lze poslat do ProcessPoolExecutor. run_job běží
+v pracovním procesu a vrací jen výsledná data, ne obrázky.
+"""
+import csv
+import os
+import time
+
+from core import digitize
+from image_cache import ImageCache, load_image_array
+from pyramid import DEFAULT_MEMORY_BUDGET
+from result_cache import ResultCache
+from spectrum import Spectrum, SpectrumSet
+
+# Cache dekódovaných obrázků a výsledků sdílené úlohami jednoho procesu (soubory v nich sdílí i procesy mezi sebou)
+_IMAGE_CACHE = None
+_RESULT_CACHE = None
+
+
+class Job:
+    """
+    Jedna úloha dávkového zpracování.
+
+    Atributy:
+        name (str): Název úlohy (zobrazení, hlavička exportu).
+        path (str, optional): Cesta k obrázku; jinak se použije `image`.
+        image (ndarray, optional): Obrázek (H, W, 3) pro zdroje bez souboru (clipboard).
+        crop (tuple, optional): (x, y, šířka, výška) v pixelech obrázku.
+        limits (tuple): (x_min, x_max, y_min, y_max) jako vstupní pole Xleft/Xright/Ymin/Ymax.
+        stitch (bool): Spojit přerušenou křivku (viz stitching.py).
+        group_by (str, optional): Režim více křivek ('vertical' nebo 'color'), None = jedna křivka.
+        n_traces (int, optional): Počet křivek v režimu více křivek.
+        smoothing (tuple, optional): (metoda, okno v jednotkách osy x), viz smoothing.smooth.
+    """
+
+    def __init__(self, name, limits, path=None, image=None, crop=None, stitch=False, group_by=None, n_traces=None,
+                 smoothing=None):
+        if path is None and image is None:
+            raise ValueError("Úloha potřebuje cestu k obrázku nebo obrázek.")
+        self.name = name
+        self.limits = tuple(float(v) for v in limits)
+        self.path = path
+        self.image = image
+        self.crop = crop
+        self.stitch = stitch
+        self.group_by = group_by
+        self.n_traces = n_traces
+        self.smoothing = smoothing
+
+    def __repr__(self):
+        return f"Job({self.name!r}, crop={self.crop})"
+
+
+def _image_cache():
+    global _IMAGE_CACHE
+    if _IMAGE_CACHE is None:
+        _IMAGE_CACHE = ImageCache()
+    return _IMAGE_CACHE
+
+
+def _result_cache():
+    global _RESULT_CACHE
+    if _RESULT_CACHE is None:
+        _RESULT_CACHE = ResultCache()
+    return _RESULT_CACHE
+
+
+def load_job_image(job, cache=True):
+    """Načte obrázek úlohy (přes diskovou cache dekódovaných obrázků) a případně ho ořízne."""
+    if job.path is not None:
+        img = load_image_array(job.path, _image_cache() if cache else None)
+    else:
+        img = job.image
+    if job.crop is not None:
+        x, y, w, h = job.crop
+        img = img[y:y + h, x:x + w]
+    return img
+
+
+def run_job(job, cache=True):
+    """
+    Zpracuje jednu úlohu. Chyby zpracování se nevyhazují, ale vrací ve výsledku,
+    aby jedna vadná úloha nezastavila celou dávku.
+
+    Returns:
+        dict: 'name', 'spectra' (seznam (data_x, data_y)), 'seconds' a 'error' (None při úspěchu).
+    """
+    start = time.perf_counter()
+    result = {'name': job.name, 'spectra': [], 'error': None}
+    try:
+        # Klíč paměťové cache podle úlohy; trvalá cache výsledků si obsah hashuje sama
+        digitized = digitize(load_job_image(job, cache), job.limits, stitch=job.stitch, group_by=job.group_by,
+                             n_traces=job.n_traces, smoothing=job.smoothing, memory_budget=DEFAULT_MEMORY_BUDGET,
+                             result_cache=_result_cache() if cache else None, key=('job', job.name, job.crop))
+        result['spectra'] = digitized['spectra']
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def export_results_csv(results, file_path):
+    """
+    Zapíše úspěšné výsledky do jednoho CSV: dvojice sloupců <název>_x, <název>_y pro každou
+    křivku; kratší křivky se doplní prázdnými buňkami.
+    """
+    columns = []
+    for result in results:
+        if result['error'] is not None:
+            continue
+        spectra = result['spectra']
+        for index, (x, y) in enumerate(spectra, start=1):
+            name = result['name'] if len(spectra) == 1 else f"{result['name']}_{index}"
+            columns.append((name, x, y))
+    if not columns:
+        raise ValueError("Žádná úloha nebyla úspěšně zpracována.")
+
+    with open(file_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow([f"{name}_{axis}" for name, _, _ in columns for axis in "xy"])
+        longest = max(len(x) for _, x, _ in columns)
+        for row in range(longest):
+            cells = []
+            for _, x, y in columns:
+                cells += [x[row], y[row]] if row < len(x) else ["", ""]
+            writer.writerow(cells)
+
+
+def results_to_spectra(results):
+    """Úspěšné výsledky jako seznam Spectrum; původ každého je {'job': název, 'trace': index}."""
+    return [Spectrum(x, y, source={'job': result['name'], 'trace': index})
+            for result in results if result['error'] is None
+            for index, (x, y) in enumerate(result['spectra'])]
+
+
+def results_to_set(results, points=None):
+    """
+    Spojí úspěšné výsledky do jedné SpectrumSet (společná osa x, jedno souvislé pole)
+    pro dávkové zpracování.
+    """
+    spectra = results_to_spectra(results)
+    if not spectra:
+        raise ValueError("Žádná úloha nebyla úspěšně zpracována.")
+    return SpectrumSet.from_spectra(spectra, points=points)
+
+
+def default_workers():
+    """Počet pracovních procesů: počet jader bez jednoho pro GUI, alespoň 1."""
+    return max(1, (os.cpu_count() or 2) - 1)
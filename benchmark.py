@@ -0,0 +1,266 @@
+# benchmark.py
+"""
+Benchmark jednotlivých kroků zpracování na syntetických obrázcích spekter.
+
+Vygeneruje obrázky se známým spektrem (součet Lorentzových peaků) vykresleným
+včetně mřížky, textu a šumu v několika velikostech, a pro každý krok změří
+čas a maximální alokovanou paměť. Zároveň vyhodnotí přesnost extrakce
+vůči známé pravdě, aby bylo možné porovnávat zrychlení bez ztráty přesnosti,
+a ověří, že PeakIndex vrací stejné peaky jako find_peaks na pixelově
+kvantovaném spektru.
+
+Použití:
+    python benchmark.py --sizes 500 1000 2000 --repeat 3 --json bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+import tracemalloc
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from scipy.signal import find_peaks
+
+from simple_line import preprocess_image_from_array, contours_to_center_line
+from clustering import increase_contrast, cluster_labels
+from peak_index import PeakIndex
+
+# Kalibrace os syntetického grafu (odpovídá výchozím hodnotám v GUI)
+X_LEFT, X_RIGHT = 4000.0, 0.0
+Y_MIN, Y_MAX = 0.0, 100.0
+
+DEFAULT_SIZES = (500, 1000, 2000, 5000, 10000)
+
+
+def lorentzian_spectrum(x, peaks, baseline=5.0):
+    """
+    Vrátí součet Lorentzových peaků nad konstantní baseline.
+
+    Parameters:
+        x (ndarray): Hodnoty na ose X (wavenumber).
+        peaks (list of tuple): Seznam (pozice, amplituda, pološířka) jednotlivých peaků.
+        baseline (float): Konstantní pozadí.
+
+    Returns:
+        ndarray: Intenzity spektra v bodech x.
+    """
+    y = np.full_like(x, baseline, dtype=float)
+    for center, amplitude, gamma in peaks:
+        y += amplitude * gamma ** 2 / ((x - center) ** 2 + gamma ** 2)
+    return y
+
+
+def random_peaks(rng, count=6):
+    """
+    Vygeneruje náhodné, navzájem dostatečně vzdálené Lorentzovy peaky v rozsahu os.
+    """
+    lo, hi = sorted((X_LEFT, X_RIGHT))
+    centers = np.sort(rng.choice(np.arange(lo + 300, hi - 300, 150), size=count, replace=False))
+    amplitudes = rng.uniform(20, 85, size=count)
+    gammas = rng.uniform(15, 45, size=count)
+    return list(zip(centers, amplitudes, gammas))
+
+
+def render_spectrum_image(width, peaks, seed=0, noise_sigma=4.0):
+    """
+    Vykreslí spektrum do RGB obrázku, který odpovídá přesně oříznuté ploše grafu.
+
+    Obrázek obsahuje světlou mřížku, tmavý text a gaussovský šum. Osy vyplňují
+    celý obrázek, takže pixel <-> data převod je stejný jako v extract_and_plot_contour.
+
+    Returns:
+        ndarray: Obrázek (H, W, 3) uint8.
+    """
+    height = int(round(width * 0.6))
+    dpi = 100
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+
+    x = np.linspace(X_RIGHT, X_LEFT, max(width * 4, 2000))
+    y = lorentzian_spectrum(x, peaks)
+    ax.plot(x, y, color='#1f3a93', linewidth=max(1.0, width / 500))
+
+    ax.set_xlim(X_LEFT, X_RIGHT)
+    ax.set_ylim(Y_MIN, Y_MAX)
+    ax.grid(True, color='#dddddd', linewidth=max(0.5, width / 2000))
+    ax.tick_params(labelbottom=False, labelleft=False, length=0)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    ax.text(0.97, 0.93, 'Raman spectrum', transform=ax.transAxes, ha='right',
+            fontsize=max(6, width / 80), color='#333333')
+
+    canvas.draw()
+    img = np.asarray(canvas.buffer_rgba())[..., :3].copy()
+
+    rng = np.random.default_rng(seed)
+    noisy = img.astype(np.int16) + rng.normal(0, noise_sigma, img.shape).astype(np.int16)
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+
+def calibrate(center_line, shape):
+    """
+    Převede středovou linku z pixelů na data stejně jako extract_and_plot_contour (bez vykreslení).
+    """
+    ys, xs = center_line[:, 0], center_line[:, 1]
+    data_x = X_LEFT + (xs / shape[1]) * (X_RIGHT - X_LEFT)
+    data_y = Y_MAX - (ys / shape[0]) * (Y_MAX - Y_MIN)
+    return data_x, data_y
+
+
+def extraction_error(data_x, data_y, peaks, found_peaks):
+    """
+    Vyhodnotí přesnost extrakce vůči známému spektru.
+
+    Returns:
+        dict: rmse_pct (RMSE v % rozsahu osy Y) a peak_err (max. chyba polohy peaku v jednotkách osy X,
+              NaN pokud nebyl nalezen žádný peak).
+    """
+    truth = lorentzian_spectrum(data_x, peaks)
+    rmse = float(np.sqrt(np.mean((data_y - truth) ** 2)))
+    centers = np.array([p[0] for p in peaks])
+    if len(found_peaks):
+        peak_err = float(np.max(np.min(np.abs(centers[:, None] - data_x[found_peaks][None, :]), axis=1)))
+    else:
+        peak_err = float('nan')
+    return {'rmse_pct': 100.0 * rmse / (Y_MAX - Y_MIN), 'peak_err': peak_err}
+
+
+def peak_index_mismatches(data_x, data_y, distances=(1, 2, 5, 10, 25), steps=8):
+    """
+    Porovná PeakIndex.query s find_peaks pro mřížku prahů výšky, prominence a vzdálenosti.
+
+    Returns:
+        int: Počet nastavení, pro která se vybrané peaky liší.
+    """
+    index = PeakIndex(data_x, data_y)
+    heights = np.linspace(np.min(data_y), np.max(data_y), steps)
+    prominences = (None, 0.0) + tuple(np.linspace(0, np.ptp(data_y), steps)[1:])
+    mismatches = 0
+    for height in heights:
+        for prominence in prominences:
+            for distance in distances:
+                expected, _ = find_peaks(data_y, height=height, distance=distance, prominence=prominence)
+                mismatches += not np.array_equal(index.query(height, prominence, distance), expected)
+    return mismatches
+
+
+def measure(func, *args, repeat=3, **kwargs):
+    """
+    Změří nejlepší čas z `repeat` běhů a v samostatném běhu maximum alokované paměti (tracemalloc).
+
+    Výpisy měřených funkcí (print) jsou potlačeny, aby nezkreslovaly čas.
+
+    Returns:
+        tuple: (výsledek funkce, čas v sekundách, peak paměti v bajtech)
+    """
+    best = float('inf')
+    result = None
+    for _ in range(max(1, repeat)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def benchmark_size(width, repeat=3, seed=0, cluster_limit=2000, k=4):
+    """
+    Spustí všechny měřené kroky pro jednu velikost obrázku.
+
+    Returns:
+        dict: Záznam s časy ('<krok>_s') a pamětí ('<krok>_mb') jednotlivých kroků, chybou extrakce
+              a počtem neshod PeakIndex s find_peaks ('index_mismatch').
+    """
+    rng = np.random.default_rng(seed)
+    peaks = random_peaks(rng)
+    img = render_spectrum_image(width, peaks, seed=seed)
+    record = {'width': width, 'height': img.shape[0], 'pixels': img.shape[0] * img.shape[1]}
+
+    def store(name, seconds, peak):
+        record[f'{name}_s'] = seconds
+        record[f'{name}_mb'] = peak / 2 ** 20
+
+    (_, center_line, longest_contour), seconds, peak = measure(preprocess_image_from_array, img, repeat=repeat)
+    store('preprocess', seconds, peak)
+
+    _, seconds, peak = measure(contours_to_center_line, [longest_contour], repeat=repeat)
+    store('center_line', seconds, peak)
+
+    data_x, data_y = calibrate(center_line, img.shape)
+    distance = max(1, int(len(data_y) / 40))
+    (found, _), seconds, peak = measure(find_peaks, data_y, height=Y_MIN + 10, distance=distance, repeat=repeat)
+    store('peaks', seconds, peak)
+
+    stretched, seconds, peak = measure(increase_contrast, img, repeat=repeat)
+    store('contrast', seconds, peak)
+
+    if width <= cluster_limit:
+        _, seconds, peak = measure(cluster_labels, stretched, k=k, repeat=1)
+        store('cluster', seconds, peak)
+    else:
+        record['cluster_s'] = record['cluster_mb'] = float('nan')
+
+    record.update(extraction_error(data_x, data_y, peaks, found))
+    record['index_mismatch'] = peak_index_mismatches(data_x, data_y)
+    return record
+
+
+STAGES = ('preprocess', 'center_line', 'contrast', 'cluster', 'peaks')
+
+
+def format_table(records):
+    """
+    Naformátuje výsledky do textové tabulky (čas v ms / paměť v MB pro každý krok).
+    """
+    header = f"{'size':>11} " + " ".join(f"{stage:>18}" for stage in STAGES) + f" {'rmse %':>8} {'peak err':>9} {'index':>6}"
+    lines = [header, '-' * len(header)]
+    for rec in records:
+        cells = []
+        for stage in STAGES:
+            ms = rec[f'{stage}_s'] * 1000
+            mb = rec[f'{stage}_mb']
+            cells.append(f"{ms:9.1f}ms/{mb:6.1f}MB" if not np.isnan(ms) else f"{'-':>18}")
+        size = f"{rec['width']}x{rec['height']}"
+        lines.append(f"{size:>11} " + " ".join(cells) + f" {rec['rmse_pct']:8.3f} {rec['peak_err']:9.2f}"
+                     f" {rec['index_mismatch']:6d}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark kroků zpracování na syntetických spektrech.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Šířky syntetických obrázků v pixelech.")
+    parser.add_argument('--repeat', type=int, default=3, help="Počet opakování pro měření času (bere se minimum).")
+    parser.add_argument('--seed', type=int, default=0, help="Seed pro generování spektra a šumu.")
+    parser.add_argument('--clusters', type=int, default=4, help="Počet clusterů pro KMeans.")
+    parser.add_argument('--cluster-limit', type=int, default=2000,
+                        help="Největší šířka, pro kterou se ještě měří KMeans klastrování.")
+    parser.add_argument('--json', help="Volitelná cesta pro uložení výsledků jako JSON.")
+    args = parser.parse_args(argv)
+
+    records = []
+    for width in args.sizes:
+        records.append(benchmark_size(width, repeat=args.repeat, seed=args.seed,
+                                      cluster_limit=args.cluster_limit, k=args.clusters))
+        print(format_table(records[-1:]).splitlines()[-1] if records[1:] else format_table(records), flush=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(records, f, indent=2)
+    return records
+
+
+if __name__ == "__main__":
+    main()
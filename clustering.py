@@ -11,6 +11,8 @@ import svgwrite
 import os
 import tempfile
 
+from simple_line import row_chunks
+
 def preprocess_image(image_path):
     """
     Načte obrázek, odstraní alfa kanál (pokud existuje), a škáluje hodnoty pixelů na rozsah 0-255.
@@ -18,69 +20,157 @@ def preprocess_image(image_path):
     # Načtení obrázku
     img = mpimg.imread(image_path)
 
-    # Kontrola a odstranění alpha kanálu
-    if img.shape[2] == 4:
-        img_rgb = img[:, :, :3]
-        alpha = img[:, :, 3]
-        # Premultiplied alpha: vynásobení RGB hodnot alfa kanálem
-        img_rgb = img_rgb * alpha[:, :, np.newaxis]
-        print("Obrázek obsahuje Alpha kanál a byl odstraněn.")
-    else:
-        img_rgb = img
-        print("Obrázek neobsahuje Alpha kanál.")
-
-    # Kontrola datového typu a škálování na 0-255, pokud je to nutné
-    if img_rgb.dtype in [np.float32, np.float64]:
-        if img_rgb.max() <= 1.0:
-            img_rgb_scaled = (img_rgb * 255).astype(np.uint8)
-            print("RGB hodnoty byly škálovány na 0-255 a převedeny na uint8.")
+    return to_uint8_rgb(img)
+
+
+def to_uint8_rgb(img):
+    """
+    Převede obrázek na RGB uint8 s premultiplikovaným alfa kanálem (pokud existuje).
+
+    Výpočet běží po blocích řádků, takže vedle výsledku (3 B/pixel) nevznikají
+    celoobrazová float mezivýsledky.
+    """
+    height, width = img.shape[:2]
+    has_alpha = img.shape[2] == 4
+    is_float = img.dtype in [np.float32, np.float64]
+    # Škálovat na 0-255 jen obrázky v rozsahu 0-1 (jako dříve)
+    scale = 255 if is_float and img[:, :, :3].max() <= 1.0 else 1
+    print("Obrázek obsahuje Alpha kanál a byl odstraněn." if has_alpha else "Obrázek neobsahuje Alpha kanál.")
+
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    for rows in row_chunks(height, width):
+        block = img[rows, :, :3]
+        if is_float:
+            if has_alpha:
+                # Premultiplied alpha: vynásobení RGB hodnot alfa kanálem
+                block = block * img[rows, :, 3:4]
+            out[rows] = block * scale if scale != 1 else block
+        elif has_alpha:
+            alpha = img[rows, :, 3:4].astype(np.uint16)
+            out[rows] = (block * alpha + 127) // 255
         else:
-            img_rgb_scaled = img_rgb.astype(np.uint8)
-            print("RGB hodnoty byly převedeny na uint8 bez škálování.")
-    else:
-        img_rgb_scaled = img_rgb
-        print("RGB hodnoty již jsou ve formátu uint8.")
+            out[rows] = block
+    return out
 
-    return img_rgb_scaled
+
+def histogram_percentiles(counts, percentiles):
+    """
+    Percentily (lineární interpolace jako np.percentile) z histogramu celočíselných hodnot.
+
+    Parameters:
+        counts (ndarray): Počty výskytů hodnot 0..len(counts)-1.
+        percentiles (sequence): Percentily 0-100.
+    """
+    cumulative = np.cumsum(counts)
+    n = cumulative[-1]
+    values = []
+    for q in percentiles:
+        position = q / 100 * (n - 1)
+        low = int(np.floor(position))
+        v_low = np.searchsorted(cumulative, low, side='right')
+        v_high = np.searchsorted(cumulative, min(low + 1, n - 1), side='right')
+        values.append(v_low + (position - low) * (v_high - v_low))
+    return values
+
+
+def apply_lut(lut, index):
+    """lut[index] po blocích řádků (indexování polem by jinak vytvořilo kopii indexů v int64)."""
+    out = np.empty(index.shape + lut.shape[1:], dtype=lut.dtype)
+    for rows in row_chunks(*index.shape[:2]):
+        out[rows] = lut[index[rows]]
+    return out
 
 
 def increase_contrast(img_scaled):
     """
     Zvýší kontrast obrázku pomocí contrast stretching.
     """
-    # Definice rozsahu na základě percentilů
-    p2, p98 = np.percentile(img_scaled, (2, 98))
-    img_stretched = exposure.rescale_intensity(img_scaled, in_range=(p2, p98))
+    # Definice rozsahu na základě percentilů (z histogramu hodnot 0-255)
+    counts = np.zeros(256, dtype=np.int64)
+    for rows in row_chunks(*img_scaled.shape[:2]):
+        counts += np.bincount(img_scaled[rows].ravel(), minlength=256)
+    p2, p98 = histogram_percentiles(counts, (2, 98))
 
-    # Převod zpět na uint8
-    img_stretched = img_stretched.astype(np.uint8)
+    # Převodní tabulka pro všech 256 hodnot, převod zpět na uint8 stejně jako dříve
+    lut = exposure.rescale_intensity(np.arange(256, dtype=np.uint8), in_range=(p2, p98)).astype(np.uint8)
+    img_stretched = apply_lut(lut, img_scaled)
 
     print("Kontrast obrázku byl zvýšen pomocí contrast stretching.")
     return img_stretched
 
 
-def cluster_colors(img_stretched, k=4):
+class ClusteredImage:
     """
-    Aplikuje KMeans klastrování na přeclusterovaný obrázek.
+    Výsledek klastrování jako mapa labelů (uint8, H x W) a paleta barev klastrů (k x 3, uint8).
+
+    Obrázky a masky jednotlivých klastrů se počítají až na vyžádání, takže paměť
+    nezávisí na počtu klastrů.
     """
-    # Přetvoření obrázku do dvourozměrného pole pro KMeans
-    height, width, channels = img_stretched.shape
-    img_reshaped = img_stretched.reshape((-1, 3))
-    print(f"Reshaped data shape for KMeans: {img_reshaped.shape}")
 
-    # Inicializace a trénink KMeans
-    kmeans = KMeans(n_clusters=k, random_state=42)
-    kmeans.fit(img_reshaped)
+    def __init__(self, labels, palette):
+        self.labels = labels
+        self.palette = palette
+
+    @property
+    def k(self):
+        return len(self.palette)
+
+    def mask(self, n):
+        """Maska pixelů klastru n (True = pixel patří do klastru)."""
+        return self.labels == n
+
+    def to_image(self):
+        """Přeclusterovaný obrázek (každý pixel má barvu svého klastru)."""
+        return apply_lut(self.palette, self.labels)
 
-    # Získání centroidů a labelů
-    centroids = kmeans.cluster_centers_.astype(np.uint8)
-    labels = kmeans.labels_
+    def cluster_image(self, n, background=(255, 255, 255)):
+        """Obrázek jen s klastrem n, ostatní pixely mají barvu `background`."""
+        palette = np.empty_like(self.palette)
+        palette[:] = background
+        palette[n] = self.palette[n]
+        return apply_lut(palette, self.labels)
+
+
+def cluster_labels(img_stretched, k=4):
+    """
+    Aplikuje KMeans klastrování na unikátní barvy obrázku vážené jejich četností
+    (stejná účelová funkce jako KMeans přes všechny pixely, ale na mnohem menších datech).
+
+    Returns:
+        ClusteredImage: Mapa labelů a paleta.
+    """
+    height, width, _ = img_stretched.shape
+    # Barva jako jedno číslo 0xRRGGBB
+    keys = np.empty((height, width), dtype=np.uint32)
+    for rows in row_chunks(height, width):
+        block = img_stretched[rows, :, :3].astype(np.uint32)
+        keys[rows] = (block[..., 0] << 16) | (block[..., 1] << 8) | block[..., 2]
+    colors, counts = np.unique(keys, return_counts=True)
+    rgb = np.column_stack([colors >> 16, (colors >> 8) & 255, colors & 255]).astype(np.float64)
+    print(f"Unikátních barev pro KMeans: {len(colors)}")
+
+    k = min(k, len(colors))
+    kmeans = KMeans(n_clusters=k, random_state=42)
+    color_labels = kmeans.fit_predict(rgb, sample_weight=counts).astype(np.uint8)
+    palette = kmeans.cluster_centers_.astype(np.uint8)
     print(f"KMeans klastrování dokončeno. Počet klastrů: {k}")
 
-    # Vytvoření přeclusterovaného obrázku
-    img_clustered = centroids[labels].reshape((height, width, 3))
+    labels = np.empty((height, width), dtype=np.uint8)
+    for rows in row_chunks(height, width):
+        labels[rows] = color_labels[np.searchsorted(colors, keys[rows])]
+    return ClusteredImage(labels, palette)
 
-    return img_clustered, labels
+
+def cluster_colors(img_stretched, k=4):
+    """
+    Aplikuje KMeans klastrování na přeclusterovaný obrázek.
+
+    Returns:
+        tuple: (přeclusterovaný obrázek, labely pixelů jako ploché pole) – viz cluster_labels
+            pro variantu bez celoobrazové kopie.
+    """
+    clustered = cluster_labels(img_stretched, k)
+    return clustered.to_image(), clustered.labels.ravel()
 
 
 def display_clusters(img_clustered, k=4):
@@ -198,7 +288,14 @@ def display_selected_cluster(img_clustered, labels, cluster_index):
     return img_selected
 
 
-def check_clusters_embedded(cluster_count, sample_name):
+def check_clusters_embedded(cluster_count, sample_name, return_clustered=False):
+    """
+    Rozdělí obrázek na clustery a uloží náhledy jednotlivých clusterů do dočasných souborů.
+
+    Returns:
+        list: Cesty k obrázkům (první dvě jsou rezervované, pak jeden obrázek na cluster);
+            s `return_clustered=True` dvojice (cesty, ClusteredImage).
+    """
     image_paths = []
     k = cluster_count
 
@@ -217,8 +314,9 @@ def check_clusters_embedded(cluster_count, sample_name):
     image_paths.append(temp1)
     # plt.close(fig1)
 
-    # Krok 4: Klastrování
-    img_clustered, labels = cluster_colors(img_stretched, k=k)
+    # Krok 4: Klastrování (mapa labelů + paleta, obrázky klastrů až na vyžádání)
+    clustered = cluster_labels(img_stretched, k=k)
+    del img_stretched
 
     # Krok 5: Uložení přeclusterovaného obrázku
     # fig2 = plt.figure(figsize=(8, 6))
@@ -231,14 +329,11 @@ def check_clusters_embedded(cluster_count, sample_name):
     # plt.close(fig2)
 
     # Krok 6: Pro každý klastr – zobrazení původního přeclusterovaného obrázku a obrázku jen s vybraným klastrem
-    height, width, _ = img_clustered.shape
-    for n in range(k):
+    for n in range(clustered.k):
         fig, ax = plt.subplots(figsize=(8, 8))  # Pouze jeden graf místo dvou
 
-        # Vytvoření masky pro vybraný klastr
-        mask = (labels == n).reshape((height, width))
-        img_selected = img_clustered.copy()
-        img_selected[~mask] = [255, 255, 255]  # Nastavení nevybraných pixelů na bílou
+        # Obrázek jen s vybraným klastrem, nevybrané pixely jsou bílé
+        img_selected = clustered.cluster_image(n)
 
         # Zobrazení pouze vybraného klastru
         ax.imshow(img_selected)
@@ -251,4 +346,6 @@ def check_clusters_embedded(cluster_count, sample_name):
         image_paths.append(temp_n)
         plt.close(fig)
 
+    if return_clustered:
+        return image_paths, clustered
     return image_paths
\ No newline at end of file
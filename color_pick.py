@@ -0,0 +1,100 @@
+# color_pick.py
+"""
+Extrakce křivky podle vybrané barvy (bez KMeans).
+
+Má-li křivka výraznou barvu, stačí ji kliknutím vybrat: maska jsou pixely, jejichž
+barva je od vybrané vzdálená nejvýše `tolerance` (ΔE v Lab, nebo euklidovsky v RGB),
+a jde rovnou do hledání středové linky (simple_line.center_line_from_binary).
+
+Vzdálenost se nepočítá pro každý pixel, ale jen pro každou různou barvu obrázku
+(grafy mají barev málo, i s antialiasingem typicky tisíce): přítomné barvy se označí
+v tabulce všech 2^24 barev RGB, vzdálenost se spočítá jen pro ně a maska je pak
+jediné vyhledání v tabulce na pixel. Převod do Lab tak stojí zlomek převodu celého
+obrázku a nic se netřídí.
+"""
+import numpy as np
+from skimage.color import rgb2lab
+
+from simple_line import center_line_from_binary, remove_small_components, row_chunks
+
+SPACES = ('lab', 'rgb')
+# Výchozí tolerance: ΔE (CIE76) v Lab, resp. vzdálenost 0–255 složek v RGB
+DEFAULT_TOLERANCE = {'lab': 20.0, 'rgb': 60.0}
+COLOR_COUNT = 2 ** 24
+
+
+def pick_color(img, x, y, radius=1):
+    """
+    Barva křivky v bodě (x, y): medián okolí (2 * radius + 1)², aby kliknutí
+    na antialiasovaný okraj nevybralo směs s pozadím.
+    """
+    patch = img[max(0, y - radius):y + radius + 1, max(0, x - radius):x + radius + 1, :3]
+    return tuple(int(v) for v in np.median(patch.reshape(-1, 3), axis=0))
+
+
+def _color_codes(rgb):
+    """Barvy uint8 RGB pixelů jako jedno číslo uint32 (0xRRGGBB)."""
+    height, width = rgb.shape[:2]
+    codes = np.empty((height, width), dtype=np.uint32)
+    for rows in row_chunks(height, width):
+        out = codes[rows]
+        np.left_shift(rgb[rows, :, 0], 16, out=out, dtype=np.uint32)
+        out |= np.left_shift(rgb[rows, :, 1], 8, dtype=np.uint32)
+        out |= rgb[rows, :, 2]
+    return codes
+
+
+def color_mask(img, color, tolerance=None, space='lab'):
+    """
+    Maska pixelů barvy blízké `color`.
+
+    Parameters:
+        img (ndarray): Obrázek (H, W, 3 nebo 4) uint8.
+        color (tuple): Vybraná barva (r, g, b) 0–255.
+        tolerance (float, optional): Maximální vzdálenost barev (výchozí DEFAULT_TOLERANCE).
+        space (str): 'lab' (ΔE, odpovídá vnímání) nebo 'rgb'.
+
+    Returns:
+        ndarray: Maska (H, W), True = pixel křivky.
+    """
+    if space not in SPACES:
+        raise ValueError(f"Neznámý barevný prostor '{space}', povolené jsou {', '.join(SPACES)}.")
+    tolerance = DEFAULT_TOLERANCE[space] if tolerance is None else tolerance
+    codes = _color_codes(np.ascontiguousarray(img[:, :, :3], dtype=np.uint8))
+    table = np.zeros(COLOR_COUNT, dtype=bool)
+    table[codes] = True
+    palette = np.flatnonzero(table).astype(np.uint32)
+    colors = np.stack([(palette >> 16) & 255, (palette >> 8) & 255, palette & 255], axis=1).astype(np.float64)
+    target = np.array(color[:3], dtype=np.float64)[None, :]
+    if space == 'lab':
+        colors = rgb2lab(colors[None] / 255.0)[0]
+        target = rgb2lab(target[None] / 255.0)[0]
+    # Tabulka se znovu použije: True jen pro přítomné barvy blízké vybrané
+    table[palette] = np.sum((colors - target) ** 2, axis=1) <= tolerance ** 2
+    return table[codes]
+
+
+def mask_to_binary(mask, min_size=8):
+    """Maska křivky na binární obrázek ve významu binarize_image (True = pozadí), bez drobných skvrn."""
+    return ~remove_small_components(mask, min_size)
+
+
+def extract_color_center_line(img, color, tolerance=None, space='lab', stitch_tolerance=None, instr=None):
+    """
+    Středová linka křivky vybrané barvy.
+
+    Returns:
+        tuple: (center_line, longest_contour, mask) – linka a kontura v pixelech obrázku
+            (jako preprocess_image_from_array) a maska křivky.
+    """
+    mask = color_mask(img, color, tolerance, space)
+    if not mask.any():
+        raise ValueError("Žádný pixel nemá vybranou barvu, zvyšte toleranci.")
+    center_line, longest_contour = center_line_from_binary(mask_to_binary(mask), instr, stitch_tolerance)
+    return center_line, longest_contour, mask
+
+
+def mask_image(mask, color=(0, 0, 0), background=(255, 255, 255)):
+    """Obrázek (H, W, 3) uint8 jen s pixely masky v barvě `color` (pro další zpracování jako výřez)."""
+    palette = np.array([background, color], dtype=np.uint8)
+    return palette[mask.view(np.uint8)]
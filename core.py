@@ -0,0 +1,102 @@
+# core.py
+"""
+Jádro digitalizace bez Qt a pyplot: obrázek -> spektrum -> peaky.
+
+Používají ho pracovní procesy (fronta úloh, sledování složky) a skripty a dá se
+testovat bez displeje. GUI převádí pixmapy na pole v qt_adapters.py a vykresluje
+výsledky samo.
+
+Použití:
+    from core import digitize
+    result = digitize(img, (4000, 0, 0, 100), peak_params=(10, 10))
+    data_x, data_y = result['spectra'][0]
+    peaks = result['peaks'][0]
+"""
+from find_peaks import detect_peaks
+from pipeline import SpectrumPipeline
+from smoothing import pixel_quantum, smooth
+from stitching import default_tolerance
+
+
+def digitize(img, limits, stitch=False, group_by=None, n_traces=None, peak_params=None, smoothing=None,
+             memory_budget=None, result_cache=None, key=None, instr=None):
+    """
+    Digitalizuje obrázek grafu oříznutý na oblast os.
+
+    Parameters:
+        img (ndarray): Obrázek (H, W, 3), ideálně RGB uint8.
+        limits (tuple): (x_min, x_max, y_min, y_max) jako vstupní pole Xleft/Xright/Ymin/Ymax.
+        stitch (bool): Spojit přerušenou křivku (viz stitching.py).
+        group_by (str, optional): Režim více křivek ('vertical' nebo 'color'), None = jedna křivka.
+        n_traces (int, optional): Počet křivek v režimu více křivek.
+        peak_params (tuple, optional): (sensitivity, min_distance); bez nich se peaky nehledají.
+        smoothing (tuple, optional): (metoda, okno v jednotkách osy x), viz smoothing.smooth.
+        memory_budget (int, optional): Paměťový rozpočet pro pyramidové zpracování (viz pyramid.py).
+        result_cache (ResultCache, optional): Trvalá cache výsledků.
+        key (hashable, optional): Klíč obsahu obrázku; jinak se spočítá hash pixelů.
+        instr (Instrumentation, optional): Měření kroků.
+
+    Returns:
+        dict: 'spectra' (seznam (data_x, data_y)) a 'peaks' (seznam indexů peaků pro každé
+            spektrum, nebo None).
+    """
+    pipeline = SpectrumPipeline(instr=instr, memory_budget=memory_budget, result_cache=result_cache)
+    pipeline.set_image(img, key=key)
+    limits = tuple(float(v) for v in limits)
+    peaks = None
+    if group_by:
+        spectra = pipeline.trace_spectra(limits, group_by, n_traces)
+        if smoothing is not None:
+            spectra = [(data_x, smooth(data_x, data_y, *smoothing)) for data_x, data_y in spectra]
+        if peak_params is not None:
+            prominence = pixel_quantum(limits, img.shape[0]) if smoothing is not None else None
+            peaks = [detect_peaks(data_y, *peak_params, prominence)[0] for _, data_y in spectra]
+    else:
+        tolerance = default_tolerance(pipeline.image().shape) if stitch else None
+        spectra = [pipeline.smoothed(limits, smoothing, stitch_tolerance=tolerance)]
+        if peak_params is not None:
+            peaks = [pipeline.peaks(limits, *peak_params, stitch_tolerance=tolerance, smoothing=smoothing)[0]]
+    return {'spectra': spectra, 'peaks': peaks}
+
+
+def isolate_cluster(img, k, index):
+    """
+    Ponechá jen pixely jednoho barevného clusteru (ostatní budou bílé), jako výběr
+    clusteru v GUI.
+
+    Parameters:
+        img (ndarray): Obrázek (H, W, 3 nebo 4).
+        k (int): Počet clusterů KMeans.
+        index (int): Vybraný cluster (0 .. k-1).
+
+    Returns:
+        ndarray: Obrázek (H, W, 3) uint8.
+    """
+    # sklearn se načte jen pro úlohy s clustery
+    from clustering import to_uint8_rgb, increase_contrast, cluster_labels
+
+    clustered = cluster_labels(increase_contrast(to_uint8_rgb(img)), k=k)
+    if not 0 <= index < clustered.k:
+        raise ValueError(f"Cluster {index} neexistuje, obrázek má {clustered.k} clusterů.")
+    return clustered.cluster_image(index)
+
+
+def isolate_color(img, color, tolerance=None, space='lab'):
+    """
+    Ponechá jen pixely barvy blízké `color` jako černou křivku na bílém pozadí (jako výběr
+    barvy v GUI); rychlá náhrada isolate_cluster pro křivky výrazné barvy.
+
+    Parameters:
+        img (ndarray): Obrázek (H, W, 3 nebo 4) uint8.
+        color (tuple): Barva křivky (r, g, b).
+        tolerance (float, optional), space (str): Viz color_pick.color_mask.
+
+    Returns:
+        ndarray: Obrázek (H, W, 3) uint8.
+    """
+    from color_pick import color_mask, mask_image
+
+    mask = color_mask(img, color, tolerance, space)
+    if not mask.any():
+        raise ValueError("Žádný pixel nemá zadanou barvu, zvyšte toleranci.")
+    return mask_image(mask)
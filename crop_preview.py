@@ -0,0 +1,152 @@
+# crop_preview.py
+"""
+Živý náhled extrakce křivky při tažení výběru ořezu.
+
+Během tažení se na aktuálním výběru spouští zmenšená extrakce (pyramid.preview_center_line)
+ve vlastním jednovláknovém QThreadPool. Zmenšené úrovně celého obrázku (minimum bloků)
+se počítají jen jednou, každý výběr je pak jen výřez z vhodné úrovně. Najednou běží nejvýše jeden výpočet; výběry,
+které mezitím přijdou, se nehromadí – čeká jen ten poslední, ostatní se zahodí.
+Počet zpracovaných pixelů se po každém výpočtu upraví tak, aby výpočet trval zhruba
+FRAME_BUDGET sekund, takže náhled stíhá pohyb myši i na velkých skenech.
+"""
+import time
+
+import numpy as np
+from PyQt5.QtCore import QObject, QRect, QRunnable, QThreadPool, pyqtSignal
+
+from pyramid import downsample, preview_center_line, preview_factor
+from qt_adapters import qimage_to_array
+
+# Cílová doba jednoho výpočtu náhledu v sekundách
+FRAME_BUDGET = 0.04
+MIN_PIXELS = 4_000
+MAX_PIXELS = 1_000_000
+
+# Vlastní pool se stejným důvodem jako v display_pyramid (QImage.scaled a globalInstance)
+_POOL = None
+
+
+def _pool():
+    global _POOL
+    if _POOL is None:
+        _POOL = QThreadPool()
+        _POOL.setMaxThreadCount(1)
+    return _POOL
+
+
+def _level(levels, image, factor):
+    """Celý obrázek zmenšený `factor`-krát; úrovně se ukládají do `levels`."""
+    if factor not in levels:
+        if factor == 1:
+            levels[1] = qimage_to_array(image)
+        else:
+            levels[factor] = downsample(_level(levels, image, factor // 2), 2)
+    return levels[factor]
+
+
+class _PreviewSignals(QObject):
+    finished = pyqtSignal(int, object, float)
+
+
+class _PreviewTask(QRunnable):
+    """Extrakce na zmenšeném výřezu (běží ve vlákně QThreadPool)."""
+
+    def __init__(self, preview, generation, rect, max_pixels):
+        super().__init__()
+        self.signals = preview.signals
+        # Úlohu nový obrázek (set_source) neovlivní, počítá dál se svým
+        self.levels = preview._levels
+        self.image = preview._image
+        self.generation = generation
+        self.rect = rect
+        self.max_pixels = max_pixels
+
+    def run(self):
+        start = time.perf_counter()
+        line = None
+        try:
+            x, y, w, h = self.rect
+            factor = preview_factor((h, w), self.max_pixels)
+            x0, y0 = x // factor, y // factor
+            small = _level(self.levels, self.image, factor)[y0:(y + h) // factor, x0:(x + w) // factor]
+            line = preview_center_line(small, factor)
+            if line is not None:
+                line = line + (y0 * factor, x0 * factor)
+        except Exception as e:
+            print(f"Náhled linky selhal: {e}")
+            line = None
+        finally:
+            # Vyslat vždy: bez finished by náhled zůstal „běžící“ a další výběry by se nespustily
+            self.signals.finished.emit(self.generation, line, time.perf_counter() - start)
+
+
+class CropPreview(QObject):
+    """
+    Náhled středové linky pro výběr v pixelech zdrojového obrázku.
+
+    Signál `updated` se vyšle, když je k dispozici nová linka (atribut `line`,
+    (M, 2) s (y, x) v pixelech zdroje, nebo None).
+    """
+    updated = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._image = None
+        self._levels = {}  # faktor zmenšení -> pole celého obrázku
+        self.max_pixels = 40_000
+        self.line = None
+        self._generation = 0
+        self._cleared = 0  # generace posledního clear(); starší výsledky se nezobrazí
+        self._running = None
+        self._pending = None
+        # Signály vlastní náhled (ne úloha), aby žily déle než kterákoli úloha
+        self.signals = _PreviewSignals(self)
+        self.signals.finished.connect(self._on_finished)
+
+    def set_source(self, image):
+        """Nový zdroj jako QImage (nebo None); QPixmap se mimo hlavní vlákno používat nesmí."""
+        # Pole se z QImage vytvoří až ve vlákně
+        self._image = image
+        self._levels = {}
+        self.clear()
+
+    def clear(self):
+        """Zahodí zobrazenou linku i čekající výběr; výsledek běžícího výpočtu se ignoruje."""
+        self._generation += 1
+        self._cleared = self._generation
+        self._pending = None
+        if self.line is not None:
+            self.line = None
+            self.updated.emit()
+
+    def request(self, rect):
+        """Požádá o náhled pro výběr `rect` (QRect v pixelech zdroje)."""
+        if self._image is None:
+            return
+        rect = rect.intersected(QRect(0, 0, self._image.width(), self._image.height()))
+        if rect.width() < 4 or rect.height() < 4:
+            return
+        self._generation += 1
+        self._pending = (rect.x(), rect.y(), rect.width(), rect.height())
+        if self._running is None:
+            self._start_pending()
+
+    def _start_pending(self):
+        task = _PreviewTask(self, self._generation, self._pending, self.max_pixels)
+        self._pending = None
+        # Na úlohu si držíme referenci sami, aby ji Python neuvolnil dřív než vlákno
+        task.setAutoDelete(False)
+        self._running = task
+        _pool().start(task)
+
+    def _on_finished(self, generation, line, seconds):
+        # Rozpočet pixelů podle doby výpočtu (doba roste zhruba lineárně s počtem pixelů)
+        scale = FRAME_BUDGET / max(seconds, 1e-4)
+        self.max_pixels = int(np.clip(self.max_pixels * min(scale, 2.0), MIN_PIXELS, MAX_PIXELS))
+        self._running = None
+        # Výsledek starší než clear() (nový obrázek, nový výběr) se zahodí
+        if generation > self._cleared:
+            self.line = line
+            self.updated.emit()
+        if self._pending is not None:
+            self._start_pending()
@@ -0,0 +1,120 @@
+# decimation.py
+"""
+Decimace spekter pro vykreslení: z bodů viditelného rozsahu osy x se ponechá jen
+tolik, kolik se dá zobrazit na šířce widgetu.
+
+    minmax_decimate   pro každý sloupec pixelů minimum a maximum (svislá úsečka vypadá
+                      stejně jako všechny body sloupce); min/max přes np.fmin.reduceat
+    lttb              Largest-Triangle-Three-Buckets: z každého koše bod s největší
+                      plochou trojúhelníku se sousedy (hladší vzhled, stejný počet bodů)
+
+Obě funkce pracují s jednou osou x a polem y tvaru (body,) nebo (spektra, body), takže
+stovky spekter se decimují najednou bez smyčky v Pythonu přes spektra. Cena závisí
+na počtu bodů ve viditelném rozsahu a šířce widgetu, ne na počtu všech spekter x bodů
+mimo něj. Hodnoty NaN (spektrum mimo svůj rozsah) se ignorují.
+"""
+import numpy as np
+
+METHODS = ('minmax', 'lttb')
+
+
+def visible_slice(x, x_min, x_max):
+    """Rozsah indexů rostoucí osy `x` pokrývající <x_min, x_max> včetně jednoho bodu za každým okrajem."""
+    lo = max(0, int(np.searchsorted(x, x_min, side='right')) - 1)
+    hi = min(len(x), int(np.searchsorted(x, x_max, side='left')) + 1)
+    return slice(lo, hi)
+
+
+def minmax_decimate(x, y, bins):
+    """
+    Parameters:
+        x (ndarray): Rostoucí osa x (N,).
+        y (ndarray): Intenzity (N,) nebo (spektra, N).
+        bins (int): Počet košů (sloupců pixelů).
+
+    Returns:
+        tuple: (xd, yd) – xd (2 * koše,) a yd (..., 2 * koše); koš přispěje minimem a maximem
+            na své střední poloze x. Při N <= 2 * bins se vrátí vstup beze změny.
+    """
+    n = len(x)
+    if n <= 2 * bins:
+        return x, y
+    # Koše stejné šířky v jednotkách osy x (= sloupce pixelů), prázdné koše se vynechají
+    edges = np.linspace(x[0], x[-1], bins + 1)
+    starts = np.unique(np.searchsorted(x, edges[:-1], side='left'))
+    starts = starts[starts < n]
+    lows = np.fmin.reduceat(y, starts, axis=-1)
+    highs = np.fmax.reduceat(y, starts, axis=-1)
+    ends = np.append(starts[1:], n) - 1
+    centers = (x[starts] + x[ends]) / 2
+
+    xd = np.repeat(centers, 2)
+    yd = np.empty(y.shape[:-1] + (2 * len(starts),), dtype=y.dtype)
+    yd[..., 0::2] = lows
+    yd[..., 1::2] = highs
+    return xd, yd
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets (Steinarsson, 2013).
+
+    První a poslední bod zůstanou, zbytek se rozdělí do `threshold - 2` košů a z každého
+    se vybere bod s největší plochou trojúhelníku s bodem vybraným v předchozím koši
+    a průměrem následujícího koše. Výběr je sekvenční přes koše, ale každý krok
+    zpracuje všechna spektra najednou.
+
+    Parameters:
+        x (ndarray): Rostoucí osa x (N,).
+        y (ndarray): Intenzity (N,) nebo (spektra, N).
+        threshold (int): Počet výstupních bodů (alespoň 3).
+
+    Returns:
+        tuple: (xd, yd) – xd (..., threshold) a yd (..., threshold); u více spekter má každé
+            vlastní vybrané polohy x.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    y2 = np.atleast_2d(y)
+    rows = np.arange(len(y2))
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    # Průměry košů předem (pro „následující koš“); NaN se ignorují
+    with np.errstate(invalid='ignore'):
+        means_x = np.add.reduceat(x[:n - 1], edges[:-1]) / np.diff(edges)
+        sums = np.add.reduceat(np.nan_to_num(y2[:, :n - 1]), edges[:-1], axis=1)
+        counts = np.add.reduceat(np.isfinite(y2[:, :n - 1]), edges[:-1], axis=1)
+        means_y = sums / np.maximum(counts, 1)
+
+    picked = np.empty((len(y2), threshold), dtype=np.intp)
+    picked[:, 0] = 0
+    picked[:, -1] = n - 1
+    prev = np.zeros(len(y2), dtype=np.intp)
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 1 < threshold - 2:
+            next_x, next_y = means_x[b + 1], means_y[:, b + 1]
+        else:
+            next_x, next_y = x[-1], y2[:, -1]
+        px, py = x[prev], y2[rows, prev]
+        # Dvojnásobek plochy trojúhelníku (prev, kandidát, průměr dalšího koše)
+        area = np.abs((px - next_x)[:, None] * (y2[:, lo:hi] - py[:, None])
+                      - (px[:, None] - x[lo:hi]) * (next_y - py)[:, None])
+        area = np.where(np.isnan(area), -1.0, area)
+        prev = lo + np.argmax(area, axis=1)
+        picked[:, b + 1] = prev
+
+    xd = x[picked]
+    yd = y2[rows[:, None], picked]
+    if y.ndim == 1:
+        return xd[0], yd[0]
+    return xd, yd
+
+
+def decimate(x, y, width, method='minmax'):
+    """Decimace pro `width` pixelů zvolenou metodou ('minmax' nebo 'lttb')."""
+    if method == 'lttb':
+        return lttb(x, y, 2 * width)
+    if method == 'minmax':
+        return minmax_decimate(x, y, width)
+    raise ValueError(f"Neznámá metoda decimace '{method}', povolené jsou {', '.join(METHODS)}.")
@@ -0,0 +1,123 @@
+# display_pyramid.py
+"""
+Pyramida předškálovaných úrovní pro zobrazení velkého obrázku v GUI.
+
+Úrovně (postupně zmenšené na polovinu) se počítají na pozadí ve vlastním QThreadPool
+jako QImage (QPixmap se mimo hlavní vlákno používat nesmí). Při změně velikosti
+widgetu se vyhladí jen nejbližší větší úroveň, takže hlavní vlákno nikdy
+nevyhlazuje celý mnohamegapixelový originál. Dokud úrovně nejsou hotové,
+zobrazí se rychlé (nevyhlazené) zmenšení originálu.
+"""
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt5.QtGui import QPixmap
+
+
+# Vlastní pool: QImage.scaled s vyhlazením sám využívá QThreadPool.globalInstance(), a kdyby
+# v něm čekala naše úloha na GIL držený hlavním vláknem, na jednojádrovém stroji by se zablokovaly.
+_POOL = None
+# Běžící úlohy: pyramida se může uvolnit dřív, než její úloha doběhne
+_ACTIVE = set()
+
+
+def _pool():
+    global _POOL
+    if _POOL is None:
+        _POOL = QThreadPool()
+        _POOL.setMaxThreadCount(1)
+    return _POOL
+
+
+class _BuildSignals(QObject):
+    finished = pyqtSignal(list)
+
+
+class _BuildLevels(QRunnable):
+    """Spočítá úrovně pyramidy z QImage (běží ve vlákně QThreadPool)."""
+
+    def __init__(self, image, min_size):
+        super().__init__()
+        self.image = image
+        self.min_size = min_size
+        self.signals = _BuildSignals()
+
+    def run(self):
+        levels = []
+        level = self.image
+        while min(level.width(), level.height()) // 2 >= self.min_size:
+            level = level.scaled(level.width() // 2, level.height() // 2,
+                                 Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            levels.append(level)
+        self.image = None  # kopii originálu už nepotřebujeme
+        self.signals.finished.emit(levels)
+        # Pool s autoDelete=False na úlohu po run() nesahá, referenci lze pustit
+        _ACTIVE.discard(self)
+
+
+class DisplayPyramid(QObject):
+    """
+    Zmenšené úrovně jednoho obrázku pro zobrazení.
+
+    Signál `ready` se vyšle, jakmile jsou úrovně spočítané (widget se pak může překreslit
+    ve vyšší kvalitě).
+    """
+    ready = pyqtSignal()
+
+    def __init__(self, pixmap, min_size=256, parent=None, image=None):
+        """
+        Parameters:
+            pixmap (QPixmap): Zobrazovaný obrázek.
+            image (QImage, optional): Týž obrázek již převedený na QImage (jinak se převede zde).
+        """
+        super().__init__(parent)
+        self.source = pixmap
+        self.levels = None  # QImage úrovní od největší (1/2) po nejmenší
+        self._level_pixmaps = {}
+        self._last = None  # (velikost, pixmapa) posledního vyhlazeného výsledku
+        self._task = _BuildLevels(image if image is not None else pixmap.toImage(), min_size)
+        # Na úlohu si držíme referenci sami (_ACTIVE), aby ji Python neuvolnil dřív než vlákno
+        self._task.setAutoDelete(False)
+        self._task.signals.finished.connect(self._on_levels)
+        _ACTIVE.add(self._task)
+        _pool().start(self._task)
+
+    def release(self):
+        """Odpojí se od úlohy a zahodí originál i úrovně (před deleteLater při výměně obrázku)."""
+        try:
+            self._task.signals.finished.disconnect(self._on_levels)
+        except TypeError:
+            pass  # již odpojeno
+        self._task = None
+        self.source = None
+        self.levels = None
+        self._level_pixmaps = {}
+        self._last = None
+
+    def _on_levels(self, levels):
+        self.levels = levels
+        self._last = None
+        self.ready.emit()
+
+    def _level_for(self, width):
+        """Nejmenší úroveň alespoň tak široká jako požadované zobrazení (jinak originál)."""
+        for index in range(len(self.levels) - 1, -1, -1):
+            if self.levels[index].width() >= width:
+                if index not in self._level_pixmaps:
+                    self._level_pixmaps[index] = QPixmap.fromImage(self.levels[index])
+                return self._level_pixmaps[index]
+        return self.source
+
+    def scaled(self, size):
+        """
+        Vrátí obrázek zmenšený do `size` se zachováním poměru stran (jako QPixmap.scaled
+        s Qt.KeepAspectRatio).
+        """
+        target = self.source.size().scaled(size, Qt.KeepAspectRatio)
+        if target.isEmpty():
+            return self.source
+        if self.levels is None:
+            return self.source.scaled(target, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+        if self._last is not None and self._last[0] == target:
+            return self._last[1]
+        scaled = self._level_for(target.width()).scaled(target, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        self._last = (target, scaled)
+        return scaled
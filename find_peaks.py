@@ -1,10 +1,28 @@
 # find_peaks.py
 
-import matplotlib.pyplot as plt
 from scipy.signal import find_peaks
+from instrumentation import maybe_stage
 
 
-def plot_spectrum_with_peaks(x, y, sensitivity=0.5, min_distance=20, show_peaks=True):
+def detect_peaks(y, sensitivity=0.5, min_distance=20, prominence=None):
+    """
+    Detekuje peaky ve spektru (bez vykreslení).
+
+    Parameters:
+        y (array-like): Hodnoty na ose Y (intenzity).
+        sensitivity (float): Práh pro detekci peaků (parametr height).
+        min_distance (int): Minimální vzdálenost mezi peakami.
+        prominence (float, optional): Minimální prominence peaku (např. výška jednoho pixelu
+            u vyhlazeného spektra, viz smoothing.pixel_quantum).
+
+    Returns:
+        tuple: (indexy peaků, vlastnosti z scipy.signal.find_peaks)
+    """
+    return find_peaks(y, height=sensitivity, distance=min_distance, prominence=prominence)
+
+
+def plot_spectrum_with_peaks(x, y, sensitivity=0.5, min_distance=20, show_peaks=True, instr=None,
+                             peaks=None):
     """
     Detekuje peaky v daném spektru a vykresluje graf se zobrazením detekovaných peaků.
 
@@ -14,9 +32,16 @@ def plot_spectrum_with_peaks(x, y, sensitivity=0.5, min_distance=20, show_peaks=
         sensitivity (float): Práh pro detekci peaků (parametr height).
         min_distance (int): Minimální vzdálenost mezi peakami.
         show_peaks (bool): Pokud True, vykreslí textové popisky pro peaky.
+        instr (Instrumentation, optional): Měření kroku peaks (pouze detekce, bez vykreslení).
+        peaks (ndarray, optional): Již detekované indexy peaků; detekce se pak přeskočí.
     """
+    # pyplot až zde, detect_peaks se používá i v pracovních procesech bez GUI
+    import matplotlib.pyplot as plt
+
     # Detekce peaků
-    peaks, properties = find_peaks(y, height=sensitivity, distance=min_distance)
+    if peaks is None:
+        with maybe_stage(instr, 'peaks', points=len(y)):
+            peaks, properties = detect_peaks(y, sensitivity, min_distance)
     peak_positions = x[peaks]
 
     # Vypíšeme nalezené hodnoty
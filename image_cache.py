@@ -0,0 +1,179 @@
+# image_cache.py
+"""
+Diskový cache dekódovaných obrázků pro opakované dávkové běhy.
+
+Dekódované pixely (RGB uint8) se ukládají jako .npy soubory a čtou se přes
+np.load(mmap_mode='r'). Opakovaný běh tak čte pixely přímo ze stránkové cache
+systému bez dekódování PNG/JPEG a více pracovních procesů sdílí stejné stránky
+bez kopírování. Klíčem je cesta ke zdroji, jeho velikost a čas změny; při
+překročení limitu se mažou nejdéle nepoužité soubory.
+
+Umístění cache lze změnit proměnnou prostředí PICTOGRAPH_CACHE_DIR.
+"""
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 2 * 2 ** 30
+
+
+def default_cache_dir(name='images'):
+    """Podadresář cache: PICTOGRAPH_CACHE_DIR/<name>, jinak ~/.cache/pictograph/<name>."""
+    root = os.environ.get('PICTOGRAPH_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'pictograph')
+    return os.path.join(root, name)
+
+
+def decode_image(path):
+    """
+    Dekóduje obrázek ze souboru (nebo binárního souborového objektu, např. io.BytesIO)
+    na RGB uint8 (alfa kanál se zahodí jako v qpixmap_to_array).
+    """
+    import matplotlib.image as mpimg
+
+    img = mpimg.imread(path)
+    if img.ndim == 2:
+        img = np.stack([img] * 3, axis=-1)
+    img = img[..., :3]
+    if img.dtype != np.uint8:
+        # PNG se načítá jako float 0..1
+        img = np.rint(np.clip(img, 0.0, 1.0) * 255).astype(np.uint8)
+    return np.ascontiguousarray(img)
+
+
+class DiskCache:
+    """
+    Adresář souborů s příponou `suffix` a limitem celkové velikosti `max_bytes`.
+
+    Čas změny souboru slouží jako čas posledního použití: při zásahu se obnoví
+    (touch) a evict_lru maže od nejstarších.
+    """
+    suffix = '.npy'
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def write_atomic(self, entry, write):
+        """
+        Zapíše záznam přes dočasný soubor a přejmenování, aby souběžné procesy nečetly
+        nedopsaný soubor. `write` dostane otevřený binární soubor. Vrací True při úspěchu.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        # Přípona dočasného souboru nesmí končit `suffix`, jinak by ho jiné procesy počítaly
+        # mezi záznamy (a evict_lru by ho mohl smazat uprostřed zápisu)
+        fd, tmp = tempfile.mkstemp(suffix=self.suffix + '.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp, entry)
+        except OSError as e:
+            print(f"Záznam se nepodařilo uložit do cache: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return False
+        # Právě zapsaný záznam se nemaže, ani když sám přesahuje limit
+        self.evict_lru(keep=entry)
+        return True
+
+    def size(self):
+        """Celková velikost souborů v cache v bajtech."""
+        return sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(self.suffix)]
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def evict_lru(self, max_bytes=None, keep=None):
+        """
+        Smaže nejdéle nepoužité záznamy, dokud celková velikost nepřesahuje `max_bytes`
+        (výchozí je limit cache). Záznam `keep` (cesta) se nemaže. Vrací počet smazaných souborů.
+
+        Na systémech, kde otevřený soubor nelze smazat (Windows), se takový záznam přeskočí.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        removed = 0
+        for _, path, size in entries:
+            if total <= limit:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Smaže všechny záznamy."""
+        return self.evict_lru(0)
+
+
+class ImageCache(DiskCache):
+    """
+    Cache dekódovaných obrázků v adresáři `directory` s limitem `max_bytes`.
+
+    Použití:
+        cache = ImageCache()
+        img = cache.load('spektrum.png')   # memmap pouze pro čtení, tvar (H, W, 3), uint8
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(directory or default_cache_dir('images'), max_bytes)
+
+    def _entry_path(self, path):
+        stat = os.stat(path)
+        source = f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+        digest = hashlib.blake2b(source.encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, digest + '.npy')
+
+    def load(self, path):
+        """
+        Vrátí pixely obrázku jako memmap (RGB uint8, jen pro čtení). Při prvním načtení
+        se obrázek dekóduje a uloží; změna souboru (velikost, čas změny) vede na nový záznam.
+        """
+        entry = self._entry_path(path)
+        try:
+            img = np.load(entry, mmap_mode='r')
+            self.touch(entry)
+            return img
+        except (FileNotFoundError, ValueError):
+            pass
+
+        img = decode_image(path)
+        if not self.write_atomic(entry, lambda f: np.save(f, img)):
+            return img
+        try:
+            return np.load(entry, mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            # Záznam mezitím smazal jiný proces; dekódované pixely máme v paměti
+            return img
+
+
+def load_image_array(path, cache=None):
+    """Načte obrázek jako RGB uint8 pole – přes cache, pokud je zadána, jinak přímým dekódováním."""
+    if cache is None:
+        return decode_image(path)
+    return cache.load(path)
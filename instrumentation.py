@@ -0,0 +1,112 @@
+# instrumentation.py
+"""
+Měření času a alokací jednotlivých kroků zpracování (load, crop, convert, binarize,
+contour, center line, calibrate, cluster, peaks).
+
+Záznamy se drží v paměti pro zobrazení ve status baru a volitelně se zapisují
+jako JSON lines (jeden řádek na krok). Pro zapnutí z GUI stačí nastavit
+proměnné prostředí:
+    PICTOGRAPH_TRACE=cesta/k/souboru.jsonl   zápis záznamů do souboru
+    PICTOGRAPH_TRACE_MEMORY=1                měření peaku alokací (tracemalloc, zpomaluje)
+"""
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+
+
+class Instrumentation:
+    """
+    Sbírá dobu trvání a (volitelně) maximum alokované paměti pro pojmenované kroky.
+
+    Kroky se nemají vnořovat – měření paměti využívá tracemalloc.reset_peak(),
+    takže vnořený krok by vynuloval peak nadřazeného kroku.
+    """
+
+    def __init__(self, jsonl_path=None, track_memory=False):
+        self.jsonl_path = jsonl_path
+        self.track_memory = track_memory
+        self.records = []
+        self.latest = {}  # název kroku -> poslední záznam
+
+    @classmethod
+    def from_env(cls):
+        """Vytvoří instanci podle proměnných PICTOGRAPH_TRACE a PICTOGRAPH_TRACE_MEMORY."""
+        return cls(jsonl_path=os.environ.get('PICTOGRAPH_TRACE') or None,
+                   track_memory=os.environ.get('PICTOGRAPH_TRACE_MEMORY', '') not in ('', '0'))
+
+    @contextlib.contextmanager
+    def stage(self, name, **context):
+        """
+        Kontextový manažer měřící jeden krok. Další klíčové argumenty se uloží do záznamu
+        (např. velikost obrázku).
+        """
+        started_tracing = False
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {'stage': name, 'seconds': time.perf_counter() - start, 'time': time.time()}
+            if self.track_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                record['peak_bytes'] = max(0, peak - base)
+                if started_tracing:
+                    tracemalloc.stop()
+            record.update(context)
+            self._add(record)
+
+    def _add(self, record):
+        self.records.append(record)
+        self.latest[record['stage']] = record
+        if self.jsonl_path:
+            try:
+                with open(self.jsonl_path, 'a') as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"Záznam instrumentace se nepodařilo zapsat: {e}")
+
+    def reset(self, stages=None):
+        """
+        Zapomene záznamy zobrazované v souhrnu (např. při načtení nového obrázku).
+
+        Parameters:
+            stages (iterable, optional): Zapomenout jen tyto kroky; výchozí jsou všechny.
+        """
+        if stages is None:
+            self.latest = {}
+        else:
+            for name in stages:
+                self.latest.pop(name, None)
+
+    def summary(self, stages=None):
+        """
+        Vrátí krátký textový souhrn posledních měření, např. 'convert 12 ms · binarize 40 ms'.
+
+        Parameters:
+            stages (iterable, optional): Pořadí a výběr kroků; výchozí je pořadí posledního měření.
+        """
+        names = stages if stages is not None else self.latest.keys()
+        parts = []
+        for name in names:
+            record = self.latest.get(name)
+            if record is None:
+                continue
+            text = f"{name} {record['seconds'] * 1000:.0f} ms"
+            if 'peak_bytes' in record:
+                text += f" / {record['peak_bytes'] / 2 ** 20:.1f} MB"
+            parts.append(text)
+        return " · ".join(parts)
+
+
+def maybe_stage(instr, name, **context):
+    """Vrátí instr.stage(name), nebo prázdný kontext, pokud instrumentace není zadána."""
+    if instr is None:
+        return contextlib.nullcontext()
+    return instr.stage(name, **context)
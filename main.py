@@ -1,36 +1,76 @@
 import sys
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QVBoxLayout, QHBoxLayout,
-    QPushButton, QFileDialog, QLineEdit, QSizePolicy, QMessageBox, QStatusBar, QDialog, QScrollArea, QColorDialog, QSplitter
+    QPushButton, QFileDialog, QLineEdit, QSizePolicy, QMessageBox, QStatusBar, QDialog, QScrollArea, QColorDialog, QSplitter,
+    QCheckBox, QComboBox, QInputDialog, QListWidget, QListWidgetItem, QSlider, QGridLayout
 )
 from PyQt5.QtGui import QPixmap, QPainter, QPen, QIcon, QImage, QWheelEvent, QMouseEvent, QColor, QGuiApplication
-from PyQt5.QtCore import Qt, QRect, QPoint
+from PyQt5.QtCore import Qt, QRect, QPoint, QTimer, pyqtSignal
 from PyQt5.Qt import QApplication
 
-from simple_line import preprocess_image_from_array, extract_and_plot_contour
-from find_peaks import plot_spectrum_with_peaks
-from clustering import preprocess_image, display_clusters, check_clusters_embedded
+from simple_line import plot_spectra
+from peak_index import PeakIndex
+from spectrum import Spectrum
+from clustering import preprocess_image, display_clusters, check_clusters_embedded, ClusteredImage
+from instrumentation import Instrumentation, maybe_stage
+from pipeline import SpectrumPipeline
+from pyramid import DEFAULT_MEMORY_BUDGET
+from result_cache import ResultCache
+from display_pyramid import DisplayPyramid
+from crop_preview import CropPreview
+from overlay_viewer import OverlayViewer
+from trace_score import score_clusters, best_cluster
+from color_pick import SPACES, DEFAULT_TOLERANCE, pick_color, extract_color_center_line, mask_image, mask_to_binary
+from stitching import default_tolerance
+from smoothing import smooth, pixel_quantum
+from axis_detection import detect_axes, calibrate_from_ticks
+from batch import Job, run_job, export_results_csv, default_workers, results_to_spectra
+from roi import ROI, detect_panels, panel_name, submit_rois
+from session import Session, save_session, SESSION_FILTER
+from qt_adapters import qpixmap_to_array, qpixmap_to_rgba, array_to_qpixmap, arrays_to_qpolygonf
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
+import multiprocessing
+import os
+import time
 
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
 import io
 import numpy as np
 import csv
 import tempfile
 
-def qpixmap_to_array(pixmap):
-    # Převod QPixmap na QImage
-    qimage = pixmap.toImage().convertToFormat(QImage.Format_RGBA8888)
-    width = qimage.width()
-    height = qimage.height()
-    ptr = qimage.bits()
-    ptr.setsize(qimage.byteCount())
-    arr = np.array(ptr).reshape(height, width, 4)
-    # Vrátíme pouze RGB kanály
-    return arr[..., :3]
+# Pořadí kroků v souhrnu instrumentace ve status baru
+PIPELINE_STAGES = ('load', 'crop', 'convert', 'digest', 'binarize', 'contour', 'center line', 'pyramid', 'traces',
+                   'calibrate', 'calibrate traces', 'smooth', 'plot', 'cluster', 'peak index')
+# Kroky zpracování spektra; kroky převzaté z cache pipeline se v souhrnu nezobrazují
+PROCESS_STAGES = PIPELINE_STAGES[2:13]
+
+
+def paint_stroke(image, x, y, radius, rgba):
+    """
+    Jeden tah gumy/štětce do QImage: kruh o poloměru `radius` se středem (x, y).
+
+    Parameters:
+        rgba (int): Barva jako QColor.rgba(), nebo -1 pro vymazání do průhledna.
+    """
+    painter = QPainter(image)
+    painter.setPen(Qt.NoPen)
+    if rgba >= 0:
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        painter.setBrush(QColor.fromRgba(rgba))
+    else:
+        painter.setCompositionMode(QPainter.CompositionMode_Clear)
+        painter.setBrush(Qt.black)
+    painter.drawEllipse(QPoint(x, y), radius, radius)
+    painter.end()
 
 
 class ClusterWindow(QWidget):
+    THUMBNAIL_SIZE = (260, 120)  # náhled středové linky clusteru
+
     def __init__(self, cropped_pixmap=None, target_label=None):
         super().__init__()
         self.setWindowTitle("Cluster Window")
@@ -113,7 +153,8 @@ class ClusterWindow(QWidget):
             "Toto okno slouží k generování clusterů z oříznutého obrázku. "
             "Zadejte počet clusterů a klikněte na tlačítko <b>vygeneruj clustery</b> "
             "pro zobrazení výsledků.<br>"
-            "Zvolte co nejmenší nutné množství clusterů. Příliš velké množství clusterů může způsobit necelistvou konturu a následné zpracování spektra zpracuje jen část spektra - nejdelší celistvou konturu."
+            "Zvolte co nejmenší nutné množství clusterů. Příliš velké množství clusterů může způsobit necelistvou konturu a následné zpracování spektra zpracuje jen část spektra - nejdelší celistvou konturu. "
+            "Přerušenou konturu lze spojit volbou <b>Spojit přerušenou křivku</b> v hlavním okně."
         )
         help_label.setWordWrap(True)
         help_label.setStyleSheet("font-size: 14px; color: #555;")
@@ -147,34 +188,139 @@ class ClusterWindow(QWidget):
             self.results_layout.addWidget(error_label)
             return
 
-        # Vyprázdnit předchozí výsledky
+        # Vyprázdnit předchozí výsledky (a zastavit hodnocení předchozích clusterů)
+        self.cancel_scoring()
         while self.results_layout.count():
             child = self.results_layout.takeAt(0)
             if child.widget():
                 child.widget().deleteLater()
 
         # Zavoláme funkci, která zpracuje obrázek a vrátí seznam cest k výsledným obrázkům.
-        image_paths = check_clusters_embedded(cluster_count, temp_sample)
+        main_window = self.target_label.window() if self.target_label else None
+        instr = getattr(main_window, 'instrumentation', None)
+        with maybe_stage(instr, 'cluster', k=cluster_count):
+            image_paths, self.clustered = check_clusters_embedded(cluster_count, temp_sample,
+                                                                  return_clustered=True)
+        if hasattr(main_window, 'show_diagnostics'):
+            main_window.show_diagnostics()
         # Předpokládáme, že první dva obrázky nejsou clusterové (kontrast stretching, přeclusterovaný obrázek)
         cluster_image_paths = image_paths[2:] if len(image_paths) > 2 else image_paths
 
-        # Pro každý cluster vytvoříme tlačítko s obrázkem jako ikonu
-        for path in cluster_image_paths:
+        # Souběžné hodnocení clusterů jako křivky; výsledky se doplňují časovačem
+        self.score_futures = score_clusters(self.clustered.labels, self.clustered.k)
+        self.scores = [None] * self.clustered.k
+        self.cluster_rows = {}
+
+        self.btn_use_best = QPushButton("Hodnotím clustery…")
+        self.btn_use_best.setStyleSheet("font-size: 18px; padding: 10px;")
+        self.btn_use_best.setEnabled(False)
+        self.btn_use_best.clicked.connect(self.select_best)
+        self.results_layout.addWidget(self.btn_use_best)
+
+        # Pro každý cluster řádek: tlačítko s obrázkem jako ikonou, náhled linky a skóre
+        for index, path in enumerate(cluster_image_paths):
             pixmap = QPixmap(path)
             if pixmap.isNull():
                 continue
+            row = QWidget()
+            row_layout = QHBoxLayout(row)
             button = QPushButton()
             button.setIcon(QIcon(pixmap))
             button.setIconSize(pixmap.size())
             button.setFlat(True)
-            button.clicked.connect(partial(self.select_cluster, pixmap))
-            self.results_layout.addWidget(button)
+            button.clicked.connect(lambda checked=False, p=pixmap, n=index: self.select_cluster(p, n))
+            row_layout.addWidget(button)
+            info_layout = QVBoxLayout()
+            label_trace = QLabel("…")
+            label_trace.setFixedSize(*self.THUMBNAIL_SIZE)
+            label_trace.setAlignment(Qt.AlignCenter)
+            label_trace.setStyleSheet("background-color: white; border: 1px solid #ccc;")
+            info_layout.addWidget(label_trace)
+            label_score = QLabel()
+            label_score.setStyleSheet("font-size: 14px;")
+            info_layout.addWidget(label_score)
+            info_layout.addStretch(1)
+            row_layout.addLayout(info_layout)
+            self.results_layout.addWidget(row)
+            self.cluster_rows[index] = (row, pixmap, label_trace, label_score)
+
+        self.score_timer = QTimer(self)
+        self.score_timer.timeout.connect(self.poll_scores)
+        self.score_timer.start(100)
+
+    def cancel_scoring(self):
+        """Zastaví vyzvedávání skóre a zruší hodnocení clusterů, které ještě nezačalo."""
+        if getattr(self, 'score_timer', None) is not None:
+            self.score_timer.stop()
+        for future in getattr(self, 'score_futures', []):
+            future.cancel()
+        self.score_futures = []
+
+    def closeEvent(self, event):
+        self.cancel_scoring()
+        super().closeEvent(event)
+
+    def trace_thumbnail(self, center_line):
+        """Náhled středové linky (pixely clusteru) v malém grafu."""
+        width, height = self.THUMBNAIL_SIZE
+        pixmap = QPixmap(width, height)
+        pixmap.fill(Qt.white)
+        img_height, img_width = self.clustered.labels.shape
+        scale = min((width - 8) / img_width, (height - 8) / img_height)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing, True)
+        painter.setPen(QPen(QColor(0, 120, 215), 1.5))
+        painter.drawPolyline(arrays_to_qpolygonf(4 + center_line[:, 1] * scale, 4 + center_line[:, 0] * scale))
+        painter.end()
+        return pixmap
+
+    def poll_scores(self):
+        for index, future in enumerate(self.score_futures):
+            if self.scores[index] is not None or not future.done():
+                continue
+            try:
+                self.scores[index] = future.result()
+            except Exception as e:
+                self.scores[index] = {'score': 0.0, 'center_line': None, 'error': str(e)}
+            if index not in self.cluster_rows:
+                continue
+            _, _, label_trace, label_score = self.cluster_rows[index]
+            score = self.scores[index]
+            if score['center_line'] is not None:
+                label_trace.setPixmap(self.trace_thumbnail(score['center_line']))
+            else:
+                label_trace.setText("bez křivky")
+            label_score.setText(
+                f"Skóre {score['score']:.2f}<br>"
+                f"pokrytí {score.get('coverage', 0):.2f}, jednoznačnost {score.get('single', 0):.2f},<br>"
+                f"délka {score.get('length', 0):.2f}, tenkost {score.get('thin', 0):.2f}")
+        if all(score is not None for score in self.scores):
+            self.score_timer.stop()
+            self.preselect(best_cluster(self.scores))
+
+    def preselect(self, index):
+        """Zvýrazní nejlépe hodnocený cluster a nabídne ho tlačítkem."""
+        self.best_index = index if index in self.cluster_rows else None
+        if self.best_index is None:
+            self.btn_use_best.setText("Žádný cluster nevypadá jako křivka")
+            return
+        row = self.cluster_rows[self.best_index][0]
+        row.setObjectName("best_cluster")
+        row.setStyleSheet("#best_cluster { border: 3px solid #2a2; }")
+        self.btn_use_best.setText(f"Použít nejlepší (cluster {self.best_index})")
+        self.btn_use_best.setEnabled(True)
+        self.btn_use_best.setDefault(True)
+        self.scroll_area.ensureWidgetVisible(row)
+
+    def select_best(self):
+        if getattr(self, 'best_index', None) is not None:
+            self.select_cluster(self.cluster_rows[self.best_index][1], self.best_index)
     # def select_cluster(self, pixmap):
     #     """Při výběru clusteru nastaví vybraný obrázek do cílového widgetu a zavře okno."""
     #     if self.target_label:
     #         self.target_label.setPixmap(pixmap)
     #     self.close()
-    def select_cluster(self, pixmap):
+    def select_cluster(self, pixmap, index=None):
         """Při výběru clusteru nastaví vybraný obrázek do cílového widgetu,
         uloží jej do instance full_quality_cropped a zavře okno."""
         if self.target_label:
@@ -182,7 +328,169 @@ class ClusterWindow(QWidget):
             main_window = self.target_label.window()
             if hasattr(main_window, 'full_quality_cropped'):
                 main_window.full_quality_cropped = pixmap
+            # Mapa labelů a paleta pro uložení sezení (bez nového KMeans po načtení)
+            if hasattr(main_window, 'cluster_state') and index is not None:
+                main_window.cluster_state = (getattr(self, 'clustered', None), index)
+                main_window.eraser_strokes = []
         self.close()
+class PickLabel(QLabel):
+    """Obrázek zmenšený do okna; kliknutí vyšle souřadnice v pixelech původního obrázku."""
+    picked = pyqtSignal(int, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAlignment(Qt.AlignCenter)
+        self.setMinimumSize(200, 150)
+        self.source_size = None
+
+    def mousePressEvent(self, event):
+        displayed = self.pixmap()
+        if self.source_size is None or not displayed or displayed.width() == 0:
+            return
+        offset_x = (self.width() - displayed.width()) // 2
+        offset_y = (self.height() - displayed.height()) // 2
+        x = int((event.pos().x() - offset_x) * self.source_size[0] / displayed.width())
+        y = int((event.pos().y() - offset_y) * self.source_size[1] / displayed.height())
+        if 0 <= x < self.source_size[0] and 0 <= y < self.source_size[1]:
+            self.picked.emit(x, y)
+
+
+class ColorPickWindow(QWidget):
+    """
+    Izolace křivky podle barvy: kliknutím na křivku se vybere barva, maska pixelů podobné
+    barvy jde rovnou do hledání středové linky (color_pick.py). Náhled ukazuje masku
+    a nalezenou linku; tlačítko Použít předá masku jako pracovní obrázek hlavnímu oknu.
+    """
+
+    def __init__(self, cropped_pixmap, main_window):
+        super().__init__()
+        self.setWindowTitle("Výběr barvy křivky")
+        self.setWindowIcon(QIcon("ikonaramanbase.ico"))
+        self.main_window = main_window
+        self.image = qpixmap_to_array(cropped_pixmap)
+        self.color = None
+        self.mask = None
+        self.center_line = None
+        self.mask_pixmap = None  # maska v barvě křivky v plném rozlišení (náhled se z ní jen škáluje)
+        self.init_ui(cropped_pixmap)
+        self.resize(1200, 700)
+
+    def init_ui(self, cropped_pixmap):
+        layout = QVBoxLayout(self)
+        images = QHBoxLayout()
+        self.label_source = PickLabel()
+        self.label_source.source_size = (self.image.shape[1], self.image.shape[0])
+        self.source_pixmap = cropped_pixmap
+        self.label_source.picked.connect(self.pick)
+        images.addWidget(self.label_source, 1)
+        self.label_preview = QLabel("Klikněte na křivku v levém obrázku.")
+        self.label_preview.setAlignment(Qt.AlignCenter)
+        self.label_preview.setStyleSheet("background-color: #eee; border: 1px solid #ccc;")
+        images.addWidget(self.label_preview, 1)
+        layout.addLayout(images)
+
+        controls = QHBoxLayout()
+        self.color_indicator = ColorIndicator()
+        controls.addWidget(self.color_indicator)
+        controls.addWidget(QLabel("Prostor:"))
+        self.combo_space = QComboBox()
+        for space in SPACES:
+            self.combo_space.addItem("Lab (ΔE)" if space == 'lab' else "RGB", space)
+        self.combo_space.currentIndexChanged.connect(self.change_space)
+        controls.addWidget(self.combo_space)
+        controls.addWidget(QLabel("Tolerance:"))
+        self.input_tolerance = QLineEdit(f"{DEFAULT_TOLERANCE['lab']:g}")
+        self.input_tolerance.setFixedWidth(60)
+        self.input_tolerance.editingFinished.connect(self.update_preview)
+        controls.addWidget(self.input_tolerance)
+        self.check_stitch = QCheckBox("Spojit přerušenou křivku")
+        self.check_stitch.setChecked(self.main_window.check_stitch.isChecked())
+        self.check_stitch.stateChanged.connect(self.update_preview)
+        controls.addWidget(self.check_stitch)
+        self.label_info = QLabel()
+        self.label_info.setStyleSheet("color: #555;")
+        controls.addWidget(self.label_info, 1)
+        self.btn_apply = QPushButton("Použít")
+        self.btn_apply.setStyleSheet("font-size: 16px; padding: 6px;")
+        self.btn_apply.setEnabled(False)
+        self.btn_apply.clicked.connect(self.apply)
+        controls.addWidget(self.btn_apply)
+        layout.addLayout(controls)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.label_source.setPixmap(self.source_pixmap.scaled(self.label_source.size(), Qt.KeepAspectRatio,
+                                                              Qt.SmoothTransformation))
+        if self.mask is not None:
+            self.show_preview()
+
+    def pick(self, x, y):
+        self.color = pick_color(self.image, x, y)
+        self.color_indicator.setColor(QColor(*self.color))
+        self.update_preview()
+
+    def change_space(self):
+        self.input_tolerance.setText(f"{DEFAULT_TOLERANCE[self.combo_space.currentData()]:g}")
+        self.update_preview()
+
+    def update_preview(self):
+        if self.color is None:
+            return
+        try:
+            tolerance = float(self.input_tolerance.text().replace(',', '.'))
+        except ValueError:
+            self.label_info.setText("Neplatná tolerance.")
+            return
+        stitch_tolerance = default_tolerance(self.image.shape) if self.check_stitch.isChecked() else None
+        start = time.perf_counter()
+        try:
+            center_line, _, self.mask = extract_color_center_line(
+                self.image, self.color, tolerance, self.combo_space.currentData(), stitch_tolerance)
+        except ValueError as e:
+            self.mask = None
+            self.mask_pixmap = None
+            self.btn_apply.setEnabled(False)
+            self.label_preview.setText(str(e))
+            self.label_info.setText("")
+            return
+        seconds = time.perf_counter() - start
+        self.center_line = center_line
+        self.mask_pixmap = array_to_qpixmap(mask_image(self.mask, self.color, (235, 235, 235)))
+        self.show_preview()
+        self.label_info.setText(f"{int(self.mask.sum())} px křivky, linka {len(center_line)} bodů, "
+                                f"{seconds * 1000:.0f} ms")
+        self.btn_apply.setEnabled(True)
+
+    def show_preview(self):
+        """Náhled: maska v barvě křivky a nalezená středová linka, zmenšené na velikost panelu."""
+        preview = self.mask_pixmap.scaled(self.label_preview.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        scale = preview.width() / self.image.shape[1]
+        painter = QPainter(preview)
+        painter.setRenderHint(QPainter.Antialiasing, True)
+        painter.setPen(QPen(QColor(0, 170, 255), 2))
+        painter.drawPolyline(arrays_to_qpolygonf(self.center_line[:, 1] * scale, self.center_line[:, 0] * scale))
+        painter.end()
+        self.label_preview.setPixmap(preview)
+
+    def apply(self):
+        """
+        Předá masku (černá křivka na bílém) hlavnímu oknu jako pracovní obrázek a k ní
+        vyčištěnou binární masku, takže zpracování použije stejnou extrakci jako náhled.
+        """
+        if self.mask is None:
+            return
+        pixmap = array_to_qpixmap(mask_image(self.mask))
+        main_window = self.main_window
+        main_window.full_quality_cropped = pixmap
+        main_window.color_binary = (pixmap.cacheKey(), mask_to_binary(self.mask.copy()))
+        main_window.label_cropped.setPixmap(pixmap.scaled(main_window.label_cropped.size(), Qt.KeepAspectRatio,
+                                                          Qt.SmoothTransformation))
+        main_window.cluster_state = None
+        main_window.eraser_strokes = []
+        main_window.statusBar().showMessage(f"Křivka barvy #{'%02x%02x%02x' % self.color} izolována.", 3000)
+        self.close()
+
+
 class MagnifierLabel(QLabel):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -228,16 +536,89 @@ class CropLabel(QLabel):
         self.show_crosshair = False
         self.current_cursor_pos = QPoint(0, 0)
         self._pixmap = None
+        self.display_pyramid = None
+        # Živý náhled extrakce při tažení výběru
+        self.live_preview = True
+        self.preview = CropPreview(self)
+        self.preview.updated.connect(self.update)
+        # Rám s nalezenými značkami, jejichž hodnoty se právě zadávají (AxisFrame v pixelech zdroje)
+        self.tick_frame = None
+        # Oblasti dávky více ROI: (název, (x, y, šířka, výška)) v pixelech zdroje
+        self.rois = []
     def setPixmap(self, pixmap):
         self._pixmap = pixmap
+        self.drop_display_pyramid()
+        self.preview.set_source(pixmap.toImage() if pixmap is not None else None)
         super().setPixmap(pixmap)
 
+    def set_source(self, pixmap):
+        """
+        Zobrazí velký obrázek přes pyramidu předškálovaných úrovní (počítaných na pozadí),
+        takže změna velikosti nevyhlazuje celý originál v hlavním vlákně.
+        """
+        self._pixmap = pixmap
+        self.drop_display_pyramid()
+        # Převod na QImage jen jednou, sdílí ho pyramida i náhled
+        image = pixmap.toImage()
+        self.preview.set_source(image)
+        self.display_pyramid = DisplayPyramid(pixmap, parent=self, image=image)
+        self.display_pyramid.ready.connect(self.refresh_display)
+        self.refresh_display()
+
+    def drop_display_pyramid(self):
+        """Uvolní pyramidu předchozího obrázku (jinak by s ní label držel celý originál)."""
+        if self.display_pyramid is not None:
+            self.display_pyramid.ready.disconnect(self.refresh_display)
+            self.display_pyramid.release()
+            self.display_pyramid.deleteLater()
+            self.display_pyramid = None
+
+    def refresh_display(self):
+        if self.display_pyramid is not None:
+            super().setPixmap(self.display_pyramid.scaled(self.size()))
+
     def resizeEvent(self, event):
-        if self._pixmap:
+        if self.display_pyramid is not None:
+            self.refresh_display()
+        elif self._pixmap:
             # Škálování obrázku tak, aby se vešel do aktuální velikosti widgetu
             scaled = self._pixmap.scaled(self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
             super().setPixmap(scaled)
         super().resizeEvent(event)
+
+    def display_transform(self):
+        """
+        Vrátí (offset_x, offset_y, scale_x, scale_y) převodu mezi widgetem a pixely zdroje:
+        zdroj = (widget - offset) * scale. Bez obrázku vrátí None.
+        """
+        displayed = self.pixmap()
+        if self._pixmap is None or not displayed or displayed.width() == 0 or displayed.height() == 0:
+            return None
+        offset_x = (self.width() - displayed.width()) // 2
+        offset_y = (self.height() - displayed.height()) // 2
+        return (offset_x, offset_y, self._pixmap.width() / displayed.width(),
+                self._pixmap.height() / displayed.height())
+
+    def selection_to_source(self):
+        """Převede výběr na obdélník v pixelech zdrojového obrázku (nebo None)."""
+        transform = self.display_transform()
+        if transform is None or not self.selection_rect:
+            return None
+        offset_x, offset_y, scale_x, scale_y = transform
+        displayed = self.pixmap()
+        sel = self.selection_rect
+        x = max(sel.x() - offset_x, 0)
+        y = max(sel.y() - offset_y, 0)
+        w = min(sel.width(), displayed.width() - x)
+        h = min(sel.height(), displayed.height() - y)
+        return QRect(int(x * scale_x), int(y * scale_y), int(w * scale_x), int(h * scale_y))
+
+    def request_preview(self):
+        if self.live_preview:
+            rect = self.selection_to_source()
+            if rect is not None:
+                self.preview.request(rect)
+
     def enterEvent(self, event):
         # Zobrazí lupu, jakmile kurzor vstoupí do widgetu
         self.magnifier.show()
@@ -261,6 +642,7 @@ class CropLabel(QLabel):
             self.end_point = self.start_point
             self.selection_rect = QRect(self.start_point, self.end_point)
             self.drawing = True
+            self.preview.clear()
             self.updateMagnifier(event)
             self.update()
         super().mousePressEvent(event)
@@ -276,6 +658,7 @@ class CropLabel(QLabel):
                 # Jinak (bez Shift) používáme start_point (nastavený při kliknutí)
                 self.end_point = event.pos()
                 self.selection_rect = QRect(self.start_point, self.end_point).normalized()
+            self.request_preview()
             self.updateMagnifier(event)
         else:
             # Pokud se jen pohybujeme, aktualizujeme lupu
@@ -288,6 +671,7 @@ class CropLabel(QLabel):
             self.end_point = event.pos()
             self.selection_rect = QRect(self.start_point, self.end_point).normalized()
             self.drawing = False
+            self.request_preview()
             self.update()
 
     def keyPressEvent(self, event):
@@ -331,6 +715,8 @@ class CropLabel(QLabel):
                 self.selection_anchor = None
             if self.drawing:
                 self.selection_rect = QRect(self.start_point, new_pos).normalized()
+        if shift_pressed or self.drawing:
+            self.request_preview()
 
         self.current_cursor_pos = new_pos
         self.updateMagnifierAtPos(new_pos)
@@ -514,6 +900,37 @@ class CropLabel(QLabel):
             pen = QPen(Qt.red, 2, Qt.SolidLine)
             painter.setPen(pen)
             painter.drawRect(self.selection_rect)
+        transform = self.display_transform()
+        if self.rois and transform is not None:
+            offset_x, offset_y, scale_x, scale_y = transform
+            painter.setPen(QPen(QColor(255, 140, 0), 2, Qt.DashLine))
+            for name, (x, y, w, h) in self.rois:
+                rect = QRect(int(x / scale_x) + offset_x, int(y / scale_y) + offset_y,
+                             int(w / scale_x), int(h / scale_y))
+                painter.drawRect(rect)
+                painter.drawText(rect.topLeft() + QPoint(4, 14), name)
+        if self.tick_frame is not None and transform is not None:
+            # Očíslované značky, aby bylo zřejmé, ke kterým se zadávané hodnoty vztahují
+            offset_x, offset_y, scale_x, scale_y = transform
+            frame = self.tick_frame
+            painter.setPen(QPen(QColor(0, 160, 0), 2, Qt.SolidLine))
+            bottom = int(frame.bottom / scale_y) + offset_y
+            for number, x in enumerate(frame.x_ticks, start=1):
+                px = int(x / scale_x) + offset_x
+                painter.drawLine(px, bottom - 8, px, bottom + 8)
+                painter.drawText(QPoint(px - 4, bottom + 22), str(number))
+            left = int(frame.left / scale_x) + offset_x
+            for number, y in enumerate(frame.y_ticks, start=1):
+                py = int(y / scale_y) + offset_y
+                painter.drawLine(left - 8, py, left + 8, py)
+                painter.drawText(QPoint(left - 24, py + 5), str(number))
+        if self.live_preview and self.preview.line is not None and transform is not None:
+            # Náhled linky je v pixelech zdroje, takže sedí i po změně velikosti okna
+            offset_x, offset_y, scale_x, scale_y = transform
+            line = self.preview.line
+            painter.setPen(QPen(QColor(0, 170, 255), 2, Qt.SolidLine))
+            painter.drawPolyline(arrays_to_qpolygonf(line[:, 1] / scale_x + offset_x,
+                                                     line[:, 0] / scale_y + offset_y))
         if self.show_crosshair and self.current_cursor_pos:
             cross_pen = QPen(Qt.green, 1, Qt.DashLine)
             painter.setPen(cross_pen)
@@ -615,6 +1032,9 @@ class EraserImageWindow(QWidget):
             main_window = self.target_label.window()
             if hasattr(main_window, 'full_quality_cropped'):
                 main_window.full_quality_cropped = new_pixmap
+            # Historie tahů pro uložení sezení
+            if hasattr(main_window, 'eraser_strokes'):
+                main_window.eraser_strokes = main_window.eraser_strokes + self.canvas.stroke_log
         self.close()
 class QScrollAreaWithCentering(QScrollArea):
     def __init__(self, widget, parent=None):
@@ -654,6 +1074,9 @@ class Canvas(QWidget):
         self.brush_color = QColor("white")
         # Zásobník pro undo – inicializován počátečním stavem
         self.undo_stack = [self.image.copy()]
+        # Záznam tahů (x, y, poloměr, rgba nebo -1 pro vymazání) a začátky jednotlivých tahů myší pro undo
+        self.stroke_log = []
+        self.stroke_marks = []
         self.update()
         self.setWindowIcon(QIcon("ikonaramanbase.ico"))
 
@@ -699,6 +1122,7 @@ class Canvas(QWidget):
         elif event.button() == Qt.LeftButton:
             # Uložíme aktuální stav před úpravou
             self.undo_stack.append(self.image.copy())
+            self.stroke_marks.append(len(self.stroke_log))
             self.paintAt(event)
         else:
             super().mousePressEvent(event)
@@ -711,28 +1135,573 @@ class Canvas(QWidget):
         pos = event.pos()
         x = int(pos.x() / self.zoom_factor)
         y = int(pos.y() / self.zoom_factor)
-        painter = QPainter(self.image)
-        painter.setPen(Qt.NoPen)
-        if self.brush_color is not None:
-            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
-            painter.setBrush(self.brush_color)
-        else:
-            painter.setCompositionMode(QPainter.CompositionMode_Clear)
-            painter.setBrush(Qt.black)
-        painter.drawEllipse(QPoint(x, y), self.eraserRadius, self.eraserRadius)
-        painter.end()
+        rgba = self.brush_color.rgba() if self.brush_color is not None else -1
+        paint_stroke(self.image, x, y, self.eraserRadius, rgba)
+        self.stroke_log.append((x, y, self.eraserRadius, rgba))
         self.update()
 
     def undo(self):
         # Pokud je v zásobníku více než jeden stav, vrátíme se o jeden krok zpět
+        # (na stav uložený před posledním tahem, počáteční stav zůstává dole)
         if len(self.undo_stack) > 1:
-            self.undo_stack.pop()
-            self.image = self.undo_stack[-1].copy()
+            self.image = self.undo_stack.pop()
+            del self.stroke_log[self.stroke_marks.pop():]
             self.update()
+class PeakExplorerWindow(QWidget):
+    """
+    Spektrum s peaky a posuvníky prahů výšky, prominence a vzdálenosti.
+
+    Kandidáti na peaky se spočítají jednou (PeakIndex), posuvník jen filtruje index
+    a přesune značky v již vykresleném grafu, takže se peaky mění plynule při tažení.
+    """
+    STEPS = 1000
+
+    def __init__(self, main_window):
+        super().__init__()
+        self.setWindowTitle("Peak Explorer")
+        self.main_window = main_window
+        self.index = None
+        self.init_ui()
+        self.resize(1000, 700)
+        self.setWindowIcon(QIcon("ikonaramanbase.ico"))
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        self.figure = Figure(figsize=(10, 6))
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.ax = self.figure.add_subplot(111)
+        layout.addWidget(self.canvas)
+
+        controls = QGridLayout()
+        self.slider_height = QSlider(Qt.Horizontal)
+        self.slider_prominence = QSlider(Qt.Horizontal)
+        self.slider_distance = QSlider(Qt.Horizontal)
+        self.label_height = QLabel()
+        self.label_prominence = QLabel()
+        self.label_distance = QLabel()
+        for row, (name, slider, label) in enumerate((("Sensitivity (výška):", self.slider_height, self.label_height),
+                                                     ("Prominence:", self.slider_prominence, self.label_prominence),
+                                                     ("Min distance:", self.slider_distance, self.label_distance))):
+            controls.addWidget(QLabel(name), row, 0)
+            controls.addWidget(slider, row, 1)
+            label.setFixedWidth(90)
+            controls.addWidget(label, row, 2)
+            slider.valueChanged.connect(self.update_peaks)
+        layout.addLayout(controls)
+
+        self.label_peaks = QLabel()
+        self.label_peaks.setWordWrap(True)
+        self.label_peaks.setStyleSheet("font-size: 14px;")
+        layout.addWidget(self.label_peaks)
+
+    def set_spectrum(self, data_x, data_y, index, sensitivity, min_distance, prominence=0.0):
+        """Vykreslí spektrum a nastaví posuvníky na zadané prahy."""
+        self.data_x, self.data_y, self.index = data_x, data_y, index
+        self.ax.clear()
+        self.ax.plot(data_x, data_y, label="Spectrum")
+        self.markers, = self.ax.plot([], [], 'rv', label="Peaks")
+        self.ax.set_xlabel("Wavenumber")
+        self.ax.set_ylabel("Intensity")
+        self.ax.set_title("Spectrum with Peaks")
+        self.ax.legend()
+        self.ax.grid(True, linestyle='--', linewidth=0.5)
+
+        self.y_range = (float(np.min(data_y)), float(np.max(data_y)))
+        self.max_prominence = float(index.prominences.max()) if len(index) else 1.0
+        for slider, maximum in ((self.slider_height, self.STEPS), (self.slider_prominence, self.STEPS),
+                                (self.slider_distance, max(1, min(len(data_y) // 2, 500)))):
+            slider.blockSignals(True)
+            slider.setRange(0 if slider is not self.slider_distance else 1, maximum)
+        self.slider_height.setValue(self._to_steps(sensitivity, *self.y_range))
+        self.slider_prominence.setValue(self._to_steps(prominence, 0.0, self.max_prominence))
+        self.slider_distance.setValue(int(min_distance))
+        for slider in (self.slider_height, self.slider_prominence, self.slider_distance):
+            slider.blockSignals(False)
+        self.update_peaks()
+
+    def _to_steps(self, value, lo, hi):
+        if hi <= lo:
+            return 0
+        return int(round(np.clip((value - lo) / (hi - lo), 0.0, 1.0) * self.STEPS))
+
+    def thresholds(self):
+        lo, hi = self.y_range
+        height = lo + self.slider_height.value() / self.STEPS * (hi - lo)
+        prominence = self.slider_prominence.value() / self.STEPS * self.max_prominence
+        return height, prominence, self.slider_distance.value()
+
+    def update_peaks(self):
+        if self.index is None:
+            return
+        height, prominence, distance = self.thresholds()
+        peaks = self.index.query(height, prominence, distance)
+        self.markers.set_data(self.data_x[peaks], self.data_y[peaks])
+        self.canvas.draw_idle()
+
+        self.label_height.setText(f"{height:.3g}")
+        self.label_prominence.setText(f"{prominence:.3g}")
+        self.label_distance.setText(str(distance))
+        positions = ", ".join(f"{x:.1f}" for x in self.data_x[peaks][:40])
+        more = " …" if len(peaks) > 40 else ""
+        self.label_peaks.setText(f"<b>{len(peaks)}</b> peaků: {positions}{more}")
+        if self.main_window.spectra:
+            self.main_window.spectra[0].peaks = peaks
+        # Prahy se propíší do hlavního okna (další zpracování, uložení sezení)
+        self.main_window.input_sensitivity.setText(f"{height:.6g}")
+        self.main_window.input_min_distance.setText(str(distance))
+
+
+def result_spectra_names(spectra):
+    """Názvy spekter z results_to_spectra: název úlohy, při více křivkách úlohy s pořadím křivky."""
+    counts = {}
+    for s in spectra:
+        counts[s.source['job']] = counts.get(s.source['job'], 0) + 1
+    return [s.source['job'] if counts[s.source['job']] == 1 else f"{s.source['job']} #{s.source['trace'] + 1}"
+            for s in spectra]
+
+
+class JobQueueWindow(QWidget):
+    """
+    Fronta úloh: více obrázků nebo výřezů se zpracuje paralelně v pracovních procesech,
+    výsledky přibývají do seznamu průběžně a na konci se dají exportovat najednou.
+    """
+
+    def __init__(self, main_window):
+        super().__init__()
+        self.setWindowTitle("Job Queue")
+        self.main_window = main_window
+        self.jobs = []  # (Job, QListWidgetItem)
+        self.futures = {}  # index úlohy -> Future
+        self.results = {}  # index úlohy -> výsledek run_job
+        self.executor = None
+        # Dokončené úlohy se vyzvedávají v hlavním vlákně, aby se seznam mohl bezpečně aktualizovat
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(100)
+        self.poll_timer.timeout.connect(self.poll_results)
+        self.setAcceptDrops(True)
+        self.init_ui()
+        self.setWindowIcon(QIcon("ikonaramanbase.ico"))
+        self.resize(600, 500)
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        help_label = QLabel(
+            "Obrázky přidejte tlačítkem <b>Přidat obrázky</b> nebo je sem přetáhněte, aktuální výběr "
+            "hlavního okna přidá tlačítko <b>Přidat výřez</b>. Meze os a volby se převezmou z hlavního okna "
+            "v okamžiku přidání úlohy. Tlačítko <b>Spustit</b> zpracuje všechny čekající úlohy na pozadí."
+        )
+        help_label.setWordWrap(True)
+        help_label.setStyleSheet("font-size: 14px; color: #555;")
+        layout.addWidget(help_label)
+
+        self.list_jobs = QListWidget()
+        layout.addWidget(self.list_jobs)
+
+        buttons_layout = QHBoxLayout()
+        self.btn_add_images = QPushButton("Přidat obrázky")
+        self.btn_add_images.clicked.connect(self.add_images)
+        self.btn_add_crop = QPushButton("Přidat výřez")
+        self.btn_add_crop.clicked.connect(self.add_crop)
+        self.btn_run = QPushButton("Spustit")
+        self.btn_run.clicked.connect(self.run_jobs)
+        self.btn_export_all = QPushButton("Exportovat vše")
+        self.btn_export_all.clicked.connect(self.export_all)
+        self.btn_compare = QPushButton("Porovnat")
+        self.btn_compare.clicked.connect(self.compare_results)
+        self.btn_clear = QPushButton("Vyčistit")
+        self.btn_clear.clicked.connect(self.clear_jobs)
+        for btn in [self.btn_add_images, self.btn_add_crop, self.btn_run, self.btn_export_all, self.btn_compare,
+                    self.btn_clear]:
+            btn.setStyleSheet("font-size: 16px; padding: 6px;")
+            buttons_layout.addWidget(btn)
+        layout.addLayout(buttons_layout)
+
+    def add_job(self, job):
+        item = QListWidgetItem(f"{job.name} – čeká")
+        self.list_jobs.addItem(item)
+        self.jobs.append((job, item))
+
+    def add_paths(self, paths):
+        options = self.main_window.processing_options()
+        if options is None:
+            return
+        for path in paths:
+            self.add_job(Job(os.path.basename(path), path=path, **options))
+
+    def add_images(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "Přidat obrázky", "", "Image Files (*.png *.jpg *.bmp)")
+        if paths:
+            self.add_paths(paths)
+
+    def add_crop(self):
+        rect = self.main_window.selection_to_original()
+        if rect is None:
+            QMessageBox.information(self, "Informace", "V hlavním okně načtěte obrázek a vyberte oblast!")
+            return
+        options = self.main_window.processing_options()
+        if options is None:
+            return
+        crop = (rect.x(), rect.y(), rect.width(), rect.height())
+        path = self.main_window.original_path
+        base = os.path.basename(path) if path else "clipboard"
+        name = f"{base} [{crop[0]},{crop[1]} {crop[2]}x{crop[3]}]"
+        if path:
+            job = Job(name, path=path, crop=crop, **options)
+        else:
+            # Obrázek bez souboru (clipboard) se předá přímo, oříznutý, aby se neposílal celý
+            x, y, w, h = crop
+            image = qpixmap_to_array(self.main_window.original_pixmap)[y:y + h, x:x + w].copy()
+            job = Job(name, image=image, **options)
+        self.add_job(job)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        paths = [p for p in paths if p.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))]
+        if paths:
+            self.add_paths(paths)
+            event.acceptProposedAction()
+
+    def run_jobs(self):
+        pending = [i for i in range(len(self.jobs)) if i not in self.futures and i not in self.results]
+        if not pending:
+            QMessageBox.information(self, "Informace", "Ve frontě nejsou žádné čekající úlohy.")
+            return
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=default_workers())
+        for index in pending:
+            job, item = self.jobs[index]
+            self.futures[index] = self.executor.submit(run_job, job)
+            item.setText(f"{job.name} – zpracovává se")
+        self.poll_timer.start()
+
+    def poll_results(self):
+        for index, future in list(self.futures.items()):
+            if not future.done():
+                continue
+            del self.futures[index]
+            job, item = self.jobs[index]
+            try:
+                result = future.result()
+            except Exception as e:  # např. pád pracovního procesu
+                result = {'name': job.name, 'spectra': [], 'error': str(e), 'seconds': 0.0}
+            self.results[index] = result
+            if result['error'] is None:
+                points = sum(len(x) for x, _ in result['spectra'])
+                item.setText(f"{job.name} – hotovo: křivek {len(result['spectra'])}, bodů {points}, "
+                             f"{result['seconds']:.1f} s")
+            else:
+                item.setText(f"{job.name} – chyba: {result['error']}")
+                item.setForeground(QColor("red"))
+        if not self.futures:
+            self.poll_timer.stop()
+            done = sum(1 for r in self.results.values() if r['error'] is None)
+            self.main_window.statusBar().showMessage(f"Fronta úloh dokončena ({done}/{len(self.results)} úspěšně).",
+                                                     3000)
+
+    def export_all(self):
+        results = [self.results[i] for i in sorted(self.results)]
+        if not results:
+            QMessageBox.warning(self, "Chyba", "Žádná úloha ještě nebyla zpracována!")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export to CSV", "", "CSV Files (*.csv)")
+        if not file_path:
+            return
+        try:
+            export_results_csv(results, file_path)
+            QMessageBox.information(self, "Úspěch", "Export byl úspěšný.")
+        except Exception as e:
+            QMessageBox.critical(self, "Chyba", f"Export selhal: {e}")
+
+    def compare_results(self):
+        spectra = results_to_spectra([self.results[i] for i in sorted(self.results)])
+        if not spectra:
+            QMessageBox.warning(self, "Chyba", "Žádná úloha ještě nebyla úspěšně zpracována!")
+            return
+        self.main_window.open_overlay(spectra, result_spectra_names(spectra))
+
+    def clear_jobs(self):
+        if self.futures:
+            QMessageBox.information(self, "Informace", "Počkejte na dokončení běžících úloh.")
+            return
+        self.jobs = []
+        self.results = {}
+        self.list_jobs.clear()
+
+    def closeEvent(self, event):
+        self.poll_timer.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        self.futures = {}
+        super().closeEvent(event)
+
+
+class RoiWindow(QWidget):
+    """
+    Více oblastí (ROI) jednoho obrázku: panely se přidají z výběru hlavního okna nebo najdou
+    automaticky, každý s vlastní kalibrací, a zpracují se souběžně nad jedním dekódovaným obrázkem.
+    """
+
+    def __init__(self, main_window):
+        super().__init__()
+        self.setWindowTitle("Oblasti (ROI)")
+        self.main_window = main_window
+        self.rois = []  # ROI v pořadí seznamu
+        self.futures = []  # Future pro každou oblast posledního spuštění
+        self.results = []  # výsledky run_job posledního spuštění (pořadí podle rois)
+        self.executor = None
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(100)
+        self.poll_timer.timeout.connect(self.poll_results)
+        self.init_ui()
+        self.setWindowIcon(QIcon("ikonaramanbase.ico"))
+        self.resize(600, 500)
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        help_label = QLabel(
+            "Tlačítko <b>Přidat výběr</b> přidá aktuální výběr hlavního okna i s mezemi os, "
+            "nebo nechte <b>Najít panely</b> najít rámečky grafů a potvrďte hodnoty popisků os každého panelu. "
+            "Tlačítko <b>Zpracovat</b> zpracuje všechny oblasti paralelně, výsledky tvoří jednu označenou dávku."
+        )
+        help_label.setWordWrap(True)
+        help_label.setStyleSheet("font-size: 14px; color: #555;")
+        layout.addWidget(help_label)
+
+        self.list_rois = QListWidget()
+        layout.addWidget(self.list_rois)
+
+        buttons_layout = QHBoxLayout()
+        self.btn_add_selection = QPushButton("Přidat výběr")
+        self.btn_add_selection.clicked.connect(self.add_selection)
+        self.btn_detect = QPushButton("Najít panely")
+        self.btn_detect.clicked.connect(self.detect)
+        self.btn_remove = QPushButton("Odebrat")
+        self.btn_remove.clicked.connect(self.remove_selected)
+        self.btn_run = QPushButton("Zpracovat")
+        self.btn_run.clicked.connect(self.run_rois)
+        self.btn_export_all = QPushButton("Exportovat vše")
+        self.btn_export_all.clicked.connect(self.export_all)
+        self.btn_compare = QPushButton("Porovnat")
+        self.btn_compare.clicked.connect(self.compare_results)
+        self.btn_clear = QPushButton("Vyčistit")
+        self.btn_clear.clicked.connect(self.clear_rois)
+        for btn in [self.btn_add_selection, self.btn_detect, self.btn_remove, self.btn_run, self.btn_export_all,
+                    self.btn_compare, self.btn_clear]:
+            btn.setStyleSheet("font-size: 16px; padding: 6px;")
+            buttons_layout.addWidget(btn)
+        layout.addLayout(buttons_layout)
+
+    @staticmethod
+    def describe(roi):
+        x, y, w, h = roi.crop
+        x_min, x_max, y_min, y_max = roi.limits
+        return f"{roi.name}: {w}x{h} na ({x}, {y}), X {x_min:.6g} – {x_max:.6g}, Y {y_min:.6g} – {y_max:.6g}"
+
+    def add_roi(self, roi):
+        self.rois.append(roi)
+        self.list_rois.addItem(QListWidgetItem(self.describe(roi)))
+        self.results = []
+        self.show_rois()
+
+    def show_rois(self):
+        """Vyznačí oblasti v obrázku hlavního okna."""
+        self.main_window.label_original.rois = [(roi.name, roi.crop) for roi in self.rois]
+        self.main_window.label_original.update()
+
+    def unique_name(self):
+        names = {roi.name for roi in self.rois}
+        index = len(self.rois)
+        while panel_name(index) in names:
+            index += 1
+        return panel_name(index)
+
+    def add_selection(self):
+        rect = self.main_window.selection_to_original()
+        if rect is None or rect.width() < 2 or rect.height() < 2:
+            QMessageBox.information(self, "Informace", "V hlavním okně načtěte obrázek a vyberte oblast!")
+            return
+        options = self.main_window.processing_options()
+        if options is None:
+            return
+        self.add_roi(ROI(self.unique_name(), (rect.x(), rect.y(), rect.width(), rect.height()), options['limits']))
+
+    def detect(self):
+        if self.main_window.original_pixmap is None:
+            QMessageBox.information(self, "Informace", "V hlavním okně načtěte obrázek!")
+            return
+        panels = detect_panels(qpixmap_to_array(self.main_window.original_pixmap))
+        if not panels:
+            QMessageBox.warning(self, "Chyba", "V obrázku nebyl nalezen žádný rám grafu.")
+            return
+        skipped = []
+        for roi in panels:
+            if len(roi.frame.x_ticks) < 2 or len(roi.frame.y_ticks) < 2:
+                skipped.append(roi.name)
+                continue
+            # Nalezený panel se vyznačí, aby bylo vidět, ke kterému se hodnoty značek zadávají
+            self.main_window.label_original.rois = [(r.name, r.crop) for r in self.rois] + [(roi.name, roi.crop)]
+            self.main_window.label_original.update()
+            try:
+                values = self.main_window.ask_frame_tick_values(roi.frame, f"Panel {roi.name} – ")
+                if values is None:
+                    skipped.append(roi.name)
+                    continue
+                roi.calibrate(*values)
+            except ValueError as e:
+                QMessageBox.warning(self, "Chyba", f"Panel {roi.name}: chybné hodnoty značek: {e}")
+                skipped.append(roi.name)
+                continue
+            if roi.name in {r.name for r in self.rois}:
+                roi.name = self.unique_name()
+            self.add_roi(roi)
+        self.show_rois()
+        message = f"Nalezeno panelů: {len(panels)}"
+        if skipped:
+            message += f", vynechány: {', '.join(skipped)}"
+        self.main_window.statusBar().showMessage(message + ".", 5000)
+
+    def remove_selected(self):
+        if self.futures:
+            QMessageBox.information(self, "Informace", "Počkejte na dokončení zpracování.")
+            return
+        row = self.list_rois.currentRow()
+        if row < 0:
+            return
+        del self.rois[row]
+        self.list_rois.takeItem(row)
+        self.results = []
+        self.show_rois()
+
+    def run_rois(self):
+        if self.futures:
+            QMessageBox.information(self, "Informace", "Počkejte na dokončení zpracování.")
+            return
+        if not self.rois:
+            QMessageBox.information(self, "Informace", "Nejdříve přidejte oblasti!")
+            return
+        if self.main_window.original_pixmap is None:
+            QMessageBox.information(self, "Informace", "V hlavním okně načtěte obrázek!")
+            return
+        options = self.main_window.processing_options()
+        if options is None:
+            return
+        # Meze os má každá oblast vlastní; z formuláře se berou jen společné volby
+        del options['limits']
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=default_workers())
+        # Obrázek se dekóduje jednou, oblasti jsou jen jeho pohledy ve sdílené paměti
+        img = qpixmap_to_array(self.main_window.original_pixmap)
+        self.futures = submit_rois(img, self.rois, self.executor, **options)
+        self.results = [None] * len(self.rois)
+        for index, roi in enumerate(self.rois):
+            item = self.list_rois.item(index)
+            item.setText(f"{self.describe(roi)} – zpracovává se")
+            item.setForeground(QColor("black"))
+        self.poll_timer.start()
+
+    def poll_results(self):
+        for index, future in enumerate(self.futures):
+            if self.results[index] is not None or not future.done():
+                continue
+            roi, item = self.rois[index], self.list_rois.item(index)
+            try:
+                result = future.result()
+            except Exception as e:  # např. pád pracovního procesu
+                result = {'name': roi.name, 'spectra': [], 'error': str(e), 'seconds': 0.0}
+            self.results[index] = result
+            if result['error'] is None:
+                points = sum(len(x) for x, _ in result['spectra'])
+                item.setText(f"{self.describe(roi)} – hotovo: křivek {len(result['spectra'])}, bodů {points}, "
+                             f"{result['seconds']:.1f} s")
+            else:
+                item.setText(f"{self.describe(roi)} – chyba: {result['error']}")
+                item.setForeground(QColor("red"))
+        if all(result is not None for result in self.results):
+            self.poll_timer.stop()
+            self.futures = []
+            done = sum(1 for r in self.results if r['error'] is None)
+            self.main_window.statusBar().showMessage(f"Oblasti zpracovány ({done}/{len(self.results)} úspěšně).", 3000)
+
+    def finished_results(self):
+        return [result for result in self.results if result is not None]
+
+    def export_all(self):
+        results = self.finished_results()
+        if not results:
+            QMessageBox.warning(self, "Chyba", "Žádná oblast ještě nebyla zpracována!")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export to CSV", "", "CSV Files (*.csv)")
+        if not file_path:
+            return
+        try:
+            export_results_csv(results, file_path)
+            QMessageBox.information(self, "Úspěch", "Export byl úspěšný.")
+        except Exception as e:
+            QMessageBox.critical(self, "Chyba", f"Export selhal: {e}")
+
+    def compare_results(self):
+        spectra = results_to_spectra(self.finished_results())
+        if not spectra:
+            QMessageBox.warning(self, "Chyba", "Žádná oblast ještě nebyla úspěšně zpracována!")
+            return
+        self.main_window.open_overlay(spectra, result_spectra_names(spectra))
+
+    def clear_rois(self):
+        if self.futures:
+            QMessageBox.information(self, "Informace", "Počkejte na dokončení zpracování.")
+            return
+        self.rois = []
+        self.results = []
+        self.list_rois.clear()
+        self.show_rois()
+
+    def closeEvent(self, event):
+        self.poll_timer.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        if self.futures:
+            # Nedokončené oblasti se při příštím otevření nezobrazí jako rozpracované
+            self.futures = []
+            self.results = []
+        self.main_window.label_original.rois = []
+        self.main_window.label_original.update()
+        super().closeEvent(event)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("PicToGraph - Raman Base")
+        self.instrumentation = Instrumentation.from_env()
+        # Mezivýsledky zpracování se znovu použijí, pokud se změní jen kalibrace nebo parametry peaků
+        # a díky trvalé cache výsledků se stejný obrázek nepřepočítává ani v dalších sezeních
+        self.pipeline = SpectrumPipeline(instr=self.instrumentation, memory_budget=DEFAULT_MEMORY_BUDGET,
+                                         result_cache=ResultCache())
+        self.last_x = None  # poslední spektrum (None, dokud se nezpracuje, i po načtení nezpracovaného sezení)
+        self.last_y = None
+        self.last_limits = None
+        self.last_stitch_tolerance = None
+        self.last_smoothing = None
+        self.last_traces = None
+        self.spectra = []  # Spectrum s kalibrací a původem pro každou křivku posledního zpracování
+        self.shown_contour = None
+        self.original_pixmap = None
+        self.original_path = None  # soubor načteného obrázku (None pro clipboard)
+        # Stav pro uložení sezení: ořez v pixelech původního obrázku, vybraný cluster, tahy gumou
+        self.crop_rect = None
+        self.cluster_state = None  # (ClusteredImage, index vybraného clusteru)
+        self.eraser_strokes = []
+        self.job_queue_window = None
+        self.roi_window = None
+        self.color_binary = None  # (cacheKey pracovního obrázku, binární maska) z ColorPickWindow.apply
+        self.peak_explorer = None
+        self.overlay_viewer = None
         self.initUI()
         self.setWindowIcon(QIcon("ikonaramanbase.ico"))
 
@@ -743,6 +1712,10 @@ class MainWindow(QMainWindow):
 
         # Přidání status baru pro zpětnou vazbu
         self.setStatusBar(QStatusBar())
+        # Trvalý souhrn časů jednotlivých kroků zpracování
+        self.label_diagnostics = QLabel()
+        self.label_diagnostics.setStyleSheet("color: #555;")
+        self.statusBar().addPermanentWidget(self.label_diagnostics)
 
         # Horní část: obrázky
         image_layout = QHBoxLayout()
@@ -824,6 +1797,40 @@ class MainWindow(QMainWindow):
         param_layout.addWidget(min_distance_label)
         param_layout.addWidget(self.input_min_distance)
 
+        # Režim více křivek – všechny křivky obrázku v jednom průchodu
+        self.check_multi_trace = QCheckBox("Více křivek")
+        self.combo_trace_grouping = QComboBox()
+        self.combo_trace_grouping.addItem("podle polohy", 'vertical')
+        self.combo_trace_grouping.addItem("podle barvy", 'color')
+        traces_label = QLabel("Počet:")
+        self.input_trace_count = QLineEdit()
+        self.input_trace_count.setFixedWidth(30)
+        self.input_trace_count.setPlaceholderText("auto")
+        param_layout.addWidget(self.check_multi_trace)
+        param_layout.addWidget(self.combo_trace_grouping)
+        param_layout.addWidget(traces_label)
+        param_layout.addWidget(self.input_trace_count)
+
+        # Spojení přerušené křivky (čárkované úseky, text přes křivku) místo nejdelší kontury
+        self.check_stitch = QCheckBox("Spojit přerušenou křivku")
+        param_layout.addWidget(self.check_stitch)
+
+        # Vyhlazení spektra před detekcí peaků; okno v jednotkách osy x (vlnočty)
+        smoothing_label = QLabel("Vyhlazení:")
+        self.combo_smoothing = QComboBox()
+        self.combo_smoothing.addItem("žádné", None)
+        self.combo_smoothing.addItem("Savitzky–Golay", 'savgol')
+        self.combo_smoothing.addItem("medián", 'median')
+        self.combo_smoothing.addItem("spline (schody pixelů)", 'spline')
+        smooth_window_label = QLabel("Okno:")
+        self.input_smooth_window = QLineEdit()
+        self.input_smooth_window.setFixedWidth(40)
+        self.input_smooth_window.setPlaceholderText("auto")
+        param_layout.addWidget(smoothing_label)
+        param_layout.addWidget(self.combo_smoothing)
+        param_layout.addWidget(smooth_window_label)
+        param_layout.addWidget(self.input_smooth_window)
+
         param_layout.addStretch(1)
         main_layout.addLayout(param_layout)
 
@@ -840,7 +1847,7 @@ class MainWindow(QMainWindow):
 
         # Spodní část: tlačítka rozdělená do 3 sloupců
         bottom_container = QWidget()
-        bottom_container.setFixedHeight(250)
+        bottom_container.setFixedHeight(310)
         bottom_layout = QHBoxLayout(bottom_container)
         bottom_layout.setContentsMargins(0, 0, 0, 0)
         bottom_layout.setSpacing(5)
@@ -855,7 +1862,8 @@ class MainWindow(QMainWindow):
         # 1. sloupec: nápověda (help_label)
         help_label = QLabel(
             "1) Press the button <b>load picture</b> or insert picture from clipboard<br>"
-            "2) Select area to be cropped by mouse or click and select by holding <b>ctrl</b> with pressing arrows and press button <b>crop picture</b><br>"
+            "2) Select area to be cropped by mouse or click and select by holding <b>ctrl</b> with pressing arrows and press button <b>crop picture</b>, "
+            "or press <b>detect axes</b> and confirm the tick values to crop and calibrate automatically<br>"
             "3) By holding <b>ctrl + shift</b> you can jump in selecting by arrows up to first pixel color change<br>"
             "4) Cropped picture you can process by <b>eraser</b> or <b>clustering</b><br>"
             "5) Processed picture can be transformed to dataset by pressing <b>Process spectra button</b><br>"
@@ -880,14 +1888,34 @@ class MainWindow(QMainWindow):
         self.btn_crop.clicked.connect(self.crop_image)
         left_buttons_layout.addWidget(self.btn_crop)
 
+        self.btn_detect_axes = QPushButton("Detekovat osy")
+        self.btn_detect_axes.clicked.connect(self.auto_detect_axes)
+        left_buttons_layout.addWidget(self.btn_detect_axes)
+
         self.btn_crosshair = QPushButton("Zaměřování")
         self.btn_crosshair.setCheckable(True)
         self.btn_crosshair.clicked.connect(self.toggle_crosshair)
         left_buttons_layout.addWidget(self.btn_crosshair)
 
+        self.btn_live_preview = QPushButton("Náhled linky")
+        self.btn_live_preview.setCheckable(True)
+        self.btn_live_preview.setChecked(True)
+        self.btn_live_preview.setToolTip("Při tažení výběru zobrazí zmenšenou extrakci křivky")
+        self.btn_live_preview.clicked.connect(self.toggle_live_preview)
+        left_buttons_layout.addWidget(self.btn_live_preview)
+
         self.btn_show_eraser = QPushButton("Zobrazit Eraser")
         self.btn_show_eraser.clicked.connect(self.openEraserImageWindow)
         left_buttons_layout.addWidget(self.btn_show_eraser)
+
+        self.btn_job_queue = QPushButton("Fronta úloh")
+        self.btn_job_queue.clicked.connect(self.open_job_queue)
+        left_buttons_layout.addWidget(self.btn_job_queue)
+
+        self.btn_rois = QPushButton("Více oblastí (ROI)")
+        self.btn_rois.setToolTip("Zpracuje více panelů jednoho obrázku, každý s vlastní kalibrací")
+        self.btn_rois.clicked.connect(self.open_roi_window)
+        left_buttons_layout.addWidget(self.btn_rois)
         bottom_layout.addLayout(left_buttons_layout)
 
         # 3. sloupec: pravá skupina tlačítek
@@ -896,6 +1924,11 @@ class MainWindow(QMainWindow):
         self.btn_cluster.clicked.connect(self.open_cluster_window)
         right_buttons_layout.addWidget(self.btn_cluster)
 
+        self.btn_color_pick = QPushButton("Vybrat barvu křivky")
+        self.btn_color_pick.setToolTip("Izoluje křivku podle barvy vybrané kliknutím (bez clusterů)")
+        self.btn_color_pick.clicked.connect(self.open_color_pick)
+        right_buttons_layout.addWidget(self.btn_color_pick)
+
         self.btn_process = QPushButton("Zpracovat spektrum")
         self.btn_process.clicked.connect(self.process_cropped_image)
         right_buttons_layout.addWidget(self.btn_process)
@@ -907,6 +1940,19 @@ class MainWindow(QMainWindow):
         self.btn_export = QPushButton("Export to CSV")
         self.btn_export.clicked.connect(self.export_to_csv)
         right_buttons_layout.addWidget(self.btn_export)
+
+        self.btn_compare = QPushButton("Porovnat spektra")
+        self.btn_compare.setToolTip("Přidá zpracovaná spektra do okna porovnání")
+        self.btn_compare.clicked.connect(self.compare_spectra)
+        right_buttons_layout.addWidget(self.btn_compare)
+
+        self.btn_save_session = QPushButton("Uložit sezení")
+        self.btn_save_session.clicked.connect(self.save_session)
+        right_buttons_layout.addWidget(self.btn_save_session)
+
+        self.btn_load_session = QPushButton("Načíst sezení")
+        self.btn_load_session.clicked.connect(self.load_session)
+        right_buttons_layout.addWidget(self.btn_load_session)
         bottom_layout.addLayout(right_buttons_layout)
 
         main_layout.addWidget(bottom_container)
@@ -918,96 +1964,183 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(scroll_area)
 
         # Nastavení stylů pro tlačítka – zvětšený text, padding a pevná výška
-        for btn in [self.btn_load, self.btn_crop, self.btn_crosshair, self.btn_show_eraser,
-                    self.btn_cluster, self.btn_process, self.btn_find_peaks, self.btn_export,
-                    self.btn_clipboard]:
+        for btn in [self.btn_load, self.btn_crop, self.btn_detect_axes, self.btn_crosshair, self.btn_live_preview,
+                    self.btn_show_eraser,
+                    self.btn_job_queue, self.btn_rois, self.btn_cluster, self.btn_color_pick,
+                    self.btn_process, self.btn_find_peaks, self.btn_export,
+                    self.btn_compare, self.btn_save_session, self.btn_load_session, self.btn_clipboard]:
             btn.setStyleSheet("font-size: 18px; padding: 10px;")
             btn.setFixedHeight(50)
 
     def resizeEvent(self, event):
         new_width = int(self.width() * 0.3)
-        for btn in [self.btn_load, self.btn_crop, self.btn_crosshair, self.btn_show_eraser,
-                    self.btn_cluster, self.btn_process, self.btn_find_peaks, self.btn_export,
-                    self.btn_clipboard]:
+        for btn in [self.btn_load, self.btn_crop, self.btn_detect_axes, self.btn_crosshair, self.btn_live_preview,
+                    self.btn_show_eraser,
+                    self.btn_job_queue, self.btn_rois, self.btn_cluster, self.btn_color_pick,
+                    self.btn_process, self.btn_find_peaks, self.btn_export,
+                    self.btn_compare, self.btn_save_session, self.btn_load_session, self.btn_clipboard]:
             btn.setFixedWidth(new_width)
         super().resizeEvent(event)
 
     def load_image(self):
         file_name, _ = QFileDialog.getOpenFileName(self, "Otevřít obrázek", "", "Image Files (*.png *.jpg *.bmp)")
         if file_name:
-            self.original_pixmap = QPixmap(file_name)
-            self.display_image = self.original_pixmap.scaled(
-                self.label_original.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
-            )
-            self.label_original.setPixmap(self.display_image)
+            self.instrumentation.reset()
+            with self.instrumentation.stage('load', source=file_name):
+                self.original_pixmap = QPixmap(file_name)
+            self.original_path = file_name
+            self.reset_edit_state()
+            self.forget_rois()
+            self.label_original.set_source(self.original_pixmap)
             self.label_cropped.setText("Oříznutý obrázek")
             self.label_result.setText("Výsledek funkce se zobrazí zde")
             self.label_original.selection_rect = None
             self.statusBar().showMessage("Obrázek načten.", 3000)
+            self.show_diagnostics()
         else:
             QMessageBox.warning(self, "Chyba", "Nebyl vybrán žádný obrázek.")
 
     def load_from_clipboard(self):
         clipboard = QApplication.clipboard()
-        pixmap = clipboard.pixmap()
+        self.instrumentation.reset()
+        with self.instrumentation.stage('load', source='clipboard'):
+            pixmap = clipboard.pixmap()
         if not pixmap.isNull():
             self.original_pixmap = pixmap
+            self.original_path = None
+            self.reset_edit_state()
+            self.forget_rois()
             # Nastavíme full_quality_cropped, aby byl k dispozici pro další zpracování
             self.full_quality_cropped = pixmap
-            self.display_image = self.original_pixmap.scaled(
-                self.label_original.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
-            )
-            self.label_original.setPixmap(self.display_image)
-            self.label_cropped.setPixmap(self.display_image)
+            self.label_original.set_source(self.original_pixmap)
+            self.label_cropped.setPixmap(self.label_original.pixmap())
             self.statusBar().showMessage("Obrázek z clipboardu načten.", 3000)
+            self.show_diagnostics()
         else:
             QMessageBox.warning(self, "Chyba", "V clipboardu není dostupný obrázek.")
     def crop_image(self):
-        if self.original_pixmap and self.label_original.selection_rect:
-            displayed = self.label_original.pixmap()
-            if not displayed:
-                return
+        orig_rect = self.selection_to_original()
+        if orig_rect is not None:
+            self.crop_original(orig_rect)
+        else:
+            print("Obrázek nebyl načten nebo nebyla vybrána oblast!")
+
+    def selection_to_original(self):
+        """Převede výběr v label_original na obdélník v pixelech původního obrázku (nebo None)."""
+        if self.original_pixmap:
+            return self.label_original.selection_to_source()
+        return None
 
-            displayed_width = displayed.width()
-            displayed_height = displayed.height()
-            label_width = self.label_original.width()
-            label_height = self.label_original.height()
-            offset_x = (label_width - displayed_width) // 2
-            offset_y = (label_height - displayed_height) // 2
-
-            sel = self.label_original.selection_rect
-            x = max(sel.x() - offset_x, 0)
-            y = max(sel.y() - offset_y, 0)
-            w = sel.width()
-            h = sel.height()
-            if x + w > displayed_width:
-                w = displayed_width - x
-            if y + h > displayed_height:
-                h = displayed_height - y
-
-            scale_x = self.original_pixmap.width() / displayed_width
-            scale_y = self.original_pixmap.height() / displayed_height
-
-            orig_rect = QRect(
-                int(x * scale_x),
-                int(y * scale_y),
-                int(w * scale_x),
-                int(h * scale_y)
-            )
+    def crop_original(self, orig_rect):
+        """Ořízne původní obrázek na obdélník v jeho pixelech a zobrazí výsledek."""
+        with self.instrumentation.stage('crop', width=orig_rect.width(), height=orig_rect.height()):
             cropped_pixmap = self.original_pixmap.copy(orig_rect)
 
-            self.full_quality_cropped = cropped_pixmap
-            max_display_height = 300
-            display_pixmap = cropped_pixmap.scaledToHeight(max_display_height, Qt.SmoothTransformation)
-            self.label_cropped.setPixmap(display_pixmap)
+        self.reset_edit_state()
+        self.crop_rect = (orig_rect.x(), orig_rect.y(), orig_rect.width(), orig_rect.height())
+        self.show_cropped(cropped_pixmap)
+        self.show_diagnostics()
+
+    def show_cropped(self, pixmap):
+        """Nastaví pracovní (oříznutý) obrázek v plné kvalitě a zobrazí jeho náhled."""
+        self.full_quality_cropped = pixmap
+        max_display_height = 300
+        display_pixmap = pixmap.scaledToHeight(max_display_height, Qt.SmoothTransformation)
+        self.label_cropped.setPixmap(display_pixmap)
+
+    def reset_edit_state(self):
+        """Zapomene ořez, vybraný cluster a tahy gumou (nový obrázek nebo nový ořez)."""
+        self.crop_rect = None
+        self.cluster_state = None
+        self.eraser_strokes = []
+
+    def image_rect_to_label(self, orig_rect):
+        """Převede obdélník v pixelech původního obrázku na souřadnice widgetu label_original."""
+        displayed = self.label_original.pixmap()
+        scale_x = displayed.width() / self.original_pixmap.width()
+        scale_y = displayed.height() / self.original_pixmap.height()
+        offset_x = (self.label_original.width() - displayed.width()) // 2
+        offset_y = (self.label_original.height() - displayed.height()) // 2
+        return QRect(int(orig_rect.x() * scale_x) + offset_x, int(orig_rect.y() * scale_y) + offset_y,
+                     int(orig_rect.width() * scale_x), int(orig_rect.height() * scale_y))
+
+    def ask_tick_values(self, title, count, first_last):
+        """Zeptá se na hodnoty značek; vrací seznam čísel, nebo None při zrušení."""
+        # Bez předvyplnění: meze os (okraje ořezu) nejsou hodnoty značek
+        text, ok = QInputDialog.getText(
+            self, title,
+            f"Nalezeno {count} hlavních značek (vyznačeny v obrázku). Zadejte hodnotu {first_last} značky "
+            f"(oddělené čárkou), případně hodnoty všech značek:")
+        if not ok:
+            return None
+        return [float(v) for v in text.replace(';', ',').split(',') if v.strip()]
+
+    def ask_frame_tick_values(self, frame, title=""):
+        """
+        Vyznačí nalezené značky rámu v obrázku a zeptá se na jejich hodnoty.
 
-        else:
-            print("Obrázek nebyl načten nebo nebyla vybrána oblast!")
+        Returns:
+            tuple: (hodnoty značek X, hodnoty značek Y), nebo None při zrušení.
+        """
+        self.label_original.tick_frame = frame
+        self.label_original.update()
+        try:
+            x_values = self.ask_tick_values(f"{title}Značky osy X", len(frame.x_ticks),
+                                            "první (vlevo) a poslední (vpravo)")
+            if x_values is None:
+                return None
+            y_values = self.ask_tick_values(f"{title}Značky osy Y", len(frame.y_ticks), "horní a dolní")
+            if y_values is None:
+                return None
+            return x_values, y_values
+        finally:
+            self.label_original.tick_frame = None
+            self.label_original.update()
+
+    def auto_detect_axes(self):
+        """Najde rám grafu a značky, nechá potvrdit jejich hodnoty, ořízne a vyplní meze os."""
+        if getattr(self, 'original_pixmap', None) is None:
+            QMessageBox.information(self, "Informace", "Nejdříve načtěte obrázek!")
+            return
+        try:
+            frame = detect_axes(qpixmap_to_array(self.original_pixmap))
+        except ValueError as e:
+            QMessageBox.warning(self, "Chyba", f"Detekce os selhala: {e}")
+            return
+        if len(frame.x_ticks) < 2 or len(frame.y_ticks) < 2:
+            QMessageBox.warning(self, "Chyba", "Na osách nebyly nalezeny alespoň dvě značky.")
+            return
+
+        try:
+            values = self.ask_frame_tick_values(frame)
+            if values is None:
+                return
+            calibration = calibrate_from_ticks(frame, *values)
+        except ValueError as e:
+            QMessageBox.warning(self, "Chyba", f"Chybné hodnoty značek: {e}")
+            return
+
+        for line_edit, key in ((self.input_xmin, 'x_min'), (self.input_xmax, 'x_max'),
+                               (self.input_ymin, 'y_min'), (self.input_ymax, 'y_max')):
+            # Zaokrouhlení potlačí zbytky typu -1e-14 z proložení přímkou
+            line_edit.setText(f"{round(float(calibration[key]), 6) + 0.0:.6g}")
+        orig_rect = QRect(*calibration['crop'])
+        self.label_original.selection_rect = self.image_rect_to_label(orig_rect)
+        self.label_original.update()
+        self.crop_original(orig_rect)
+        self.statusBar().showMessage(
+            f"Osy nalezeny: {len(frame.x_ticks)} značek X, {len(frame.y_ticks)} značek Y.", 3000)
 
     def toggle_crosshair(self, checked):
         self.label_original.show_crosshair = checked
         self.label_original.update()
 
+    def toggle_live_preview(self, checked):
+        self.label_original.live_preview = checked
+        if checked:
+            self.label_original.request_preview()
+        self.label_original.update()
+
     def openEraserImageWindow(self):
         if not hasattr(self, 'full_quality_cropped') or self.full_quality_cropped is None:
             QMessageBox.information(self, "Informace", "Nejdříve proveďte oříznutí obrázku!")
@@ -1023,6 +2156,70 @@ class MainWindow(QMainWindow):
         self.cluster_window = ClusterWindow(self.full_quality_cropped, self.label_cropped)
         self.cluster_window.show()
 
+    def open_color_pick(self):
+        if getattr(self, 'full_quality_cropped', None) is None:
+            QMessageBox.information(self, "Informace", "Nejdříve proveďte oříznutí obrázku!")
+            return
+        self.color_pick_window = ColorPickWindow(self.full_quality_cropped, self)
+        self.color_pick_window.show()
+
+    def open_job_queue(self):
+        if self.job_queue_window is None:
+            self.job_queue_window = JobQueueWindow(self)
+        self.job_queue_window.show()
+        self.job_queue_window.raise_()
+
+    def open_roi_window(self):
+        if self.roi_window is None:
+            self.roi_window = RoiWindow(self)
+        self.roi_window.show_rois()
+        self.roi_window.show()
+        self.roi_window.raise_()
+
+    def forget_rois(self):
+        """Zahodí oblasti dávky více ROI (patří k předchozímu obrázku)."""
+        if self.roi_window is not None and not self.roi_window.futures:
+            self.roi_window.clear_rois()
+        self.label_original.rois = []
+
+    def processing_options(self):
+        """
+        Přečte meze os a volby zpracování z formuláře (při chybě zobrazí hlášku a vrátí None).
+
+        Returns:
+            dict: 'limits', 'stitch', 'group_by', 'n_traces' a 'smoothing' ve významu argumentů batch.Job.
+        """
+        try:
+            limits = (float(self.input_xmin.text()), float(self.input_xmax.text()),
+                      float(self.input_ymin.text()), float(self.input_ymax.text()))
+        except ValueError:
+            QMessageBox.warning(self, "Chyba", "Chybné hodnoty Xmin/Xmax/Ymin/Ymax!")
+            return None
+
+        n_traces = None
+        if self.check_multi_trace.isChecked() and self.input_trace_count.text().strip():
+            try:
+                n_traces = int(self.input_trace_count.text())
+                if n_traces < 1:
+                    raise ValueError(n_traces)
+            except ValueError:
+                QMessageBox.warning(self, "Chyba", "Chybný počet křivek!")
+                return None
+        group_by = self.combo_trace_grouping.currentData() if self.check_multi_trace.isChecked() else None
+
+        smoothing = None
+        if self.combo_smoothing.currentData() is not None:
+            window = None
+            if self.input_smooth_window.text().strip():
+                try:
+                    window = float(self.input_smooth_window.text())
+                except ValueError:
+                    QMessageBox.warning(self, "Chyba", "Chybná šířka okna vyhlazení!")
+                    return None
+            smoothing = (self.combo_smoothing.currentData(), window)
+        return {'limits': limits, 'stitch': self.check_stitch.isChecked(), 'group_by': group_by,
+                'n_traces': n_traces, 'smoothing': smoothing}
+
     def process_cropped_image(self):
         if not hasattr(self, 'full_quality_cropped') or self.full_quality_cropped is None:
             QMessageBox.warning(self, "Chyba", "Chybí oříznutý obrázek ve full quality!")
@@ -1030,42 +2227,104 @@ class MainWindow(QMainWindow):
 
         cropped_pixmap = self.full_quality_cropped
 
-        try:
-            x_min = float(self.input_xmin.text())
-            x_max = float(self.input_xmax.text())
-            y_min = float(self.input_ymin.text())
-            y_max = float(self.input_ymax.text())
-        except ValueError:
-            QMessageBox.warning(self, "Chyba", "Chybné hodnoty Xmin/Xmax/Ymin/Ymax!")
+        options = self.processing_options()
+        if options is None:
             return
+        x_min, x_max, y_min, y_max = options['limits']
+        n_traces = options['n_traces']
 
         try:
             plt.ioff()
-            img_array = qpixmap_to_array(cropped_pixmap)
-            img, center_line, longest_contour = preprocess_image_from_array(img_array)
-            data_x, data_y = extract_and_plot_contour(img, center_line, x_min, x_max, y_min, y_max)
+            self.instrumentation.reset(PROCESS_STAGES)
+            # Převod pixmapy i extrakce se přepočítají jen pro změněný obrázek (cacheKey)
+            self.pipeline.set_source(('pixmap', cropped_pixmap.cacheKey()),
+                                     partial(qpixmap_to_array, cropped_pixmap))
+            if self.color_binary is not None and self.color_binary[0] == cropped_pixmap.cacheKey():
+                # Křivka z výběru barvy: binární maska z náhledu místo nové binarizace Otsuem
+                self.pipeline.set_binary(self.color_binary[1])
+            self.last_limits = (x_min, x_max, y_min, y_max)
+            longest_contour = None
+            smoothing = options['smoothing']
+            self.last_smoothing = smoothing
+            if options['group_by']:
+                spectra = self.pipeline.trace_spectra(self.last_limits, options['group_by'], n_traces)
+                if smoothing is not None:
+                    with self.instrumentation.stage('smooth', traces=len(spectra)):
+                        spectra = [(x, smooth(x, y, *smoothing)) for x, y in spectra]
+                self.last_traces = spectra
+                data_x, data_y = spectra[0]
+            else:
+                stitch_tolerance = None
+                if options['stitch']:
+                    stitch_tolerance = default_tolerance(self.pipeline.image().shape)
+                self.last_stitch_tolerance = stitch_tolerance
+                center_line, longest_contour = self.pipeline.center_line(stitch_tolerance)
+                data_x, data_y = self.pipeline.smoothed(self.last_limits, smoothing, stitch_tolerance)
+                self.last_traces = None
+                spectra = [(data_x, data_y)]
             self.last_x = data_x
             self.last_y = data_y
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png')
-            plt.close()
-            buf.seek(0)
-            qimage = QImage.fromData(buf.getvalue(), 'PNG')
-            if qimage.isNull():
-                QMessageBox.critical(self, "Chyba", "Nepodařilo se vykreslit graf.")
-            else:
-                pixmap = QPixmap.fromImage(qimage)
-                max_height = 600
-                if pixmap.height() > max_height:
-                    pixmap = pixmap.scaledToHeight(max_height, Qt.SmoothTransformation)
-                self.label_result.setPixmap(pixmap)
+            calibration = {'limits': self.last_limits, 'smoothing': smoothing,
+                           'stitch_tolerance': None if options['group_by'] else stitch_tolerance,
+                           'group_by': options['group_by']}
+            self.spectra = [Spectrum(x, y, calibration=calibration, source=self.spectrum_source(trace=i))
+                            for i, (x, y) in enumerate(spectra)]
+            if self.show_spectra(self.pipeline.image(), spectra):
                 self.statusBar().showMessage("Spektrum bylo úspěšně zpracováno.", 3000)
-            self.show_longest_contour(longest_contour)
+            self.show_diagnostics()
+            # Konturu zobrazíme jen tehdy, když se opravdu změnila (ne při pouhé rekalibraci)
+            if longest_contour is not None and longest_contour is not self.shown_contour:
+                self.shown_contour = longest_contour
+                self.show_longest_contour(longest_contour)
         except Exception as e:
             QMessageBox.critical(self, "Chyba", f"Nastala chyba při zpracování: {e}")
         finally:
             plt.ioff()
 
+    def open_overlay(self, spectra, names):
+        """Přidá spektra do okna porovnání (otevře ho, pokud ještě není)."""
+        if self.overlay_viewer is None:
+            self.overlay_viewer = OverlayViewer()
+        self.overlay_viewer.add_spectra(spectra, names)
+        self.overlay_viewer.show()
+        self.overlay_viewer.raise_()
+
+    def compare_spectra(self):
+        if not self.spectra:
+            QMessageBox.information(self, "Informace", "Nejdříve zpracujte spektrum!")
+            return
+        base = os.path.basename(self.original_path) if self.original_path else "clipboard"
+        names = [base if len(self.spectra) == 1 else f"{base} #{s.source.get('trace', i) + 1}"
+                 for i, s in enumerate(self.spectra)]
+        self.open_overlay(self.spectra, names)
+
+    def spectrum_source(self, **extra):
+        """Původ spektra: zdrojový obrázek, ořez a vybraný cluster."""
+        source = {'path': self.original_path, 'crop': self.crop_rect}
+        if self.cluster_state is not None:
+            source['cluster'] = self.cluster_state[1]
+        source.update(extra)
+        return source
+
+    def show_spectra(self, img, spectra):
+        """Vykreslí spektra do label_result; `img` určuje jen poměr stran grafu. Vrací True při úspěchu."""
+        with self.instrumentation.stage('plot'):
+            plot_spectra(img, spectra)
+        buf = io.BytesIO()
+        plt.savefig(buf, format='png')
+        plt.close()
+        buf.seek(0)
+        qimage = QImage.fromData(buf.getvalue(), 'PNG')
+        if qimage.isNull():
+            QMessageBox.critical(self, "Chyba", "Nepodařilo se vykreslit graf.")
+            return False
+        pixmap = QPixmap.fromImage(qimage)
+        max_height = 600
+        if pixmap.height() > max_height:
+            pixmap = pixmap.scaledToHeight(max_height, Qt.SmoothTransformation)
+        self.label_result.setPixmap(pixmap)
+        return True
+
     def show_longest_contour(self, longest_contour):
         fig, ax = plt.subplots()
         ax.plot(longest_contour[:, 1], -longest_contour[:, 0], linewidth=2, label="Longest contour")
@@ -1098,9 +2357,19 @@ class MainWindow(QMainWindow):
         try:
             with open(file_path, 'w', newline='') as csvfile:
                 writer = csv.writer(csvfile)
-                writer.writerow(["x", "y"])
-                for xi, yi in zip(self.last_x, self.last_y):
-                    writer.writerow([xi, yi])
+                if self.last_traces and len(self.last_traces) > 1:
+                    # Více křivek: dvojice sloupců x1, y1, x2, y2, ... (kratší křivky doplněny prázdnými buňkami)
+                    writer.writerow([f"{axis}{i}" for i in range(1, len(self.last_traces) + 1) for axis in "xy"])
+                    longest = max(len(x) for x, _ in self.last_traces)
+                    for row in range(longest):
+                        cells = []
+                        for x, y in self.last_traces:
+                            cells += [x[row], y[row]] if row < len(x) else ["", ""]
+                        writer.writerow(cells)
+                else:
+                    writer.writerow(["x", "y"])
+                    for xi, yi in zip(self.last_x, self.last_y):
+                        writer.writerow([xi, yi])
             QMessageBox.information(self, "Úspěch", "Export byl úspěšný.")
             self.statusBar().showMessage("Export byl úspěšný.", 3000)
         except Exception as e:
@@ -1114,14 +2383,146 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Chyba", "Chybná hodnota pro sensitivity nebo min_distance!")
             return
 
-        if not hasattr(self, 'last_x') or not hasattr(self, 'last_y'):
+        if self.last_x is None or self.last_y is None:
             QMessageBox.warning(self, "Chyba", "Spektrum ještě nebylo vygenerováno!")
             return
 
-        plot_spectrum_with_peaks(self.last_x, self.last_y, sensitivity, min_distance, show_peaks=True)
+        # Kandidáti na peaky se počítají jen jednou pro každé spektrum, prahy se pak mění v okně
+        if self.last_limits is not None and not self.last_traces:
+            index = self.pipeline.peak_index(self.last_limits, self.last_stitch_tolerance, self.last_smoothing)
+        else:
+            with self.instrumentation.stage('peak index', points=len(self.last_y)):
+                index = PeakIndex(self.last_x, self.last_y)
+        # Vyhlazená křivka: zvlnění pod výškou pixelu nejsou peaky
+        prominence = 0.0
+        if self.last_limits is not None and self.last_smoothing is not None:
+            prominence = pixel_quantum(self.last_limits, self.pipeline.image().shape[0])
+
+        if self.peak_explorer is None:
+            self.peak_explorer = PeakExplorerWindow(self)
+        self.peak_explorer.set_spectrum(self.last_x, self.last_y, index, sensitivity, min_distance, prominence)
+        self.peak_explorer.show()
+        self.peak_explorer.raise_()
         self.statusBar().showMessage("Peak detection proběhla úspěšně.", 3000)
+        self.show_diagnostics()
+
+    def save_session(self):
+        """Uloží obrázek, ořez, vybraný cluster, tahy gumou a výsledky do souboru sezení."""
+        if self.original_pixmap is None:
+            QMessageBox.warning(self, "Chyba", "Není co uložit – nejdříve načtěte obrázek!")
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, "Uložit sezení", "", SESSION_FILTER)
+        if not file_name:
+            return
+        if not file_name.lower().endswith('.ptg'):
+            file_name += '.ptg'
+
+        meta = {
+            'source': self.original_path,
+            'crop': self.crop_rect,
+            'inputs': {name: getattr(self, f'input_{name}').text()
+                       for name in ('xmin', 'xmax', 'ymin', 'ymax', 'sensitivity', 'min_distance', 'trace_count',
+                                    'smooth_window')},
+            'stitch': self.check_stitch.isChecked(),
+            'multi_trace': self.check_multi_trace.isChecked(),
+            'trace_grouping': self.combo_trace_grouping.currentData(),
+            'smoothing': self.combo_smoothing.currentData(),
+            'limits': self.last_limits,
+        }
+        arrays = {'image': qpixmap_to_array(self.original_pixmap)}
+        working = getattr(self, 'full_quality_cropped', None)
+        if working is not None and not working.isNull():
+            # Pracovní obrázek po clusteru a gumě (s alfou), po načtení se nic nepřepočítává
+            arrays['working'] = qpixmap_to_rgba(working)
+        if self.cluster_state is not None and self.cluster_state[0] is not None:
+            clustered, meta['cluster_index'] = self.cluster_state
+            arrays['cluster_labels'] = clustered.labels
+            arrays['cluster_palette'] = clustered.palette
+        if self.eraser_strokes:
+            arrays['eraser_strokes'] = np.array(self.eraser_strokes, dtype=np.int64)
+        if getattr(self, 'last_x', None) is not None:
+            arrays['result_x'] = self.last_x
+            arrays['result_y'] = self.last_y
+        for i, (x, y) in enumerate(self.last_traces or []):
+            arrays[f'trace_{i}_x'] = x
+            arrays[f'trace_{i}_y'] = y
+        try:
+            save_session(file_name, meta, **arrays)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Chyba", f"Sezení se nepodařilo uložit: {e}")
+            return
+        self.statusBar().showMessage(f"Sezení uloženo do {os.path.basename(file_name)}.", 3000)
+
+    def load_session(self):
+        """Obnoví sezení ze souboru bez přepočítávání (clustery, extrakce i kalibrace se převezmou)."""
+        file_name, _ = QFileDialog.getOpenFileName(self, "Načíst sezení", "", SESSION_FILTER)
+        if not file_name:
+            return
+        self.instrumentation.reset()
+        try:
+            with self.instrumentation.stage('load', source=file_name), Session(file_name) as session:
+                self.restore_session(session)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.critical(self, "Chyba", f"Sezení se nepodařilo načíst: {e}")
+            return
+        self.statusBar().showMessage(f"Sezení {os.path.basename(file_name)} načteno.", 3000)
+        self.show_diagnostics()
+
+    def restore_session(self, session):
+        meta = session.meta
+        for name, text in meta.get('inputs', {}).items():
+            getattr(self, f'input_{name}').setText(text)
+        self.check_stitch.setChecked(meta.get('stitch', False))
+        self.check_multi_trace.setChecked(meta.get('multi_trace', False))
+        grouping = self.combo_trace_grouping.findData(meta.get('trace_grouping'))
+        if grouping >= 0:
+            self.combo_trace_grouping.setCurrentIndex(grouping)
+        self.combo_smoothing.setCurrentIndex(max(0, self.combo_smoothing.findData(meta.get('smoothing'))))
+
+        self.original_pixmap = array_to_qpixmap(session['image'])
+        self.original_path = meta.get('source')
+        self.reset_edit_state()
+        self.forget_rois()
+        self.label_original.set_source(self.original_pixmap)
+        self.label_original.selection_rect = None
+        self.crop_rect = tuple(meta['crop']) if meta.get('crop') else None
+        if 'working' in session:
+            self.show_cropped(array_to_qpixmap(session['working']))
+        elif self.crop_rect is not None:
+            self.show_cropped(self.original_pixmap.copy(QRect(*self.crop_rect)))
+        else:
+            self.full_quality_cropped = None
+            self.label_cropped.setText("Oříznutý obrázek")
+        if 'cluster_labels' in session:
+            clustered = ClusteredImage(session['cluster_labels'], session['cluster_palette'])
+            self.cluster_state = (clustered, meta.get('cluster_index'))
+        if 'eraser_strokes' in session:
+            self.eraser_strokes = [tuple(int(v) for v in stroke) for stroke in session['eraser_strokes']]
+
+        # Výsledky se převezmou ze souboru; peaky se pak hledají přímo v uloženém spektru
+        self.last_limits = None
+        self.last_stitch_tolerance = None
+        self.last_smoothing = None
+        self.shown_contour = None
+        self.last_traces = session.traces() or None
+        self.last_x = session.get('result_x')
+        self.last_y = session.get('result_y')
+        spectra = self.last_traces or ([(self.last_x, self.last_y)] if self.last_x is not None else [])
+        self.spectra = [Spectrum(x, y, calibration={'limits': meta.get('limits')},
+                                 source=self.spectrum_source(trace=i, session=session.path))
+                        for i, (x, y) in enumerate(spectra)]
+        if self.last_x is not None and self.full_quality_cropped is not None:
+            self.show_spectra(session.get('working', session['image']), spectra)
+        else:
+            self.label_result.setText("Výsledek funkce se zobrazí zde")
+
+    def show_diagnostics(self):
+        """Zobrazí v status baru souhrn časů (a případně paměti) posledních kroků zpracování."""
+        self.label_diagnostics.setText(self.instrumentation.summary(PIPELINE_STAGES))
 
 if __name__ == "__main__":
+    # Pracovní procesy fronty úloh ve zmrazené aplikaci (PyInstaller)
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.resize(800, 600)
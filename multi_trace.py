@@ -0,0 +1,165 @@
+# multi_trace.py
+"""
+Extrakce více překrývajících se nebo nad sebou vykreslených spekter v jednom průchodu.
+
+Místo opakovaného ořezu/klastrování/zpracování pro každou křivku se tmavé pixely
+jednou označí jako souvislé komponenty a ty se seskupí do křivek – buď podle
+svislé polohy (navazující úseky bez překryvu ve sloupcích), nebo podle barvy.
+"""
+import numpy as np
+from scipy import ndimage
+
+from simple_line import binarize_image
+
+
+def _column_profiles(groups, rows, cols, width):
+    """
+    Pro každou skupinu pixelů (komponentu nebo křivku) spočítá součet řádků a počet
+    pixelů v každém obsazeném sloupci. Profily jsou řídké, paměť roste s počtem
+    pixelů popředí, ne s počtem komponent × šířka obrázku.
+
+    Returns:
+        tuple: (group, col, sums, counts) – pole pro obsazené dvojice (skupina, sloupec),
+            seřazená podle skupiny a pak sloupce.
+    """
+    keys, inverse = np.unique(groups.astype(np.int64) * width + cols, return_inverse=True)
+    sums = np.bincount(inverse, weights=rows)
+    counts = np.bincount(inverse)
+    return keys // width, keys % width, sums, counts
+
+
+def _group_vertical(starts, cols, ys, max_overlap=0.2, max_jump=None):
+    """
+    Seskupí komponenty do křivek podle svislé polohy.
+
+    Komponenta se připojí ke křivce, se kterou se téměř nepřekrývá ve sloupcích
+    a na nejbližším sloupci na ni výškově navazuje; jinak založí novou křivku.
+    Komponenty se zpracují od nejširší.
+
+    Parameters:
+        starts (ndarray): Začátky profilů komponent v `cols`/`ys` (délka počet komponent + 1).
+        cols (ndarray): Obsazené sloupce komponent, vzestupně v rámci komponenty.
+        ys (ndarray): Průměrný řádek komponenty v daném sloupci.
+    """
+    spans = np.diff(starts)
+    order = np.argsort(-spans)
+    trace_of = np.empty(len(spans), dtype=int)
+    traces = []  # (obsazené sloupce vzestupně, y v těchto sloupcích)
+    for comp in order:
+        c_cols = cols[starts[comp]:starts[comp + 1]]
+        c_ys = ys[starts[comp]:starts[comp + 1]]
+        best, best_dist = None, np.inf
+        for t, (t_cols, t_y) in enumerate(traces):
+            pos = np.searchsorted(t_cols, c_cols)
+            overlap = np.count_nonzero(t_cols.take(pos, mode='clip') == c_cols)
+            if overlap > max_overlap * len(c_cols):
+                continue
+            # vzdálenost mezi nejbližšími konci komponenty a křivky
+            candidates = []
+            for c, y, p in zip(c_cols[[0, -1]], c_ys[[0, -1]], pos[[0, -1]]):
+                for q in (p - 1, p):
+                    if 0 <= q < len(t_cols):
+                        candidates.append((abs(t_cols[q] - c), abs(t_y[q] - y)))
+            if not candidates:
+                continue
+            _, dy = min(candidates)
+            if max_jump is not None and dy > max_jump:
+                continue
+            if dy < best_dist:
+                best, best_dist = t, dy
+        if best is None:
+            traces.append((c_cols, c_ys))
+            trace_of[comp] = len(traces) - 1
+        else:
+            # Ve sloupcích překryvu platí y nové komponenty
+            t_cols, t_y = traces[best]
+            other = ~np.isin(t_cols, c_cols, assume_unique=True)
+            merged_cols = np.concatenate([t_cols[other], c_cols])
+            merged_y = np.concatenate([t_y[other], c_ys])
+            by_col = np.argsort(merged_cols, kind='stable')
+            traces[best] = (merged_cols[by_col], merged_y[by_col])
+            trace_of[comp] = best
+    return trace_of
+
+
+def _group_by_color(img, labels, count, areas, n_traces):
+    """Seskupí komponenty do `n_traces` křivek podle průměrné barvy (vážené KMeans)."""
+    from sklearn.cluster import KMeans
+
+    index = labels.ravel()
+    rgb = img[:, :, :3].reshape(-1, 3)
+    colors = np.column_stack([
+        np.bincount(index, weights=rgb[:, c], minlength=count + 1)[1:] for c in range(3)
+    ]) / areas[:, None]
+    kmeans = KMeans(n_clusters=min(n_traces, count), random_state=42, n_init=10)
+    return kmeans.fit_predict(colors, sample_weight=areas)
+
+
+def extract_traces(img, group_by='vertical', n_traces=None, min_size=8, min_span=0.0, binary=None):
+    """
+    Najde všechny křivky v obrázku v jednom průchodu.
+
+    Parameters:
+        img (ndarray): Obrázek (H, W, 3+).
+        group_by (str): 'vertical' – seskupení navazujících úseků podle polohy,
+            'color' – seskupení podle barvy komponent (vyžaduje n_traces).
+        n_traces (int, optional): Počet vrácených křivek (největší podle pokrytí sloupců).
+        min_size (int): Minimální plocha komponenty v pixelech (malá kvůli čárkovaným křivkám).
+        min_span (float): Minimální šířka komponenty jako podíl šířky obrázku (odfiltruje text;
+            u čárkovaných křivek musí zůstat menší než délka čárky).
+        binary (ndarray, optional): Již spočtená maska z binarize_image.
+
+    Returns:
+        list of ndarray: Středové linky (M, 2) s (y, x), seřazené shora dolů.
+            Křivky, které se kříží, splynou do jedné komponenty a nelze je takto oddělit.
+    """
+    if group_by not in ('vertical', 'color'):
+        raise ValueError(f"Neznámý způsob seskupení křivek: {group_by}")
+    if group_by == 'color' and not n_traces:
+        raise ValueError("Seskupení podle barvy vyžaduje zadaný počet křivek.")
+
+    if binary is None:
+        binary = binarize_image(img)
+    height, width = binary.shape
+    labels, count = ndimage.label(~binary, structure=np.ones((3, 3), dtype=bool))
+    if count == 0:
+        raise ValueError("Nebyla nalezena žádná křivka v obrázku.")
+
+    # Odfiltrování malých a úzkých komponent (šum, text)
+    areas = np.bincount(labels.ravel(), minlength=count + 1)
+    spans = np.array([s[1].stop - s[1].start if s is not None else 0
+                      for s in ndimage.find_objects(labels)])
+    keep = np.zeros(count + 1, dtype=bool)
+    keep[1:] = (areas[1:] >= min_size) & (spans >= max(1, min_span * width))
+    if not keep.any():
+        raise ValueError("Nebyla nalezena žádná křivka v obrázku.")
+    remap = np.zeros(count + 1, dtype=np.int32)
+    remap[keep] = np.arange(1, keep.sum() + 1)
+    labels = remap[labels]
+    count = int(keep.sum())
+    areas = areas[keep]
+
+    rows, cols = np.nonzero(labels)
+    comp_labels = labels[rows, cols] - 1
+    if group_by == 'vertical':
+        comp, comp_cols, sums, counts = _column_profiles(comp_labels, rows, cols, width)
+        starts = np.searchsorted(comp, np.arange(count + 1))
+        trace_of = _group_vertical(starts, comp_cols, sums / counts, max_jump=0.15 * height)
+    else:
+        trace_of = _group_by_color(img, labels, count, areas, n_traces)
+
+    # Profily křivek: pixely sloučených komponent se ve sloupci zprůměrují
+    trace, trace_cols, trace_sums, trace_counts = _column_profiles(trace_of[comp_labels], rows, cols, width)
+    starts = np.searchsorted(trace, np.arange(trace_of.max() + 2))
+    coverage = np.diff(starts)
+    selected = np.argsort(-coverage)
+    if n_traces:
+        selected = selected[:n_traces]
+
+    center_lines = []
+    for t in selected:
+        part = slice(starts[t], starts[t + 1])
+        center_lines.append(np.column_stack([trace_sums[part] / trace_counts[part],
+                                             trace_cols[part].astype(float)]))
+    center_lines.sort(key=lambda line: line[:, 0].mean())
+    return center_lines
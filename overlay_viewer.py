@@ -0,0 +1,342 @@
+# overlay_viewer.py
+"""
+Okno pro porovnání mnoha digitalizovaných spekter v jednom grafu.
+
+Spektra se převzorkují na společnou osu (SpectrumSet, jedno souvislé pole) a viditelný
+rozsah se decimuje na šířku grafu v pixelech (decimation.py), takže cena vykreslení
+závisí na šířce widgetu, ne na celkovém počtu bodů. Decimovaná data se ukládají podle
+rozsahu osy x, šířky, metody a viditelných spekter; svislý posun a zoom osy y je jen
+přepočet na pixely. Při tažení myší se posouvá uložená decimace a z plných dat se
+decimuje znovu až po uvolnění tlačítka nebo zastavení pohybu (REDECIMATE_DELAY).
+
+Společná osa má nejvýše MAX_POINTS bodů; jemnější spektra se na ni převzorkují
+(okno to uvádí v popisku).
+"""
+import time
+
+import numpy as np
+from PyQt5.QtCore import Qt, QRectF, QTimer
+from PyQt5.QtGui import QColor, QPainter, QPen, QIcon
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QListWidget, QListWidgetItem,
+                             QSplitter, QPushButton)
+
+from decimation import decimate, visible_slice
+from qt_adapters import arrays_to_qpolygonf
+from spectrum import SpectrumSet
+
+# Nejvyšší počet bodů společné osy (paměť sady je spektra x body x 4 B)
+MAX_POINTS = 2 ** 16
+MARGINS = (64, 12, 16, 36)  # vlevo, nahoře, vpravo, dole
+# Prodleva (ms) po posledním pohybu při tažení, po které se decimuje znovu z plných dat
+REDECIMATE_DELAY = 150
+
+
+def union_axis(spectra):
+    """
+    Sjednocení rozsahů všech spekter s krokem nejjemnějšího z nich.
+
+    Returns:
+        tuple: (lo, hi, počet bodů) – počet bodů bez omezení MAX_POINTS.
+    """
+    spectra = [s.ascending() for s in spectra]
+    lo = min(float(s.x[0]) for s in spectra)
+    hi = max(float(s.x[-1]) for s in spectra)
+    steps = [float(np.median(np.diff(s.x))) for s in spectra if len(s) > 1]
+    step = min((v for v in steps if v > 0), default=(hi - lo) or 1.0)
+    return lo, hi, max(2, int((hi - lo) / step + 1))
+
+
+def union_set(spectra, max_points=MAX_POINTS):
+    """
+    SpectrumSet na ose union_axis; mimo svůj rozsah má každé spektrum NaN.
+
+    Osa má nejvýše `max_points` bodů: je-li nejjemnější krok menší, spektra se převzorkují
+    hrubší osou (plné rozlišení pak nezůstane zachováno – viz union_axis pro potřebný počet).
+    """
+    lo, hi, points = union_axis(spectra)
+    return SpectrumSet.from_spectra(spectra, x=np.linspace(lo, hi, min(points, max_points)))
+
+
+def nice_ticks(lo, hi, count=6):
+    """Hodnoty značek osy s „kulatým“ krokem (1, 2, 5 x 10^n)."""
+    span = abs(hi - lo)
+    if span == 0 or not np.isfinite(span):
+        return np.array([lo])
+    raw = span / count
+    magnitude = 10 ** np.floor(np.log10(raw))
+    step = min((m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw), default=10 * magnitude)
+    first = np.ceil(min(lo, hi) / step) * step
+    return np.arange(first, max(lo, hi) + step / 2, step)
+
+
+class OverlayCanvas(QWidget):
+    """Graf s překrývajícími se spektry; kreslí se přímo QPainterem."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.spectra = None  # SpectrumSet
+        self.visible = np.zeros(0, dtype=bool)
+        self.colors = []
+        self.reversed_x = False  # Ramanova spektra mají osu x obvykle klesající zleva doprava
+        self.method = 'minmax'
+        self.view = None  # (x_min, x_max, y_min, y_max) zobrazeného rozsahu
+        self.drag = None
+        self.last_draw = (0, 0.0)  # (počet vykreslených bodů, sekundy)
+        self._decimated = None  # (klíč, řádky, xd, yd) poslední decimace
+        self._redecimate_now = False
+        # Při tažení se decimuje znovu až po zastavení pohybu; každý pohyb časovač restartuje
+        self.redecimate_timer = QTimer(self)
+        self.redecimate_timer.setSingleShot(True)
+        self.redecimate_timer.setInterval(REDECIMATE_DELAY)
+        self.redecimate_timer.timeout.connect(self.redecimate)
+        self.setMinimumSize(400, 300)
+        self.setMouseTracking(False)
+
+    def set_spectra(self, spectra, reversed_x=False):
+        self.spectra = spectra
+        self.reversed_x = reversed_x
+        count = len(spectra)
+        self.visible = np.ones(count, dtype=bool)
+        # Zlatý řez po barevném kruhu: i stovky křivek mají sousední barvy odlišné
+        self.colors = [QColor.fromHsvF((i * 0.618033988749895) % 1.0, 0.85, 0.8) for i in range(count)]
+        self._decimated = None
+        self.reset_view()
+
+    def redecimate(self):
+        self._redecimate_now = True
+        self.update()
+
+    def decimated(self, rect):
+        """
+        Decimovaná viditelná spektra (řádky, xd, yd) v jednotkách dat. Počítá se jen při změně
+        rozsahu osy x, šířky, metody nebo viditelných spekter; během tažení se vrací poslední
+        výsledek (posune se jen převodem na pixely) a přepočet se odloží časovačem.
+        """
+        x_min, x_max, _, _ = self.view
+        window = visible_slice(self.spectra.x, x_min, x_max)
+        key = (window.start, window.stop, int(rect.width()), self.method, self.visible.tobytes())
+        cached = self._decimated
+        if cached is not None and cached[0] != key and self.drag is not None and not self._redecimate_now:
+            self.redecimate_timer.start()
+            return cached[1:]
+        if cached is not None and cached[0] == key:
+            return cached[1:]
+        self._redecimate_now = False
+        rows = np.flatnonzero(self.visible)
+        if not len(rows) or window.stop - window.start < 2:
+            self._decimated = (key, rows[:0], None, None)
+            return self._decimated[1:]
+        # Decimace všech viditelných spekter najednou na šířku grafu v pixelech
+        data = self.spectra.data[rows, window] if len(rows) < len(self.visible) else self.spectra.data[:, window]
+        xd, yd = decimate(self.spectra.x[window], data, int(rect.width()), self.method)
+        xd = np.broadcast_to(xd, yd.shape).astype(np.float64)
+        self._decimated = (key, rows, xd, yd.astype(np.float64))
+        return self._decimated[1:]
+
+    def reset_view(self):
+        if self.spectra is None:
+            return
+        x = self.spectra.x
+        y_min = float(np.nanmin(self.spectra.data))
+        y_max = float(np.nanmax(self.spectra.data))
+        pad = (y_max - y_min) * 0.05 or 1.0
+        self.view = (float(x[0]), float(x[-1]), y_min - pad, y_max + pad)
+        self.update()
+
+    def plot_rect(self):
+        left, top, right, bottom = MARGINS
+        return QRectF(left, top, max(1, self.width() - left - right), max(1, self.height() - top - bottom))
+
+    def to_pixels(self, x, y, rect):
+        x_min, x_max, y_min, y_max = self.view
+        fx = (x - x_min) / (x_max - x_min)
+        if self.reversed_x:
+            fx = 1 - fx
+        return rect.left() + fx * rect.width(), rect.top() + (y_max - y) / (y_max - y_min) * rect.height()
+
+    def to_data_x(self, px, rect):
+        x_min, x_max, _, _ = self.view
+        fx = (px - rect.left()) / rect.width()
+        if self.reversed_x:
+            fx = 1 - fx
+        return x_min + fx * (x_max - x_min)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        rect = self.plot_rect()
+        if self.spectra is None or self.view is None:
+            painter.drawText(self.rect(), Qt.AlignCenter, "Žádná spektra k porovnání")
+            return
+        start = time.perf_counter()
+        self.draw_axes(painter, rect)
+
+        rows, xd, yd = self.decimated(rect)
+        drawn = 0
+        if len(rows):
+            px, py = self.to_pixels(xd, yd, rect)
+
+            painter.setClipRect(rect)
+            painter.setRenderHint(QPainter.Antialiasing, len(rows) <= 20)
+            for i, row in enumerate(rows):
+                finite = np.isfinite(py[i])
+                if finite.sum() < 2:
+                    continue
+                painter.setPen(QPen(self.colors[row], 1))
+                painter.drawPolyline(arrays_to_qpolygonf(px[i][finite], py[i][finite]))
+                drawn += int(finite.sum())
+            painter.setClipping(False)
+        self.last_draw = (drawn, time.perf_counter() - start)
+
+    def draw_axes(self, painter, rect):
+        x_min, x_max, y_min, y_max = self.view
+        painter.setPen(QPen(Qt.black, 1))
+        painter.drawRect(rect)
+        metrics = painter.fontMetrics()
+        for value in nice_ticks(x_min, x_max):
+            px, _ = self.to_pixels(value, y_min, rect)
+            painter.drawLine(int(px), int(rect.bottom()), int(px), int(rect.bottom()) + 4)
+            label = f"{value:g}"
+            painter.drawText(int(px - metrics.width(label) / 2), int(rect.bottom()) + 6 + metrics.ascent(), label)
+        for value in nice_ticks(y_min, y_max):
+            _, py = self.to_pixels(x_min, value, rect)
+            painter.drawLine(int(rect.left()) - 4, int(py), int(rect.left()), int(py))
+            label = f"{value:g}"
+            painter.drawText(int(rect.left()) - 8 - metrics.width(label), int(py + metrics.ascent() / 2 - 1), label)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self.view is not None:
+            self.drag = (event.pos(), self.view)
+
+    def mouseMoveEvent(self, event):
+        if self.drag is None:
+            return
+        origin, (x_min, x_max, y_min, y_max) = self.drag
+        rect = self.plot_rect()
+        dx = (event.pos().x() - origin.x()) / rect.width() * (x_max - x_min)
+        dy = (event.pos().y() - origin.y()) / rect.height() * (y_max - y_min)
+        if self.reversed_x:
+            dx = -dx
+        self.view = (x_min - dx, x_max - dx, y_min + dy, y_max + dy)
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        self.drag = None
+        self.redecimate_timer.stop()
+        self.update()
+
+    def mouseDoubleClickEvent(self, event):
+        self.reset_view()
+
+    def wheelEvent(self, event):
+        if self.view is None:
+            return
+        factor = 0.8 ** (event.angleDelta().y() / 120)
+        x_min, x_max, y_min, y_max = self.view
+        rect = self.plot_rect()
+        if event.modifiers() & Qt.ControlModifier:
+            # Svislý zoom kolem polohy kurzoru
+            center = y_max - (event.pos().y() - rect.top()) / rect.height() * (y_max - y_min)
+            self.view = (x_min, x_max, center + (y_min - center) * factor, center + (y_max - center) * factor)
+        else:
+            center = self.to_data_x(event.pos().x(), rect)
+            self.view = (center + (x_min - center) * factor, center + (x_max - center) * factor, y_min, y_max)
+        self.update()
+        event.accept()
+
+
+class OverlayViewer(QWidget):
+    """
+    Porovnání spekter: graf, seznam spekter se zaškrtávátky a volba decimace.
+
+    Použití:
+        viewer = OverlayViewer()
+        viewer.add_spectra(spectra, names)
+        viewer.show()
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Porovnání spekter")
+        self.setWindowIcon(QIcon("ikonaramanbase.ico"))
+        self.spectra = []
+        self.names = []
+
+        layout = QVBoxLayout(self)
+        splitter = QSplitter(Qt.Horizontal)
+        self.canvas = OverlayCanvas()
+        splitter.addWidget(self.canvas)
+        self.list_spectra = QListWidget()
+        self.list_spectra.itemChanged.connect(self.toggle_spectrum)
+        splitter.addWidget(self.list_spectra)
+        splitter.setStretchFactor(0, 4)
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Decimace:"))
+        self.combo_method = QComboBox()
+        self.combo_method.addItem("Min/max na pixel", 'minmax')
+        self.combo_method.addItem("LTTB", 'lttb')
+        self.combo_method.currentIndexChanged.connect(self.change_method)
+        controls.addWidget(self.combo_method)
+        self.btn_reset = QPushButton("Celý rozsah")
+        self.btn_reset.clicked.connect(self.canvas.reset_view)
+        controls.addWidget(self.btn_reset)
+        self.btn_clear = QPushButton("Vyčistit")
+        self.btn_clear.clicked.connect(self.clear)
+        controls.addWidget(self.btn_clear)
+        self.label_info = QLabel()
+        self.label_info.setStyleSheet("color: #555;")
+        controls.addWidget(self.label_info, 1)
+        layout.addLayout(controls)
+
+        hint = QLabel("Tažením posun, kolečkem zoom osy x, Ctrl + kolečko zoom osy y, dvojklik celý rozsah.")
+        hint.setStyleSheet("font-size: 12px; color: #555;")
+        layout.addWidget(hint)
+        self.resize(1100, 650)
+
+    def add_spectra(self, spectra, names):
+        """Přidá spektra (seznam Spectrum) s popisky do porovnání."""
+        self.spectra.extend(spectra)
+        self.names.extend(names)
+        self.rebuild()
+
+    def clear(self):
+        self.spectra = []
+        self.names = []
+        self.canvas.spectra = None
+        self.list_spectra.clear()
+        self.label_info.clear()
+        self.canvas.update()
+
+    def rebuild(self):
+        if not self.spectra:
+            self.clear()
+            return
+        # Většina spekter s klesající osou x -> kreslí se jako Ramanova spektra (obrácená osa)
+        descending = sum(1 for s in self.spectra if len(s) > 1 and s.x[0] > s.x[-1])
+        _, _, needed = union_axis(self.spectra)
+        self.canvas.set_spectra(union_set(self.spectra), reversed_x=descending * 2 > len(self.spectra))
+        self.list_spectra.blockSignals(True)
+        self.list_spectra.clear()
+        for name, color in zip(self.names, self.canvas.colors):
+            item = QListWidgetItem(name)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            item.setForeground(color)
+            self.list_spectra.addItem(item)
+        self.list_spectra.blockSignals(False)
+        total = sum(len(s) for s in self.spectra)
+        info = f"{len(self.spectra)} spekter, {total} bodů, společná osa {len(self.canvas.spectra.x)} bodů"
+        if needed > len(self.canvas.spectra.x):
+            info += f" (omezeno z {needed}, jemnější spektra jsou převzorkovaná)"
+        self.label_info.setText(info)
+
+    def toggle_spectrum(self, item):
+        self.canvas.visible[self.list_spectra.row(item)] = item.checkState() == Qt.Checked
+        self.canvas.update()
+
+    def change_method(self):
+        self.canvas.method = self.combo_method.currentData()
+        self.canvas.update()
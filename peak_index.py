@@ -0,0 +1,121 @@
+# peak_index.py
+"""
+Předpočítaný index kandidátů na peaky pro interaktivní nastavování prahů.
+
+Všechna lokální maxima spektra se najdou jednou (scipy.signal.find_peaks bez
+prahů) spolu s výškou, prominencí a šířkou. Kandidáti jsou seřazení podle
+výšky, takže dotaz s novým prahem výšky najde hranici binárním vyhledáváním
+a prominenci vyhodnotí jen nad kandidáty nad prahem. Posuvník tak může
+překreslovat peaky při každém pohybu.
+
+Výsledek je stejný jako find_peaks(y, height=..., distance=..., prominence=...):
+filtry se uplatní ve stejném pořadí (výška, vzdálenost, prominence) a výběr
+podle vzdálenosti běží jen nad kandidáty nad prahem výšky, se stejným pořadím
+při shodných výškách jako ve scipy. Na shodě záleží – digitalizovaná spektra
+jsou kvantovaná na pixely a shodné výšky peaků jsou v nich běžné. Výběr se
+ukládá pro každou dvojici (vzdálenost, práh výšky).
+"""
+import numpy as np
+from scipy.signal import find_peaks, peak_prominences, peak_widths
+
+
+def _select_by_distance(peaks, heights, distance):
+    """
+    Hladový výběr podle vzdálenosti jako scipy.signal.find_peaks: od nejvyššího peaku
+    odebere sousedy blíž než `distance`. Shodné výšky se procházejí ve stejném pořadí
+    jako ve scipy (np.argsort nad výškami v pořadí podle polohy).
+
+    Parameters:
+        peaks (ndarray): Polohy peaků seřazené vzestupně.
+        heights (ndarray): Výšky peaků ve stejném pořadí.
+        distance (int): Minimální vzdálenost peaků.
+
+    Returns:
+        ndarray: Maska peaků, které zůstanou.
+    """
+    keep = np.ones(len(peaks), dtype=bool)
+    if distance <= 1:
+        return keep
+    for j in np.argsort(np.asarray(heights, dtype=np.float64))[::-1]:
+        if not keep[j]:
+            continue
+        # Sousedé v okně (peaks[j] - distance, peaks[j] + distance), kromě peaku samotného
+        lo = np.searchsorted(peaks, peaks[j] - distance, side='right')
+        hi = np.searchsorted(peaks, peaks[j] + distance, side='left')
+        keep[lo:j] = False
+        keep[j + 1:hi] = False
+    return keep
+
+
+class PeakIndex:
+    """
+    Použití:
+        index = PeakIndex(data_x, data_y)
+        peaks = index.query(height=10, prominence=0.5, distance=10)   # indexy do data_y
+        data_x[peaks], data_y[peaks]
+    """
+
+    def __init__(self, data_x, data_y):
+        self.data_x = np.asarray(data_x)
+        self.data_y = np.asarray(data_y)
+        positions, _ = find_peaks(self.data_y)
+        prominences, left_bases, right_bases = peak_prominences(self.data_y, positions)
+        widths = peak_widths(self.data_y, positions, prominence_data=(prominences, left_bases, right_bases))[0]
+        heights = self.data_y[positions]
+
+        # Seřazení podle výšky; dotaz na práh výšky je pak hranice v tomto pořadí
+        order = np.argsort(heights, kind='stable')
+        self.positions = positions[order]
+        self.heights = heights[order]
+        self.prominences = prominences[order]
+        self.widths = widths[order]
+        self._distance_masks = {}  # (min_distance, start) -> maska kandidátů po výběru podle vzdálenosti
+
+    def __len__(self):
+        return len(self.positions)
+
+    def distance_mask(self, distance, start=0):
+        """
+        Maska kandidátů self.positions[start:] (tedy nad prahem výšky), kteří projdou
+        výběrem podle vzdálenosti jako ve find_peaks.
+        """
+        distance = int(distance)
+        key = (distance, int(start))
+        mask = self._distance_masks.get(key)
+        if mask is None:
+            positions = self.positions[start:]
+            by_position = np.argsort(positions)
+            kept = _select_by_distance(positions[by_position], self.data_y[positions[by_position]], distance)
+            mask = np.empty(len(positions), dtype=bool)
+            mask[by_position] = kept
+            self._distance_masks[key] = mask
+        return mask
+
+    def query(self, height=None, prominence=None, distance=None):
+        """
+        Parameters:
+            height (float, optional): Minimální výška peaku (jako sensitivity).
+            prominence (float, optional): Minimální prominence.
+            distance (int, optional): Minimální vzdálenost peaků v bodech (jako min_distance).
+
+        Returns:
+            ndarray: Indexy peaků do data_y, seřazené podle polohy.
+        """
+        start = 0 if height is None else np.searchsorted(self.heights, height, side='left')
+        keep = np.ones(len(self.positions) - start, dtype=bool)
+        if distance is not None:
+            keep &= self.distance_mask(distance, start)
+        if prominence is not None:
+            keep &= self.prominences[start:] >= prominence
+        return np.sort(self.positions[start:][keep])
+
+    def properties(self, peaks):
+        """Výška, prominence a šířka (v jednotkách osy x) vybraných peaků."""
+        lookup = np.searchsorted(np.sort(self.positions), peaks)
+        by_position = np.argsort(self.positions)[lookup]
+        step = abs(self.data_x[1] - self.data_x[0]) if len(self.data_x) > 1 else 1.0
+        return {
+            'peak_heights': self.heights[by_position],
+            'prominences': self.prominences[by_position],
+            'widths': self.widths[by_position] * step,
+        }
@@ -0,0 +1,254 @@
+# pipeline.py
+"""
+Inkrementální pipeline obrázek -> středová linka -> spektrum -> peaky.
+
+Každý krok si pamatuje svůj poslední výstup spolu s klíčem vstupů. Při dalším
+volání se přepočítá jen ten krok (a kroky za ním), jehož vstupy se změnily.
+Změna Xmin/Xmax/Ymin/Ymax tak přepočítá pouze kalibraci, vyhlazení a peaky,
+změna parametrů peaků jen detekci peaků.
+
+S volitelnou ResultCache se drahá středová linka navíc ukládá na disk pod
+hashem pixelů a parametrů, takže přežije i konec sezení. Levné kroky
+(kalibrace, peaky) zůstávají jen v paměti – zápis na disk by byl dražší
+než jejich přepočet.
+"""
+import hashlib
+
+import numpy as np
+
+from instrumentation import maybe_stage
+from simple_line import binarize_image, find_binary_contours, contours_to_center_line, calibrate_center_line
+from stitching import stitch_contours
+from find_peaks import detect_peaks
+from multi_trace import extract_traces
+from peak_index import PeakIndex
+from smoothing import pixel_quantum, smooth
+from pyramid import BYTES_PER_PIXEL, extract_center_line_pyramid
+from result_cache import result_key
+
+
+def array_key(img):
+    """Vrátí klíč obsahu pole (tvar, dtype a hash pixelů)."""
+    digest = hashlib.blake2b(np.ascontiguousarray(img).data, digest_size=16).hexdigest()
+    return img.shape, str(img.dtype), digest
+
+
+class SpectrumPipeline:
+    """
+    Cache mezivýsledků zpracování jednoho obrázku.
+
+    Použití:
+        pipeline.set_source(key, loader)          # loader() vrátí RGB pole, volá se jen při změně key
+        center_line, contour = pipeline.center_line()
+        data_x, data_y = pipeline.spectrum(x_min, x_max, y_min, y_max)
+        data_x, data_y = pipeline.smoothed((x_min, x_max, y_min, y_max), ('savgol', 10.0))
+        peaks, properties = pipeline.peaks((x_min, x_max, y_min, y_max), sensitivity, min_distance)
+    """
+
+    def __init__(self, instr=None, memory_budget=None, result_cache=None):
+        self.instr = instr
+        self.result_cache = result_cache
+        # Obrázky, jejichž plné zpracování by přesáhlo rozpočet (v bajtech), jdou přes pyramid.py
+        self.memory_budget = memory_budget
+        self._source_key = None
+        self._loader = None
+        self._binary_key = None  # klíč obsahu masky dodané set_binary (None = maska z Otsua)
+        self._cache = {}  # název kroku -> (klíč vstupů, výstup)
+
+    def set_source(self, key, loader):
+        """
+        Nastaví zdroj obrázku. `key` musí jednoznačně identifikovat obsah (např. QPixmap.cacheKey()),
+        `loader` je funkce bez argumentů vracející obrázek jako NumPy pole.
+        """
+        if key != self._source_key:
+            self._source_key = key
+            self._loader = loader
+            self._binary_key = None
+
+    def set_image(self, img, key=None):
+        """Nastaví zdroj přímo z pole; bez zadaného klíče se použije hash obsahu."""
+        self.set_source(key if key is not None else array_key(img), lambda: img)
+
+    def set_binary(self, binary):
+        """
+        Dodá hotovou binární masku aktuálního zdroje (True = pozadí, jako binarize_image), např.
+        z výběru barvy; krok binarize se pak nepočítá a kontury i středová linka vzniknou z ní.
+        """
+        key = array_key(binary)
+        if key != self._binary_key:
+            # Mezivýsledky z jiné masky téhož zdroje neplatí
+            self._cache = {name: value for name, value in self._cache.items() if name in ('convert', 'digest')}
+            self._binary_key = key
+        self._cache['binarize'] = ((self._source_key,), binary)
+
+    def invalidate(self):
+        """Zahodí všechny uložené mezivýsledky."""
+        self._cache.clear()
+
+    def _exceeds_budget(self, shape):
+        return self.memory_budget is not None and shape[0] * shape[1] * BYTES_PER_PIXEL > self.memory_budget
+
+    def _stage(self, name, key, compute):
+        # Vstupy kroku musí volající získat předem (mimo compute), aby se měření kroků nevnořovala.
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with maybe_stage(self.instr, name):
+            value = compute()
+        self._cache[name] = (key, value)
+        return value
+
+    def _result_key(self, step, **params):
+        """Klíč do result_cache (hash pixelů + parametry), nebo None bez trvalé cache."""
+        if self.result_cache is None:
+            return None
+        img = self.image()
+        digest = self._stage('digest', (self._source_key,), lambda: array_key(img))
+        if self._binary_key is not None:
+            # Výsledek z dodané masky se nesmí zaměnit s výsledkem z Otsua téhož obrázku
+            params['binary'] = self._binary_key[2]
+        return result_key(digest, step, **params)
+
+    def _persistent(self, name, key, rkey, fields, compute):
+        """Jako _stage, ale výsledek (n-tici polí `fields`) hledá a ukládá i v result_cache."""
+        def load_or_compute():
+            if rkey is not None:
+                arrays = self.result_cache.get(rkey)
+                if arrays is not None:
+                    return tuple(arrays[field] for field in fields)
+            value = compute()
+            if rkey is not None:
+                self.result_cache.put(rkey, **dict(zip(fields, value)))
+            return value
+
+        return self._stage(name, key, load_or_compute)
+
+    def image(self):
+        """Obrázek jako NumPy pole (krok 'convert')."""
+        if self._loader is None:
+            raise ValueError("Pipeline nemá nastavený žádný obrázek.")
+        return self._stage('convert', (self._source_key,), self._loader)
+
+    def binary(self):
+        """Binární maska po Otsuově prahu a odstranění malých objektů."""
+        img = self.image()
+        return self._stage('binarize', (self._source_key,), lambda: binarize_image(img))
+
+    def contours(self):
+        """Všechny kontury binární masky."""
+        binary = self.binary()
+        return self._stage('contour', (self._source_key,), lambda: find_binary_contours(binary))
+
+    def center_line(self, stitch_tolerance=None):
+        """
+        Parameters:
+            stitch_tolerance (float, optional): Spojit všechny fragmenty kontur s touto tolerancí
+                místo použití jen nejdelší kontury.
+
+        Returns:
+            tuple: (center_line, longest_contour) – středová linka v pixelech a nejdelší kontura.
+        """
+        img = self.image()
+        fields = ('center_line', 'longest_contour')
+        if self._exceeds_budget(img.shape) and self._binary_key is None:
+            # Velký sken: binarizace a kontury jen v oblasti křivky nalezené na zmenšené úrovni
+            rkey = self._result_key('pyramid', stitch_tolerance=stitch_tolerance, memory_budget=self.memory_budget)
+            return self._persistent('pyramid', (self._source_key, stitch_tolerance, self.memory_budget), rkey, fields,
+                                    lambda: extract_center_line_pyramid(img, self.memory_budget, stitch_tolerance))
+
+        key = (self._source_key, stitch_tolerance)
+        cached = self._cache.get('center line')
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        rkey = self._result_key('center line', stitch_tolerance=stitch_tolerance)
+        # Při zásahu v trvalé cache se binarizace ani kontury vůbec nepočítají
+        stored = self.result_cache.get(rkey) if rkey is not None else None
+        if stored is not None:
+            return self._stage('center line', key, lambda: tuple(stored[field] for field in fields))
+        contours = self.contours()
+
+        def compute():
+            longest_contour = max(contours, key=len)
+            if stitch_tolerance is None:
+                return contours_to_center_line([longest_contour]), longest_contour
+            return stitch_contours(contours, stitch_tolerance), longest_contour
+
+        return self._persistent('center line', key, rkey, fields, compute)
+
+    def spectrum(self, x_min, x_max, y_min, y_max, stitch_tolerance=None):
+        """
+        Returns:
+            tuple: (data_x, data_y) – středová linka převedená do hodnot os.
+        """
+        limits = (float(x_min), float(x_max), float(y_min), float(y_max))
+        key = (self._source_key, limits, stitch_tolerance)
+        center_line, _ = self.center_line(stitch_tolerance)
+        shape = self.image().shape
+        return self._stage('calibrate', key, lambda: calibrate_center_line(center_line, shape, *limits))
+
+    def smoothed(self, limits, smoothing=None, stitch_tolerance=None):
+        """
+        Parameters:
+            limits (tuple): (x_min, x_max, y_min, y_max) pro kalibraci.
+            smoothing (tuple, optional): (metoda, okno v jednotkách osy x) pro smoothing.smooth;
+                None = spektrum bez vyhlazení.
+
+        Returns:
+            tuple: (data_x, data_y) – vyhlazené spektrum.
+        """
+        limits = tuple(float(v) for v in limits)
+        data_x, data_y = self.spectrum(*limits, stitch_tolerance=stitch_tolerance)
+        if smoothing is None:
+            return data_x, data_y
+        method, window = smoothing
+        key = (self._source_key, limits, stitch_tolerance, method, window)
+        return self._stage('smooth', key, lambda: (data_x, smooth(data_x, data_y, method, window)))
+
+    def traces(self, group_by='vertical', n_traces=None):
+        """
+        Středové linky všech křivek v obrázku (viz multi_trace.extract_traces), sdílí binární masku.
+        """
+        key = (self._source_key, group_by, n_traces)
+        img, binary = self.image(), self.binary()
+        return self._stage('traces', key, lambda: extract_traces(img, group_by, n_traces, binary=binary))
+
+    def trace_spectra(self, limits, group_by='vertical', n_traces=None):
+        """
+        Returns:
+            list of tuple: (data_x, data_y) pro každou křivku, shora dolů.
+        """
+        limits = tuple(float(v) for v in limits)
+        key = (self._source_key, limits, group_by, n_traces)
+        lines = self.traces(group_by, n_traces)
+        shape = self.image().shape
+        return self._stage('calibrate traces', key,
+                           lambda: [calibrate_center_line(line, shape, *limits) for line in lines])
+
+    def peak_index(self, limits, stitch_tolerance=None, smoothing=None):
+        """
+        Index všech kandidátů na peaky (viz peak_index.PeakIndex) pro interaktivní prahy.
+        """
+        limits = tuple(float(v) for v in limits)
+        smoothing = tuple(smoothing) if smoothing is not None else None
+        data_x, data_y = self.smoothed(limits, smoothing, stitch_tolerance)
+        key = (self._source_key, limits, stitch_tolerance, smoothing)
+        return self._stage('peak index', key, lambda: PeakIndex(data_x, data_y))
+
+    def peaks(self, limits, sensitivity, min_distance, stitch_tolerance=None, smoothing=None):
+        """
+        Parameters:
+            limits (tuple): (x_min, x_max, y_min, y_max) pro kalibraci.
+            stitch_tolerance (float, optional): Tolerance spojování fragmentů (viz center_line).
+            smoothing (tuple, optional): Vyhlazení před detekcí (viz smoothed).
+            sensitivity (float): Práh výšky peaku.
+            min_distance (int): Minimální vzdálenost peaků v bodech.
+
+        Returns:
+            tuple: (indexy peaků, vlastnosti) z detect_peaks.
+        """
+        limits = tuple(float(v) for v in limits)
+        smoothing = tuple(smoothing) if smoothing is not None else None
+        key = (self._source_key, limits, stitch_tolerance, smoothing, float(sensitivity), int(min_distance))
+        _, data_y = self.smoothed(limits, smoothing, stitch_tolerance)
+        prominence = pixel_quantum(limits, self.image().shape[0]) if smoothing is not None else None
+        return self._stage('peaks', key, lambda: detect_peaks(data_y, sensitivity, min_distance, prominence))
@@ -0,0 +1,136 @@
+# pyramid.py
+"""
+Víceúrovňové (pyramidové) zpracování velmi velkých skenů.
+
+Oblast grafu/křivky se najde na zmenšené úrovni a drahé kroky (převod na šedou,
+Otsu, find_contours) se v plném rozlišení spustí jen uvnitř jejího ohraničujícího
+obdélníku. Pracovní úroveň se volí automaticky podle paměťového rozpočtu.
+"""
+import numpy as np
+from scipy import ndimage
+
+from simple_line import binarize_image, preprocess_image_from_array
+
+# Odhad paměti kroků preprocess_image_from_array na pixel (float64 šedá, masky, kontury)
+BYTES_PER_PIXEL = 24
+DEFAULT_MEMORY_BUDGET = 512 * 2 ** 20
+
+
+def downsample(img, factor):
+    """
+    Zmenší obrázek `factor`-krát v obou osách jako minimum bloků factor x factor.
+
+    Minimum (nejtmavší pixel bloku) zachová i tenkou tmavou křivku, kterou by průměrování rozmazalo.
+    Okraje, které se nevejdou do celého bloku, se zahodí.
+    """
+    if factor <= 1:
+        return img
+    height = img.shape[0] // factor * factor
+    width = img.shape[1] // factor * factor
+    img = img[:height, :width]
+    # Minimum po posunutých řezech s krokem `factor` (nejdřív sloupce, pak řádky); o řád
+    # rychlejší než min přes osy bloků z reshape, který NumPy prochází po prvcích
+    columns = img[:, ::factor].copy()
+    for offset in range(1, factor):
+        np.minimum(columns, img[:, offset::factor], out=columns)
+    out = columns[::factor].copy()
+    for offset in range(1, factor):
+        np.minimum(out, columns[offset::factor], out=out)
+    return out
+
+
+def choose_level(shape, memory_budget=DEFAULT_MEMORY_BUDGET, bytes_per_pixel=BYTES_PER_PIXEL):
+    """
+    Vrátí nejmenší faktor zmenšení (mocninu dvou), při kterém se zpracování vejde do rozpočtu.
+    """
+    pixels = shape[0] * shape[1]
+    factor = 1
+    while pixels * bytes_per_pixel / factor ** 2 > memory_budget and min(shape[:2]) // (factor * 2) >= 16:
+        factor *= 2
+    return factor
+
+
+def find_trace_region(small):
+    """
+    Najde ohraničující obdélník oblasti grafu na zmenšené úrovni: tmavou komponentu
+    s největším ohraničujícím obdélníkem (křivka, případně s rámem os). Řádky textu
+    jsou sice široké, ale nízké, takže nevyhrají.
+
+    Returns:
+        tuple: (y0, y1, x0, x1) na zmenšené úrovni, konce nejsou včetně.
+    """
+    dark = ~binarize_image(small)
+    labels, count = ndimage.label(dark, structure=np.ones((3, 3), dtype=bool))
+    if count == 0:
+        raise ValueError("Nebyla nalezena žádná křivka v obrázku.")
+    slices = ndimage.find_objects(labels)
+    best = max(slices, key=lambda s: (s[0].stop - s[0].start) * (s[1].stop - s[1].start))
+    return best[0].start, best[0].stop, best[1].start, best[1].stop
+
+
+def extract_center_line_pyramid(img, memory_budget=DEFAULT_MEMORY_BUDGET, stitch_tolerance=None, margin=2):
+    """
+    Středová linka velkého obrázku s omezenou pamětí.
+
+    1. Podle rozpočtu se zvolí úroveň, na které se najde oblast křivky.
+    2. Oblast (rozšířená o `margin` bloků) se zpracuje v plném rozlišení, pokud se vejde
+       do rozpočtu; jinak na nejjemnější úrovni, která se vejde.
+    3. Souřadnice se převedou zpět do pixelů celého obrázku.
+
+    Parameters:
+        img (ndarray): Obrázek (H, W, 3+).
+        memory_budget (int): Paměťový rozpočet v bajtech.
+        stitch_tolerance (float, optional): Tolerance spojování fragmentů v pixelech celého obrázku.
+        margin (int): Okraj kolem nalezené oblasti v blocích zmenšené úrovně.
+
+    Returns:
+        tuple: (center_line, longest_contour) v pixelech celého obrázku.
+    """
+    factor = choose_level(img.shape, memory_budget)
+    y0, y1, x0, x1 = 0, img.shape[0], 0, img.shape[1]
+    if factor > 1:
+        sy0, sy1, sx0, sx1 = find_trace_region(downsample(img, factor))
+        y0 = max(0, (sy0 - margin) * factor)
+        x0 = max(0, (sx0 - margin) * factor)
+        y1 = min(img.shape[0], (sy1 + margin) * factor)
+        x1 = min(img.shape[1], (sx1 + margin) * factor)
+
+    region = img[y0:y1, x0:x1]
+    work_factor = choose_level(region.shape, memory_budget)
+    work = downsample(region, work_factor)
+    tolerance = stitch_tolerance / work_factor if stitch_tolerance is not None else None
+    _, center_line, longest_contour = preprocess_image_from_array(work, stitch_tolerance=tolerance)
+
+    # Zpět do pixelů celého obrázku (střed bloku zmenšené úrovně)
+    scale = np.array([work_factor, work_factor], dtype=float)
+    offset = np.array([y0, x0], dtype=float) + (work_factor - 1) / 2
+    return center_line * scale + offset, longest_contour * scale + offset
+
+
+def preview_factor(shape, max_pixels):
+    """Nejmenší faktor zmenšení (mocnina dvou), při kterém má výřez nejvýše `max_pixels` pixelů."""
+    factor = 1
+    while shape[0] * shape[1] / factor ** 2 > max_pixels and min(shape[:2]) // (factor * 2) >= 8:
+        factor *= 2
+    return factor
+
+
+def preview_center_line(small, factor):
+    """
+    Rychlý náhled středové linky z výřezu zmenšené úrovně (downsample s `factor`).
+
+    Parameters:
+        small (ndarray): Zmenšený výřez (H, W, 3+).
+        factor (int): Faktor zmenšení výřezu.
+
+    Returns:
+        ndarray: Středová linka (M, 2) s (y, x) v pixelech nezmenšeného výřezu, nebo None,
+            pokud ve výřezu není žádná křivka.
+    """
+    if min(small.shape[:2]) < 2:
+        return None
+    try:
+        _, center_line, _ = preprocess_image_from_array(small)
+    except ValueError:
+        return None
+    return center_line * factor + (factor - 1) / 2
@@ -0,0 +1,58 @@
+# qt_adapters.py
+"""
+Převody mezi Qt obrázky (QImage, QPixmap) a NumPy poli.
+
+Jediné místo, kde se zpracování obrázků potkává s Qt; jádro (core.py, pipeline.py,
+simple_line.py) pracuje jen s poli, takže ho pracovní procesy načtou bez Qt.
+"""
+import numpy as np
+from PyQt5.QtGui import QImage, QPixmap, QPolygonF
+
+
+def qimage_to_rgba(qimage):
+    """Pixely QImage jako pole (H, W, 4) uint8 včetně alfa kanálu."""
+    qimage = qimage.convertToFormat(QImage.Format_RGBA8888)
+    ptr = qimage.bits()
+    ptr.setsize(qimage.byteCount())
+    return np.array(ptr).reshape(qimage.height(), qimage.width(), 4)
+
+
+def qimage_to_array(qimage):
+    """Pixely QImage jako pole (H, W, 3) uint8 (alfa kanál se zahodí)."""
+    return qimage_to_rgba(qimage)[..., :3]
+
+
+def qpixmap_to_rgba(pixmap):
+    """Pixely QPixmap jako pole (H, W, 4) uint8 včetně alfa kanálu (průhledná místa po gumě)."""
+    return qimage_to_rgba(pixmap.toImage())
+
+
+def qpixmap_to_array(pixmap):
+    """Pixely QPixmap jako pole (H, W, 3) uint8."""
+    return qimage_to_array(pixmap.toImage())
+
+
+def array_to_qpixmap(arr):
+    """Převede pole (H, W, 3) nebo (H, W, 4) uint8 na QPixmap."""
+    arr = np.ascontiguousarray(arr, dtype=np.uint8)
+    height, width, channels = arr.shape
+    fmt = QImage.Format_RGBA8888 if channels == 4 else QImage.Format_RGB888
+    # copy() – QImage jinak jen odkazuje na paměť pole
+    qimage = QImage(arr.data, width, height, channels * width, fmt).copy()
+    return QPixmap.fromImage(qimage)
+
+
+def arrays_to_qpolygonf(x, y):
+    """
+    Body (x, y) jako QPolygonF pro QPainter.drawPolyline. Souřadnice se zapíšou přímo
+    do paměti polygonu (QPointF jsou dvojice double), bez vytváření QPointF po jednom.
+    """
+    n = len(x)
+    polygon = QPolygonF(n)
+    if n:
+        ptr = polygon.data()
+        ptr.setsize(n * 2 * np.dtype(np.float64).itemsize)
+        points = np.frombuffer(ptr, dtype=np.float64).reshape(n, 2)
+        points[:, 0] = x
+        points[:, 1] = y
+    return polygon
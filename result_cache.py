@@ -0,0 +1,64 @@
+# result_cache.py
+"""
+Trvalá cache výsledků digitalizace adresovaná obsahem.
+
+Klíčem je hash pixelů vstupního obrázku (po ořezu, vymazání, výběru clusteru)
+spolu se všemi parametry kroku, hodnotou sada NumPy polí v komprimovaném .npz.
+Ukládá se jen drahá středová linka (i z pyramidy), takže se stejný obrázek se
+stejnými parametry nepřepočítává ani mezi sezeními GUI, ani při opakovaných
+dávkových bězích. Kalibrace a peaky se z ní přepočítají v paměti rychleji,
+než by trval zápis .npz a úklid cache – a to při každé změně mezí os nebo
+citlivosti ve vlákně GUI. Při překročení limitu se mažou nejdéle nepoužité
+záznamy.
+"""
+import hashlib
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from image_cache import DiskCache, default_cache_dir
+
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+
+
+def result_key(content_key, step, **params):
+    """
+    Klíč výsledku: obsah vstupu (např. pipeline.array_key), název kroku a jeho parametry.
+    Parametry musí být převoditelné na JSON (čísla, řetězce, n-tice).
+    """
+    source = json.dumps([repr(content_key), step, sorted(params.items())], default=repr)
+    return hashlib.blake2b(source.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class ResultCache(DiskCache):
+    """
+    Použití:
+        cache = ResultCache()
+        key = result_key(array_key(img), 'center line', stitch_tolerance=None)
+        arrays = cache.get(key)            # dict polí, nebo None
+        cache.put(key, center_line=center_line)
+    """
+    suffix = '.npz'
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(directory or default_cache_dir('results'), max_bytes)
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """Vrátí uložená pole jako dict, nebo None, pokud záznam neexistuje (nebo je poškozený)."""
+        entry = self._entry_path(key)
+        try:
+            with np.load(entry, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (FileNotFoundError, ValueError, OSError, zipfile.BadZipFile):
+            return None
+        self.touch(entry)
+        return arrays
+
+    def put(self, key, **arrays):
+        """Uloží pole pod klíčem."""
+        self.write_atomic(self._entry_path(key), lambda f: np.savez_compressed(f, **arrays))
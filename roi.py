@@ -0,0 +1,210 @@
+# roi.py
+"""
+Více oblastí (ROI) jednoho obrázku – typicky mřížka panelů v publikačním obrázku.
+
+Každá oblast má vlastní ořez a kalibraci (meze os). Oblasti se zadají ručně, nebo
+se najdou automaticky (detect_panels): panel je velká souvislá tmavá komponenta
+(rám nebo osy se značkami), která neleží uvnitř jiné; v ní se rám a značky najdou
+stejně jako u jednoho grafu (axis_detection.detect_axes).
+
+Oblasti se zpracují souběžně v pracovních procesech (ProcessPoolExecutor jako fronta
+úloh – sestavení kontur ve skimage je čistý Python a vlákna by se střídala o GIL).
+Pixely se přitom neposílají: dekódovaný obrázek se jednou zkopíruje do sdílené paměti
+(multiprocessing.shared_memory) a každý proces z ní dostane jen pohled
+img[y:y + h, x:x + w] (batch.Job s `image` a `crop`). Výsledky mají formát
+batch.run_job s názvem oblasti, takže fungují s export_results_csv i results_to_spectra.
+"""
+import string
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy import ndimage
+
+from axis_detection import AxisFrame, detect_axes, calibrate_from_ticks
+from batch import Job, run_job, default_workers
+from simple_line import binarize_image
+
+
+class ROI:
+    """
+    Jedna oblast obrázku.
+
+    Atributy:
+        name (str): Označení oblasti v dávce (písmeno panelu nebo zadaný název).
+        crop (tuple): (x, y, šířka, výška) v pixelech obrázku.
+        limits (tuple, optional): (x_min, x_max, y_min, y_max) jako vstupní pole Xleft/Xright/Ymin/Ymax;
+            None = oblast ještě není kalibrovaná.
+        frame (AxisFrame, optional): Rám nalezený detect_panels (pro kalibraci ze značek).
+    """
+
+    def __init__(self, name, crop, limits=None, frame=None):
+        self.name = name
+        self.crop = tuple(int(v) for v in crop)
+        self.limits = None if limits is None else tuple(float(v) for v in limits)
+        self.frame = frame
+
+    def __repr__(self):
+        return f"ROI({self.name!r}, crop={self.crop}, limits={self.limits})"
+
+    def calibrate(self, x_tick_values, y_tick_values):
+        """Nastaví ořez a meze os z hodnot značek nalezeného rámu (viz calibrate_from_ticks)."""
+        if self.frame is None:
+            raise ValueError(f"Oblast {self.name}: rám os nebyl nalezen, zadejte meze ručně.")
+        calibration = calibrate_from_ticks(self.frame, x_tick_values, y_tick_values)
+        self.crop = calibration['crop']
+        self.limits = tuple(float(calibration[key]) for key in ('x_min', 'x_max', 'y_min', 'y_max'))
+
+    def job(self, image, **options):
+        """Úloha batch.Job nad sdíleným obrázkem; ořez se provede až pohledem v load_job_image."""
+        return Job(self.name, self.limits, image=image, crop=self.crop, **options)
+
+
+def panel_name(index):
+    """Označení panelu podle pořadí: a, b, … z, pak p27, p28, …"""
+    return string.ascii_lowercase[index] if index < 26 else f"p{index + 1}"
+
+
+def _shifted(frame, dx, dy):
+    """Rám nalezený ve výřezu převedený do souřadnic celého obrázku."""
+    return AxisFrame(frame.left + dx, frame.right + dx, frame.top + dy, frame.bottom + dy, frame.thickness,
+                     frame.x_ticks + dx, frame.y_ticks + dy)
+
+
+def _reading_order(frames):
+    """Seřadí rámy po řádcích shora dolů a v řádku zleva doprava."""
+    rows = []
+    for frame in sorted(frames, key=lambda f: f.top):
+        row = rows[-1] if rows else None
+        # Do stejného řádku patří rám, který začíná v horní polovině prvního rámu řádku
+        if row is not None and frame.top < row[0].top + (row[0].bottom - row[0].top) / 2:
+            row.append(frame)
+        else:
+            rows.append([frame])
+    return [frame for row in rows for frame in sorted(row, key=lambda f: f.left)]
+
+
+def detect_panels(img, min_fraction=0.1, binary=None):
+    """
+    Najde panely (rámy grafů) v obrázku s více grafy.
+
+    Panely, jejichž rámy se dotýkají (sdílené osy), splynou do jedné komponenty
+    a najdou se jako jeden panel; takové oblasti je potřeba zadat ručně.
+
+    Parameters:
+        img (ndarray): Obrázek (H, W, 3+).
+        min_fraction (float): Minimální šířka i výška panelu jako podíl rozměrů obrázku.
+        binary (ndarray, optional): Již spočtená maska z binarize_image.
+
+    Returns:
+        list of ROI: Panely v pořadí čtení, pojmenované a, b, c…; mají `frame`, ale ještě ne `limits`.
+    """
+    if binary is None:
+        binary = binarize_image(img)
+    height, width = binary.shape
+    labels, _ = ndimage.label(~binary, structure=np.ones((3, 3), dtype=bool))
+    boxes = [box for box in ndimage.find_objects(labels)
+             if box[0].stop - box[0].start >= min_fraction * height
+             and box[1].stop - box[1].start >= min_fraction * width]
+    # Od největších: komponenta uvnitř již nalezeného panelu je jeho křivka nebo popisek
+    boxes.sort(key=lambda b: (b[0].stop - b[0].start) * (b[1].stop - b[1].start), reverse=True)
+    panels = []
+    for rows, cols in boxes:
+        if any(r.start <= rows.start and rows.stop <= r.stop and c.start <= cols.start and cols.stop <= c.stop
+               for r, c in panels):
+            continue
+        panels.append((rows, cols))
+
+    frames = []
+    for rows, cols in panels:
+        # Okraj kolem komponenty, aby se našly i vnější značky (nemusí být s rámem spojené)
+        margin = max(4, int(0.03 * min(rows.stop - rows.start, cols.stop - cols.start)))
+        y0, x0 = max(0, rows.start - margin), max(0, cols.start - margin)
+        y1, x1 = min(height, rows.stop + margin), min(width, cols.stop + margin)
+        try:
+            frame = detect_axes(img[y0:y1, x0:x1], binary=binary[y0:y1, x0:x1])
+        except ValueError:
+            continue
+        frames.append(_shifted(frame, x0, y0))
+    return [ROI(panel_name(i), frame.crop_rect(), frame=frame) for i, frame in enumerate(_reading_order(frames))]
+
+
+def _run_shared(name, shape, dtype, roi, options):
+    """Zpracuje oblast v pracovním procesu nad obrázkem ve sdílené paměti `name`."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        img = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        result = run_job(roi.job(img, **options), False)
+        del img  # pohled musí zaniknout před close()
+    finally:
+        shm.close()
+    return result
+
+
+def _release_when_done(futures, shm):
+    """Uvolní sdílenou paměť, jakmile doběhnou (nebo se zruší) všechny futures."""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            shm.close()
+            shm.unlink()
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def submit_rois(img, rois, executor=None, **options):
+    """
+    Spustí zpracování všech oblastí souběžně v pracovních procesech nad jednou kopií pixelů.
+
+    Parameters:
+        img (ndarray): Dekódovaný obrázek (H, W, 3); zkopíruje se jednou do sdílené paměti,
+            oblasti jsou pak jen jeho pohledy.
+        rois (list of ROI): Kalibrované oblasti.
+        executor (ProcessPoolExecutor, optional): Pool pracovních procesů (např. dlouhodobý pool GUI);
+            bez něj se vytvoří nový s batch.default_workers procesy a po doběhnutí úloh se ukončí.
+        **options: Společné volby batch.Job (stitch, group_by, n_traces, smoothing).
+
+    Returns:
+        list of Future: Future s výsledkem run_job pro každou oblast (v pořadí `rois`).
+    """
+    missing = [roi.name for roi in rois if roi.limits is None]
+    if missing:
+        raise ValueError(f"Oblasti bez kalibrace: {', '.join(missing)}.")
+    if not rois:
+        return []
+    img = np.ascontiguousarray(img)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, img.nbytes))
+    shared = np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)
+    shared[...] = img
+    del shared
+    own = executor is None
+    if own:
+        executor = ProcessPoolExecutor(max_workers=max(1, min(default_workers(), len(rois))))
+    try:
+        futures = [executor.submit(_run_shared, shm.name, img.shape, img.dtype.str, roi, options) for roi in rois]
+    except Exception:
+        shm.close()
+        shm.unlink()
+        raise
+    _release_when_done(futures, shm)
+    if own:
+        # Executor se ukončí po doběhnutí úloh, futures zůstanou platné
+        executor.shutdown(wait=False)
+    return futures
+
+
+def process_rois(img, rois, executor=None, **options):
+    """
+    Zpracuje všechny oblasti (viz submit_rois) a počká na výsledky.
+
+    Returns:
+        list of dict: Jedna dávka výsledků ve formátu run_job, 'name' je označení oblasti.
+    """
+    return [future.result() for future in submit_rois(img, rois, executor, **options)]
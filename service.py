@@ -0,0 +1,325 @@
+# service.py
+"""
+Lokální HTTP služba pro digitalizaci bez GUI (skripty LIMS, notebooky).
+
+Server naslouchá jen na localhost a požadavky předává do předem spuštěných
+pracovních procesů, které mají těžké knihovny (scikit-image, SciPy, scikit-learn)
+už načtené. Obrázek je tělo požadavku, parametry jsou v query stringu:
+
+    POST /digitize?limits=4000,0,0,100&sensitivity=10&min_distance=10
+        crop=x,y,w,h            ořez v pixelech obrázku
+        limits=XL,XR,YMIN,YMAX  meze os (obrázek oříznutý na graf)
+        x_ticks=..., y_ticks=...  místo limits: automatická kalibrace z os (axis_detection)
+        clusters=k&cluster=n    ponechat jen n-tý z k barevných clusterů
+        color=R,G,B&tolerance=T&space=lab|rgb   ponechat jen křivku dané barvy (bez KMeans)
+        stitch=1                spojit přerušenou křivku
+        smooth=savgol|median|spline&window=W   vyhlazení (okno v jednotkách osy x)
+        group_by=vertical|color, n_traces=N   režim více křivek
+        format=json|npz         JSON (výchozí) nebo binární .npz (x_<i>, y_<i>, peaks_<i>)
+    GET /metrics                hloubka fronty, počty a latence požadavků (JSON)
+    GET /health
+
+Použití:
+    python service.py --port 8765
+    curl --data-binary @spektrum.png "http://127.0.0.1:8765/digitize?limits=4000,0,0,100"
+"""
+import argparse
+import collections
+import io
+import json
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from batch import default_workers
+from smoothing import METHODS
+from color_pick import SPACES
+
+DEFAULT_PORT = 8765
+MAX_IMAGE_BYTES = 256 * 2 ** 20
+# Počet posledních požadavků, ze kterých se počítají percentily latence
+LATENCY_WINDOW = 1000
+
+
+def _warm_worker():
+    """Initializer pracovního procesu: načte knihovny zpracování předem."""
+    import core  # noqa: F401
+    import clustering  # noqa: F401
+    import color_pick  # noqa: F401
+    import axis_detection  # noqa: F401
+    import image_cache  # noqa: F401
+
+
+def _ping():
+    return True
+
+
+def _floats(value, count=None, name='parametr'):
+    values = [float(v) for v in value.replace(';', ',').split(',') if v.strip()]
+    if count is not None and len(values) != count:
+        raise ValueError(f"{name} potřebuje {count} hodnot, zadáno {len(values)}.")
+    return values
+
+
+def parse_params(query):
+    """
+    Převede query string na argumenty digitize_image. Chybné hodnoty vyhodí ValueError.
+    """
+    raw = {name: values[-1] for name, values in parse_qs(query).items()}
+    params = {}
+    if 'crop' in raw:
+        params['crop'] = tuple(int(v) for v in _floats(raw['crop'], 4, 'crop'))
+    if 'limits' in raw:
+        params['limits'] = tuple(_floats(raw['limits'], 4, 'limits'))
+    if 'x_ticks' in raw or 'y_ticks' in raw:
+        if 'x_ticks' not in raw or 'y_ticks' not in raw:
+            raise ValueError("Automatická kalibrace potřebuje x_ticks i y_ticks.")
+        params['x_ticks'] = _floats(raw['x_ticks'], name='x_ticks')
+        params['y_ticks'] = _floats(raw['y_ticks'], name='y_ticks')
+    elif 'limits' not in params:
+        raise ValueError("Zadejte limits, nebo x_ticks a y_ticks.")
+    if 'clusters' in raw:
+        params['clusters'] = int(raw['clusters'])
+        params['cluster'] = int(raw.get('cluster', 0))
+    if 'color' in raw:
+        params['color'] = tuple(int(v) for v in _floats(raw['color'], 3, 'color'))
+        params['tolerance'] = float(raw['tolerance']) if raw.get('tolerance') else None
+        params['space'] = raw.get('space', 'lab')
+        if params['space'] not in SPACES:
+            raise ValueError(f"space musí být jedno z: {', '.join(SPACES)}.")
+    params['stitch'] = raw.get('stitch', '0').lower() in ('1', 'true', 'yes')
+    if raw.get('group_by'):
+        if raw['group_by'] not in ('vertical', 'color'):
+            raise ValueError("group_by musí být 'vertical' nebo 'color'.")
+        params['group_by'] = raw['group_by']
+        params['n_traces'] = int(raw['n_traces']) if raw.get('n_traces') else None
+    if raw.get('smooth'):
+        if raw['smooth'] not in METHODS:
+            raise ValueError(f"smooth musí být jedno z: {', '.join(METHODS)}.")
+        params['smoothing'] = (raw['smooth'], float(raw['window']) if raw.get('window') else None)
+    params['sensitivity'] = float(raw.get('sensitivity', 10.0))
+    params['min_distance'] = int(raw.get('min_distance', 10))
+    return params
+
+
+def digitize_image(data, limits=None, crop=None, x_ticks=None, y_ticks=None, clusters=None, cluster=0,
+                   color=None, tolerance=None, space='lab', stitch=False, group_by=None, n_traces=None, smoothing=None, sensitivity=10.0, min_distance=10):
+    """
+    Zpracuje jeden požadavek (běží v pracovním procesu).
+
+    Parameters:
+        data (bytes): Zakódovaný obrázek (PNG, JPEG, BMP).
+        Ostatní parametry viz parse_params a core.digitize.
+
+    Returns:
+        dict: 'spectra' (seznam (data_x, data_y)), 'peaks' (seznam indexů) a 'limits'.
+    """
+    from axis_detection import auto_calibrate
+    from core import digitize, isolate_cluster, isolate_color
+    from image_cache import decode_image
+
+    img = decode_image(io.BytesIO(data))
+    if crop is not None:
+        x, y, w, h = crop
+        img = img[y:y + h, x:x + w]
+    if x_ticks is not None:
+        _, calibration = auto_calibrate(img, x_ticks, y_ticks)
+        x, y, w, h = calibration['crop']
+        img = img[y:y + h, x:x + w]
+        limits = (calibration['x_min'], calibration['x_max'], calibration['y_min'], calibration['y_max'])
+    if img.size == 0:
+        raise ValueError("Ořez je mimo obrázek.")
+    if color is not None:
+        img = isolate_color(img, color, tolerance, space)
+    elif clusters:
+        img = isolate_cluster(img, clusters, cluster)
+    result = digitize(img, limits, stitch=stitch, group_by=group_by, n_traces=n_traces,
+                      peak_params=(sensitivity, min_distance), smoothing=smoothing)
+    result['limits'] = tuple(float(v) for v in limits)
+    return result
+
+
+def result_to_json(result, seconds):
+    spectra = []
+    for (data_x, data_y), peaks in zip(result['spectra'], result['peaks']):
+        spectra.append({
+            'x': data_x.tolist(),
+            'y': data_y.tolist(),
+            'peaks': [{'index': int(i), 'x': float(data_x[i]), 'y': float(data_y[i])} for i in peaks],
+        })
+    return json.dumps({'spectra': spectra, 'limits': result['limits'], 'seconds': seconds}).encode('utf-8')
+
+
+def result_to_npz(result):
+    arrays = {}
+    for i, ((data_x, data_y), peaks) in enumerate(zip(result['spectra'], result['peaks'])):
+        arrays[f'x_{i}'] = data_x
+        arrays[f'y_{i}'] = data_y
+        arrays[f'peaks_{i}'] = peaks
+    arrays['limits'] = np.array(result['limits'])
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+class Metrics:
+    """Počty a latence požadavků; sdílené vlákny serveru."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.in_flight = 0
+        self.counts = collections.Counter()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def begin(self, limit):
+        """Zaregistruje požadavek; vrátí False (a započte odmítnutí), pokud je rozpracováno už `limit` požadavků."""
+        with self.lock:
+            self.counts['requests'] += 1
+            if self.in_flight >= limit:
+                self.counts['rejected'] += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def end(self, seconds, outcome):
+        with self.lock:
+            self.in_flight -= 1
+            self.counts[outcome] += 1
+            self.latencies.append(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            latencies = np.array(self.latencies)
+            snapshot = {
+                'uptime': time.time() - self.started,
+                'workers': self.workers,
+                'in_flight': self.in_flight,
+                # Požadavky čekající na volný pracovní proces
+                'queue_depth': max(0, self.in_flight - self.workers),
+                **self.counts,
+            }
+        if len(latencies):
+            snapshot['latency'] = {
+                'mean': float(latencies.mean()),
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'max': float(latencies.max()),
+            }
+        return snapshot
+
+
+class DigitizeHandler(BaseHTTPRequestHandler):
+    server_version = 'PicToGraph/1.0'
+
+    def _send(self, status, body, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({'error': message}).encode('utf-8'))
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/metrics':
+            self._send(200, json.dumps(self.server.metrics.snapshot()).encode('utf-8'))
+        elif path == '/health':
+            self._send(200, b'{"status": "ok"}')
+        else:
+            self._error(404, "Neznámá cesta.")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/digitize':
+            self._error(404, "Neznámá cesta.")
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > MAX_IMAGE_BYTES:
+            self._error(400 if length <= 0 else 413, "Tělo požadavku musí obsahovat obrázek.")
+            return
+        data = self.rfile.read(length)
+        try:
+            params = parse_params(url.query)
+        except ValueError as e:
+            self._error(400, str(e))
+            return
+        binary = parse_qs(url.query).get('format', ['json'])[-1] == 'npz'
+
+        server = self.server
+        if not server.metrics.begin(server.workers + server.max_queue):
+            self._error(503, "Fronta požadavků je plná, zkuste to později.")
+            return
+        start = time.perf_counter()
+        try:
+            result = server.executor.submit(digitize_image, data, **params).result()
+        except Exception as e:
+            server.metrics.end(time.perf_counter() - start, 'errors')
+            self._error(422, str(e))
+            return
+        seconds = time.perf_counter() - start
+        server.metrics.end(seconds, 'ok')
+        if binary:
+            self._send(200, result_to_npz(result), 'application/octet-stream')
+        else:
+            self._send(200, result_to_json(result, seconds))
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class DigitizeServer(ThreadingHTTPServer):
+    """
+    HTTP server s předehřátým poolem pracovních procesů.
+
+    Každé vlákno požadavku čeká na výsledek svého procesu; nad rámec `workers`
+    běžících úloh se přijme nejvýše `max_queue` čekajících, další dostanou 503.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, workers=None, max_queue=32, quiet=False):
+        super().__init__(address, DigitizeHandler)
+        self.workers = workers or default_workers()
+        self.max_queue = max_queue
+        self.quiet = quiet
+        self.metrics = Metrics(self.workers)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # Spustí všechny procesy hned, aby první požadavky nečekaly na start a importy
+        for future in [self.executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokální HTTP služba pro digitalizaci spekter.")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port (naslouchá se jen na 127.0.0.1).")
+    parser.add_argument('--workers', type=int, help="Počet pracovních procesů.")
+    parser.add_argument('--queue-size', type=int, default=32,
+                        help="Maximální počet požadavků čekajících na volný proces.")
+    parser.add_argument('--quiet', action='store_true', help="Nevypisovat jednotlivé požadavky.")
+    args = parser.parse_args(argv)
+
+    server = DigitizeServer(('127.0.0.1', args.port), workers=args.workers, max_queue=args.queue_size,
+                            quiet=args.quiet)
+    print(f"Služba běží na http://127.0.0.1:{server.server_address[1]} (procesů {server.workers}).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Služba ukončena.")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
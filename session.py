@@ -0,0 +1,101 @@
+# session.py
+"""
+Soubory sezení (.ptg): původní obrázek, ořez, mapa clusterů, úpravy gumou
+a vypočtená spektra v jednom kompaktním binárním kontejneru.
+
+Kontejner je komprimovaný .npz (zip s .npy soubory) s dvěma částmi:
+    meta        JSON se skalárními údaji (cesta ke zdroji, ořez, parametry, verze)
+    <pole>      NumPy pole – 'image', 'working', 'cluster_labels', 'cluster_palette',
+                'eraser_strokes', 'result_x', 'result_y', 'trace_<i>_x', 'trace_<i>_y'
+
+Pole se při otevření nenačítají; každé se rozbalí až při prvním přístupu,
+takže otevření velkého sezení stojí jen přečtení adresáře zipu a metadat.
+"""
+import json
+import os
+import tempfile
+
+import numpy as np
+
+SESSION_VERSION = 1
+SESSION_FILTER = "PicToGraph session (*.ptg)"
+
+
+def save_session(path, meta, **arrays):
+    """
+    Uloží sezení. Pole s hodnotou None se vynechají.
+
+    Parameters:
+        path (str): Cílový soubor.
+        meta (dict): Údaje převoditelné na JSON.
+        **arrays: Pojmenovaná NumPy pole.
+    """
+    meta = dict(meta, version=SESSION_VERSION)
+    payload = {name: np.asarray(value) for name, value in arrays.items() if value is not None}
+    payload['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+    directory = os.path.dirname(os.path.abspath(path))
+    # Zápis přes dočasný soubor, aby chyba při ukládání nepoškodila předchozí verzi sezení
+    fd, tmp = tempfile.mkstemp(suffix='.ptg', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **payload)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Session:
+    """
+    Otevřené sezení s líným načítáním polí.
+
+    Použití:
+        with Session(path) as session:
+            crop = session.meta.get('crop')
+            if 'working' in session:
+                working = session['working']
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._npz = np.load(path, allow_pickle=False)
+        try:
+            self.meta = json.loads(self._npz['meta'].tobytes().decode('utf-8'))
+        except (KeyError, ValueError) as e:
+            self._npz.close()
+            raise ValueError(f"Soubor {path} není platné sezení: {e}")
+        if self.meta.get('version', 0) > SESSION_VERSION:
+            self._npz.close()
+            raise ValueError(f"Sezení bylo uloženo novější verzí programu (verze {self.meta['version']}).")
+        self._arrays = {}
+
+    def __contains__(self, name):
+        return name in self._npz.files and name != 'meta'
+
+    def __getitem__(self, name):
+        if name not in self._arrays:
+            if name not in self:
+                raise KeyError(name)
+            self._arrays[name] = self._npz[name]
+        return self._arrays[name]
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def traces(self):
+        """Vrátí uložené křivky režimu více křivek jako seznam (data_x, data_y)."""
+        traces = []
+        while f'trace_{len(traces)}_x' in self:
+            i = len(traces)
+            traces.append((self[f'trace_{i}_x'], self[f'trace_{i}_y']))
+        return traces
+
+    def close(self):
+        self._npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
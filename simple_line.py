@@ -1,24 +1,17 @@
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
 from skimage.color import rgb2gray
 from skimage.filters import threshold_otsu
 from skimage.morphology import remove_small_objects
 from skimage.measure import find_contours
 import numpy as np
-from PyQt5.QtGui import QImage
+from scipy import ndimage
 from collections import defaultdict
+from instrumentation import maybe_stage
+from stitching import stitch_contours
 
+# Modul nezávisí na Qt ani na pyplot (pyplot se importuje až ve vykreslovacích funkcích),
+# takže ho mohou načíst pracovní procesy bez GUI. Převody z QImage/QPixmap jsou v qt_adapters.py.
 
 
-def qimage_to_array(qimage):
-    qimage = qimage.convertToFormat(QImage.Format_RGBA8888)
-    width = qimage.width()
-    height = qimage.height()
-    ptr = qimage.bits()
-    ptr.setsize(qimage.byteCount())
-    arr = np.array(ptr).reshape(height, width, 4)
-    return arr[..., :3]  # Vrátíme jen RGB kanály
-
 def contours_to_center_line(contours):
     """
     Sloučí všechny body z (jedné či více) kontur do jedné křivky.
@@ -49,18 +42,115 @@ def contours_to_center_line(contours):
 
     return np.array(center_line)
 
-def preprocess_image_from_array(img):
+def mask_to_center_line(mask):
     """
-    Načte obrázek, převede jej na stupně šedi, vytvoří binární masku pomocí Otsuova prahu,
-    odstraní malé objekty a najde kontury v obrázku.
+    Vytvoří středovou linku přímo z masky pixelů křivky (vektorizovaně, bez kontur).
+    V každém sloupci x zprůměruje řádky všech pixelů masky.
 
     Parameters:
-        image_path (str): Cesta k obrázku.
+        mask (ndarray): Booleovská maska (H, W), True = pixel křivky.
 
     Returns:
-        img (ndarray): Původní obrázek.
-        main_contour (ndarray): Kontura s největší délkou.
+        center_line (ndarray): Pole tvaru (M, 2) s (y, x) pro sloupce, ve kterých maska něco obsahuje.
+    """
+    rows, cols = np.nonzero(mask)
+    counts = np.bincount(cols, minlength=mask.shape[1])
+    sums = np.bincount(cols, weights=rows, minlength=mask.shape[1])
+    xs = np.flatnonzero(counts)
+    return np.column_stack([sums[xs] / counts[xs], xs.astype(float)])
+
+# Koeficienty rgb2gray (0.2125, 0.7154, 0.0721) jako celá čísla; jas = součet / 2 550 000
+LUMINANCE_WEIGHTS = (2125, 7154, 721)
+# Počet pixelů zpracovaných najednou v blokových výpočtech (omezuje dočasná pole)
+CHUNK_PIXELS = 2 ** 20
+
+
+def row_chunks(height, width):
+    """Rozdělí řádky obrázku na bloky po zhruba CHUNK_PIXELS pixelech (vrací slice)."""
+    step = max(1, CHUNK_PIXELS // max(1, width))
+    for start in range(0, height, step):
+        yield slice(start, min(height, start + step))
+
+
+def integer_luminance(rgb):
+    """
+    Jas uint8 RGB obrázku jako uint32 (rgb2gray * 2 550 000), bez mezivýsledků ve float64.
     """
+    height, width = rgb.shape[:2]
+    lum = np.empty((height, width), dtype=np.uint32)
+    for rows in row_chunks(height, width):
+        out = lum[rows]
+        np.multiply(rgb[rows, :, 0], np.uint32(LUMINANCE_WEIGHTS[0]), out=out)
+        out += rgb[rows, :, 1] * np.uint32(LUMINANCE_WEIGHTS[1])
+        out += rgb[rows, :, 2] * np.uint32(LUMINANCE_WEIGHTS[2])
+    return lum
+
+
+def otsu_mask_integer(lum):
+    """
+    Otsuův práh celočíselného jasu a maska lum > práh.
+
+    Histogram má 256 košů mezi minimem a maximem jako threshold_otsu na float obrázku,
+    takže práh (a maska) odpovídá cestě přes rgb2gray.
+    """
+    lo, hi = int(lum.min()), int(lum.max())
+    if lo == hi:
+        return np.zeros(lum.shape, dtype=bool)
+    span = hi - lo
+    counts = np.zeros(256, dtype=np.int64)
+    for rows in row_chunks(*lum.shape):
+        bins = np.minimum((lum[rows].astype(np.int64) - lo) * 256 // span, 255)
+        counts += np.bincount(bins.ravel(), minlength=256)
+
+    # Stejný výpočet jako v threshold_otsu, středy košů v jednotkách lum
+    centers = lo + (np.arange(256) + 0.5) * span / 256
+    weight1 = np.cumsum(counts)
+    weight2 = np.cumsum(counts[::-1])[::-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean1 = np.cumsum(counts * centers) / weight1
+        mean2 = (np.cumsum((counts * centers)[::-1]) / weight2[::-1])[::-1]
+    variance12 = np.nan_to_num(weight1[:-1] * weight2[1:] * (mean1[:-1] - mean2[1:]) ** 2)
+    idx = int(np.argmax(variance12))
+    # lum > lo + (2 idx + 1) * span / 512  <=>  lum > celá část pravé strany
+    threshold = (512 * lo + (2 * idx + 1) * span) // 512
+    return lum > threshold
+
+
+def remove_small_components(mask, min_size):
+    """
+    Odstraní souvislé oblasti True (4-sousedství) menší než `min_size` pixelů,
+    stejně jako remove_small_objects, ale jedním označením a np.bincount.
+    """
+    labels, count = ndimage.label(mask)
+    if count == 0:
+        return mask
+    areas = np.zeros(count + 1, dtype=np.int64)
+    for rows in row_chunks(*labels.shape):
+        areas += np.bincount(labels[rows].ravel(), minlength=count + 1)
+    small = areas < min_size
+    small[0] = False
+    mask[small[labels]] = False
+    return mask
+
+
+def binarize_image(img):
+    """
+    Převede obrázek na stupně šedi, vytvoří binární masku pomocí Otsuova prahu
+    a odstraní malé objekty.
+
+    Obrázky uint8 jdou celočíselnou cestou (integer_luminance, otsu_mask_integer,
+    remove_small_components) se stejnou maskou a zhruba osminovou pamětí.
+
+    Parameters:
+        img (ndarray): Obrázek jako NumPy pole (alespoň 3 kanály).
+
+    Returns:
+        binary (ndarray): Binární maska (True = pozadí, křivka je tmavá).
+    """
+    if img.dtype == np.uint8:
+        binary = otsu_mask_integer(integer_luminance(img))
+        return remove_small_components(binary, min_size=20)
+
     # Předpokládáme, že img má alespoň 3 kanály (RGB)
     rgb = img[:, :, :3]  # Vybereme pouze RGB kanály
     gray = rgb2gray(rgb)  # Převedeme na stupně šedi
@@ -70,23 +160,69 @@ def preprocess_image_from_array(img):
     binary = gray > thresh  # Předpokládáme, že křivka je tmavá
 
     # Odstranění malých šumů
-    binary = remove_small_objects(binary, min_size=20)
+    return remove_small_objects(binary, min_size=20)
 
-    # Hledání kontur v binárním obrázku
-    contours = find_contours(binary, level=0.5)
 
+def find_binary_contours(binary):
+    """
+    Najde kontury v binární masce.
+
+    Returns:
+        contours (list of ndarray): Kontury z find_contours, každá Nx2 (y, x).
+    """
+    contours = find_contours(binary, level=0.5)
     if not contours:
         raise ValueError("Nebyla nalezena žádná kontura v obrázku.")
-    longest_contour = max(contours, key=len)
+    return contours
 
-    # # Vybereme konturu s největší délkou
-    # main_contour = max(contours, key=len)
-    center_line = contours_to_center_line([longest_contour])
 
+def preprocess_image_from_array(img, instr=None, stitch_tolerance=None):
+    """
+    Načte obrázek, převede jej na stupně šedi, vytvoří binární masku pomocí Otsuova prahu,
+    odstraní malé objekty a najde kontury v obrázku.
 
+    Parameters:
+        img (ndarray): Obrázek jako NumPy pole (alespoň 3 kanály).
+        instr (Instrumentation, optional): Měření kroků binarize, contour a center line.
+        stitch_tolerance (float, optional): Pokud je zadána, středová linka se místo nejdelší kontury
+            sestaví spojením všech fragmentů kontur (viz stitching.stitch_contours).
+
+    Returns:
+        img (ndarray): Původní obrázek.
+        main_contour (ndarray): Kontura s největší délkou.
+    """
+    with maybe_stage(instr, 'binarize'):
+        binary = binarize_image(img)
+
+    center_line, longest_contour = center_line_from_binary(binary, instr, stitch_tolerance)
     return img, center_line, longest_contour
 
 
+def center_line_from_binary(binary, instr=None, stitch_tolerance=None):
+    """
+    Středová linka z hotové binární masky (kroky contour a center line z preprocess_image_from_array).
+
+    Parameters:
+        binary (ndarray): Maska (True = pozadí, False = křivka), jako z binarize_image.
+        instr, stitch_tolerance: Viz preprocess_image_from_array.
+
+    Returns:
+        tuple: (center_line, longest_contour)
+    """
+    with maybe_stage(instr, 'contour'):
+        # Hledání kontur v binárním obrázku
+        contours = find_binary_contours(binary)
+
+    longest_contour = max(contours, key=len)
+
+    with maybe_stage(instr, 'center line'):
+        if stitch_tolerance is None:
+            center_line = contours_to_center_line([longest_contour])
+        else:
+            center_line = stitch_contours(contours, stitch_tolerance)
+    return center_line, longest_contour
+
+
 def calculate_figsize(img, base_width=10):
     """
     Vypočítá hodnoty figsize pro matplotlib tak, aby byl zachován poměr stran vstupního obrázku.
@@ -112,25 +248,40 @@ def calculate_figsize(img, base_width=10):
     return figsize
 
 
-def extract_and_plot_contour(img, main_contour, x_min, x_max, y_min, y_max):
+def calibrate_center_line(center_line, shape, x_min, x_max, y_min, y_max):
     """
-    Extrahuje souřadnice kontury, transformuje je do reálných hodnot a vykreslí graf spektra.
+    Převede souřadnice (y, x) v pixelech na reálné hodnoty os (afinní převod přes celý obrázek).
 
     Parameters:
-        img (ndarray): Původní obrázek.
-        main_contour (ndarray): Kontura s největší délkou.
-        x_min (float): Minimální hodnota na ose x.
-        x_max (float): Maximální hodnota na ose x.
-        y_min (float): Minimální hodnota na ose y.
-        y_max (float): Maximální hodnota na ose y.
+        center_line (ndarray): Pole (M, 2) s (y, x) v pixelech.
+        shape (tuple): Tvar obrázku (výška, šířka, ...).
+        x_min, x_max, y_min, y_max (float): Hodnoty os na okrajích obrázku.
+
+    Returns:
+        tuple: (data_x, data_y)
+    """
+    ys, xs = center_line[:, 0], center_line[:, 1]
+    data_x = x_min + (xs / shape[1]) * (x_max - x_min)
+    data_y = y_max - (ys / shape[0]) * (y_max - y_min)
+    return data_x, data_y
+
+
+def plot_spectrum(img, data_x, data_y):
+    """
+    Vykreslí extrahované spektrum do nové matplotlib figure se zachovaným poměrem stran obrázku.
     """
-    # Extrakce x, y souřadnic z kontury
-    ys, xs = main_contour[:, 0], main_contour[:, 1]
+    plot_spectra(img, [(data_x, data_y)])
+
 
-    # Transformace z pixelů do reálných hodnot
-    data_x = x_min + (xs / img.shape[1]) * (x_max - x_min)
-    data_y = y_max - (ys / img.shape[0]) * (y_max - y_min)
-    # Pokud je osa y obrácená, můžete upravit podle potřeby
+def plot_spectra(img, spectra):
+    """
+    Vykreslí jedno nebo více extrahovaných spekter do jedné matplotlib figure.
+
+    Parameters:
+        img (ndarray): Původní obrázek (pro poměr stran).
+        spectra (list of tuple): Seznam dvojic (data_x, data_y).
+    """
+    import matplotlib.pyplot as plt
 
     # Výpočet figsize pro zachování poměru stran
     figsize = calculate_figsize(img)
@@ -139,7 +290,11 @@ def extract_and_plot_contour(img, main_contour, x_min, x_max, y_min, y_max):
     plt.figure(figsize=figsize)
 
     # Vykreslení dat
-    plt.plot(data_x, data_y, linestyle='-', color='b', label='Spektrum')
+    if len(spectra) == 1:
+        plt.plot(spectra[0][0], spectra[0][1], linestyle='-', color='b', label='Spektrum')
+    else:
+        for i, (data_x, data_y) in enumerate(spectra, start=1):
+            plt.plot(data_x, data_y, linestyle='-', label=f'Spektrum {i}')
 
     # Přidání názvu a popisků os
     plt.title('Extrahovaný Graf Spektra')
@@ -152,6 +307,28 @@ def extract_and_plot_contour(img, main_contour, x_min, x_max, y_min, y_max):
     # Přidání legendy
     plt.legend()
 
+
+def extract_and_plot_contour(img, main_contour, x_min, x_max, y_min, y_max, instr=None):
+    """
+    Extrahuje souřadnice kontury, transformuje je do reálných hodnot a vykreslí graf spektra.
+
+    Parameters:
+        img (ndarray): Původní obrázek.
+        main_contour (ndarray): Kontura s největší délkou.
+        x_min (float): Minimální hodnota na ose x.
+        x_max (float): Maximální hodnota na ose x.
+        y_min (float): Minimální hodnota na ose y.
+        y_max (float): Maximální hodnota na ose y.
+        instr (Instrumentation, optional): Měření kroků calibrate a plot.
+    """
+    with maybe_stage(instr, 'calibrate'):
+        # Transformace z pixelů do reálných hodnot
+        data_x, data_y = calibrate_center_line(main_contour, img.shape, x_min, x_max, y_min, y_max)
+        # Pokud je osa y obrácená, můžete upravit podle potřeby
+
+    with maybe_stage(instr, 'plot'):
+        plot_spectrum(img, data_x, data_y)
+
     # Zobrazení grafu
     # plt.show()
 
@@ -162,6 +339,9 @@ def main(sample_name):
     """
     Hlavní funkce programu. Definuje název obrázku, zavolá předzpracování a následné zpracování.
     """
+    import matplotlib.pyplot as plt
+    import matplotlib.image as mpimg
+
     # Definujte název obrázku
     sample_name2 = f'{sample_name}'  # Změňte na skutečný název obrázku
 
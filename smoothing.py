@@ -0,0 +1,133 @@
+# smoothing.py
+"""
+Vyhlazení extrahovaného spektra před detekcí peaků.
+
+Středová linka nese schodovitý šum z kvantování na pixely a z antialiasingu,
+na kterém find_peaks hlásí falešné peaky. Metody:
+    'savgol'   Savitzky–Golay (zachovává výšku a polohu peaků)
+    'median'   klouzavý medián (odstraní ojedinělé výkyvy)
+    'spline'   kubický spline středy vodorovných úseků schodů (odstraní kvantování na pixely)
+
+Šířka okna se zadává v jednotkách osy x (vlnočty) a převádí se na počet bodů podle
+kalibrace. Detekce peaků ve vyhlazeném spektru používá minimální prominenci jednoho
+pixelu (pixel_quantum), aby zvlnění v místě schodů nehlásila jako peaky. Dlouhá spektra se zpracují po blocích s překryvem, takže paměť
+nezávisí na délce spektra; Savitzky–Golay a medián dají po blocích přesně
+stejný výsledek jako najednou.
+"""
+import numpy as np
+from scipy.interpolate import CubicSpline
+from scipy.ndimage import median_filter
+from scipy.signal import oaconvolve, savgol_coeffs, savgol_filter
+
+METHODS = ('savgol', 'median', 'spline')
+# Počet bodů zpracovaných najednou; delší spektra jdou po blocích
+CHUNK_POINTS = 2 ** 18
+# Od této délky okna se Savitzky–Golay počítá konvolucí přes FFT místo přímé konvoluce
+FFT_WINDOW = 255
+
+
+def window_points(window, data_x, minimum=3):
+    """
+    Převede šířku okna v jednotkách osy x na lichý počet bodů (alespoň `minimum`).
+    """
+    if len(data_x) < 2:
+        return minimum
+    step = np.median(np.abs(np.diff(data_x)))
+    points = int(round(abs(window) / step)) if step > 0 else minimum
+    points = max(points, minimum)
+    return points if points % 2 else points + 1
+
+
+def pixel_quantum(limits, height):
+    """
+    Výška jednoho pixelu v jednotkách osy y. Vyhlazení mění schody linky v drobná
+    zvlnění; maxima s prominencí pod touto hodnotou nejsou skutečné peaky.
+    """
+    _, _, y_min, y_max = limits
+    return abs(y_max - y_min) / max(1, height)
+
+
+def chunked(func, n, halo, chunk=CHUNK_POINTS):
+    """
+    Spočítá výsledek délky `n` po blocích délky `chunk`: func(lo, hi) dostane rozsah bloku
+    rozšířený o `halo` bodů na každé straně a z výsledku se použije jen střed. Pro filtry
+    s dosahem nejvýše `halo` je výsledek stejný jako func(0, n).
+    """
+    if n <= chunk + 2 * halo:
+        return func(0, n)
+    out = np.empty(n, dtype=float)
+    for start in range(0, n, chunk):
+        stop = min(n, start + chunk)
+        lo, hi = max(0, start - halo), min(n, stop + halo)
+        out[start:stop] = func(lo, hi)[start - lo:stop - lo]
+    return out
+
+
+def _savgol(y, points, order):
+    if points < FFT_WINDOW or len(y) < 2 * points:
+        return savgol_filter(y, points, order, mode='interp')
+    # Vnitřek konvolucí přes FFT (overlap-add), okraje polynomem jako mode='interp'
+    out = oaconvolve(y, savgol_coeffs(points, order), mode='same')
+    half = points // 2
+    out[:half] = savgol_filter(y[:points], points, order, mode='interp')[:half]
+    out[-half:] = savgol_filter(y[-points:], points, order, mode='interp')[-half:]
+    return out
+
+
+def _spline(x, y):
+    """
+    Linka složená z pixelů je schodovitá: skutečná křivka prochází středy vodorovných
+    úseků, ne jejich konci. Úseky se stejnou hodnotou se nahradí jejich středem
+    a těmi se proloží kubický spline.
+    """
+    order = np.argsort(x, kind='stable')
+    xs, ys = x[order], y[order]
+    starts = np.concatenate([[0], np.flatnonzero((np.diff(ys) != 0) | (np.diff(xs) <= 0)) + 1])
+    ends = np.concatenate([starts[1:], [len(ys)]]) - 1
+    centers = (xs[starts] + xs[ends]) / 2
+    levels = ys[starts]
+    keep = np.concatenate([[True], np.diff(centers) > 0])
+    centers, levels = centers[keep], levels[keep]
+    out = np.empty_like(ys)
+    if len(centers) < 4:
+        out[order] = np.interp(xs, centers, levels)
+        return out
+    # Za krajními středy se neextrapoluje
+    out[order] = CubicSpline(centers, levels)(np.clip(xs, centers[0], centers[-1]))
+    return out
+
+
+def smooth(data_x, data_y, method='savgol', window=None, polyorder=2, chunk=CHUNK_POINTS):
+    """
+    Vyhladí spektrum.
+
+    Parameters:
+        data_x (ndarray): Hodnoty osy x (vlnočty), stejnoměrně vzorkované.
+        data_y (ndarray): Intenzity.
+        method (str): 'savgol', 'median' nebo 'spline'.
+        window (float, optional): Šířka okna v jednotkách osy x pro 'savgol' a 'median'
+            (výchozí je 7 bodů); 'spline' okno nepotřebuje.
+        polyorder (int): Řád polynomu Savitzky–Golay.
+        chunk (int): Velikost bloku pro dlouhá spektra.
+
+    Returns:
+        ndarray: Vyhlazené intenzity (float64, stejná délka jako data_y).
+    """
+    data_x = np.asarray(data_x, dtype=float)
+    data_y = np.asarray(data_y, dtype=float)
+    if method not in METHODS:
+        raise ValueError(f"Neznámá metoda vyhlazení '{method}', povolené jsou {', '.join(METHODS)}.")
+    points = window_points(window, data_x) if window else 7
+    if len(data_y) < 3:
+        return data_y.copy()
+
+    if method == 'savgol':
+        points = min(points, len(data_y) - (1 - len(data_y) % 2))
+        order = min(polyorder, points - 1)
+        return chunked(lambda lo, hi: _savgol(data_y[lo:hi], points, order), len(data_y), points, chunk)
+    if method == 'median':
+        return chunked(lambda lo, hi: median_filter(data_y[lo:hi], size=points, mode='nearest'),
+                       len(data_y), points // 2, chunk)
+
+    # Spline se po blocích počítá jen přibližně (okraje bloků se zahodí), proto širší překryv
+    return chunked(lambda lo, hi: _spline(data_x[lo:hi], data_y[lo:hi]), len(data_y), 256, chunk)
@@ -0,0 +1,238 @@
+# spectrum.py
+"""
+Datové typy pro digitalizovaná spektra.
+
+Spectrum       jedno spektrum: x, y (float32), jednotky, kalibrace, původ a peaky
+SpectrumSet    mnoho spekter na společné ose x v jednom souvislém 2-D poli (spektra x body)
+
+Dávkové operace SpectrumSet (resample, baseline, normalize, detect_peaks) pracují
+s celým polem najednou – bez smyčky v Pythonu přes spektra a bez alokace pro každé
+spektrum zvlášť, takže zvládnou tisíce spekter. set[i] vrací Spectrum, jehož y je
+jen pohled do sdíleného pole.
+"""
+import numpy as np
+from scipy.ndimage import maximum_filter1d
+
+DTYPE = np.float32
+X_UNIT = 'cm⁻¹'
+Y_UNIT = 'a.u.'
+NORMALIZE_METHODS = ('max', 'minmax', 'area', 'snv')
+
+
+class Spectrum:
+    """
+    Jedno spektrum.
+
+    Parameters:
+        x, y (array): Hodnoty osy x a intenzity (převedou se na float32).
+        x_unit, y_unit (str): Jednotky os.
+        calibration (dict, optional): Kalibrace, ze které spektrum vzniklo (meze os, vyhlazení…).
+        source (dict, optional): Původ (cesta k obrázku, ořez, cluster…).
+        peaks (array, optional): Indexy peaků do y.
+    """
+    __slots__ = ('x', 'y', 'x_unit', 'y_unit', 'calibration', 'source', 'peaks')
+
+    def __init__(self, x, y, x_unit=X_UNIT, y_unit=Y_UNIT, calibration=None, source=None, peaks=None):
+        self.x = np.asarray(x, dtype=DTYPE)
+        self.y = np.asarray(y, dtype=DTYPE)
+        if self.x.shape != self.y.shape or self.x.ndim != 1:
+            raise ValueError("x a y musí být 1-D pole stejné délky.")
+        self.x_unit = x_unit
+        self.y_unit = y_unit
+        self.calibration = calibration or {}
+        self.source = source or {}
+        self.peaks = None if peaks is None else np.asarray(peaks, dtype=np.intp)
+
+    def __len__(self):
+        return len(self.x)
+
+    def __repr__(self):
+        return f"Spectrum({len(self)} bodů, {self.x_unit}, peaků {0 if self.peaks is None else len(self.peaks)})"
+
+    def ascending(self):
+        """Spektrum s rostoucí osou x (osa Ramanových spekter bývá obrácená); jinak self."""
+        if len(self) < 2 or self.x[0] <= self.x[-1]:
+            return self
+        peaks = None if self.peaks is None else np.sort(len(self) - 1 - self.peaks)
+        return Spectrum(self.x[::-1], self.y[::-1], self.x_unit, self.y_unit, self.calibration, self.source, peaks)
+
+    def detect_peaks(self, sensitivity, min_distance, prominence=None):
+        """Najde peaky (find_peaks.detect_peaks), uloží je do `peaks` a vrátí je."""
+        from find_peaks import detect_peaks
+        self.peaks, _ = detect_peaks(self.y, sensitivity, min_distance, prominence)
+        return self.peaks
+
+
+class SpectrumSet:
+    """
+    Spektra na společné (rostoucí) ose x ve sdíleném poli `data` tvaru (spektra, body).
+
+    Použití:
+        spectra = SpectrumSet.from_spectra([Spectrum(x1, y1), Spectrum(x2, y2)], points=2000)
+        corrected = spectra.subtract_baseline().normalize('area')
+        rows, columns = corrected.detect_peaks(height=0.1, distance=10)
+    """
+    __slots__ = ('x', 'data', 'x_unit', 'y_unit', 'calibrations', 'sources', 'peaks')
+
+    def __init__(self, x, data, x_unit=X_UNIT, y_unit=Y_UNIT, calibrations=None, sources=None, peaks=None):
+        self.x = np.ascontiguousarray(x, dtype=DTYPE)
+        self.data = np.ascontiguousarray(data, dtype=DTYPE)
+        if self.data.ndim != 2 or self.data.shape[1] != len(self.x):
+            raise ValueError("data musí mít tvar (počet spekter, len(x)).")
+        if len(self.x) > 1 and np.any(np.diff(self.x) <= 0):
+            raise ValueError("Osa x sady spekter musí být rostoucí.")
+        self.x_unit = x_unit
+        self.y_unit = y_unit
+        count = len(self.data)
+        self.calibrations = list(calibrations) if calibrations is not None else [{} for _ in range(count)]
+        self.sources = list(sources) if sources is not None else [{} for _ in range(count)]
+        # Peaky celé sady jako dvojice polí (řádky, sloupce), viz detect_peaks
+        self.peaks = peaks
+
+    @classmethod
+    def from_spectra(cls, spectra, x=None, points=None):
+        """
+        Převzorkuje spektra na společnou osu x a uloží je do jednoho pole.
+
+        Parameters:
+            spectra (list of Spectrum): Vstupní spektra (mohou mít různé délky i směr osy).
+            x (array, optional): Cílová osa x; body mimo rozsah spektra jsou NaN.
+            points (int, optional): Bez `x` počet bodů rovnoměrné osy přes společný rozsah
+                všech spekter (výchozí je délka nejdelšího spektra).
+
+        Returns:
+            SpectrumSet
+        """
+        spectra = [s.ascending() for s in spectra]
+        if not spectra:
+            raise ValueError("Sada spekter je prázdná.")
+        if x is None:
+            lo = max(float(s.x[0]) for s in spectra)
+            hi = min(float(s.x[-1]) for s in spectra)
+            if not hi > lo:
+                raise ValueError("Spektra nemají společný rozsah osy x.")
+            x = np.linspace(lo, hi, points or max(len(s) for s in spectra))
+        x = np.asarray(x, dtype=DTYPE)
+        data = np.empty((len(spectra), len(x)), dtype=DTYPE)
+        # Jediná smyčka přes spektra: každé má vlastní osu x, takže se řádky plní jednotlivě
+        for row, s in zip(data, spectra):
+            row[:] = np.interp(x, s.x, s.y, left=np.nan, right=np.nan)
+        return cls(x, data, spectra[0].x_unit, spectra[0].y_unit,
+                   [s.calibration for s in spectra], [s.source for s in spectra])
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        """Spektrum `index` (y je pohled do sdíleného pole, nic se nekopíruje)."""
+        return Spectrum(self.x, self.data[index], self.x_unit, self.y_unit,
+                        self.calibrations[index], self.sources[index], self.peaks_of(index))
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __repr__(self):
+        return f"SpectrumSet({len(self)} spekter x {len(self.x)} bodů, {self.x_unit})"
+
+    def _derived(self, data, x=None):
+        return SpectrumSet(self.x if x is None else x, data, self.x_unit, self.y_unit, self.calibrations, self.sources)
+
+    def resample(self, x):
+        """
+        Lineární převzorkování všech spekter na novou osu `x` najednou; body mimo rozsah jsou NaN.
+        """
+        x = np.asarray(x, dtype=DTYPE)
+        right = np.clip(np.searchsorted(self.x, x, side='right'), 1, len(self.x) - 1)
+        left = right - 1
+        t = (x - self.x[left]) / (self.x[right] - self.x[left])
+        out = np.take(self.data, left, axis=1)
+        out *= 1 - t
+        out += np.take(self.data, right, axis=1) * t
+        out[:, (x < self.x[0]) | (x > self.x[-1])] = np.nan
+        return self._derived(out, x)
+
+    def baseline(self, degree=3, iterations=20):
+        """
+        Pozadí všech spekter iterativním polynomem (modifikovaná polynomiální regrese):
+        polynom se opakovaně prokládá spektrem oříznutým shora předchozím proložením,
+        takže peaky postupně přestanou polynom táhnout nahoru.
+
+        Všechna spektra se prokládají najednou jedním maticovým součinem s pseudoinverzí
+        Vandermondovy matice.
+
+        Returns:
+            ndarray: Pozadí tvaru data.shape.
+        """
+        # Osa škálovaná na <-1, 1> kvůli podmíněnosti Vandermondovy matice
+        span = float(self.x[-1] - self.x[0]) or 1.0
+        t = (2 * (self.x - self.x[0]) / span - 1).astype(np.float64)
+        vander = np.vander(t, degree + 1).astype(DTYPE)
+        projector = np.linalg.pinv(vander.astype(np.float64)).astype(DTYPE)  # (degree+1, body)
+        work = self.data.copy()
+        fit = np.empty_like(work)
+        for _ in range(iterations):
+            np.matmul(work @ projector.T, vander.T, out=fit)
+            np.minimum(work, fit, out=work)
+        return fit
+
+    def subtract_baseline(self, degree=3, iterations=20):
+        """Spektra s odečteným pozadím (viz baseline)."""
+        out = self.baseline(degree, iterations)
+        np.subtract(self.data, out, out=out)
+        return self._derived(out)
+
+    def normalize(self, method='max'):
+        """
+        Normalizace všech spekter najednou.
+
+        Parameters:
+            method (str): 'max' (maximum = 1), 'minmax' (rozsah 0–1), 'area' (plocha = 1)
+                nebo 'snv' (nulový průměr, jednotkový rozptyl).
+        """
+        if method not in NORMALIZE_METHODS:
+            raise ValueError(f"Neznámá normalizace '{method}', povolené jsou {', '.join(NORMALIZE_METHODS)}.")
+        out = self.data.copy()
+        if method == 'max':
+            scale = np.nanmax(np.abs(out), axis=1, keepdims=True)
+        elif method == 'minmax':
+            out -= np.nanmin(out, axis=1, keepdims=True)
+            scale = np.nanmax(out, axis=1, keepdims=True)
+        elif method == 'area':
+            step = np.diff(self.x)
+            scale = np.abs(np.nansum((out[:, 1:] + out[:, :-1]) * step, axis=1, keepdims=True) / 2)
+        else:
+            out -= np.nanmean(out, axis=1, keepdims=True)
+            scale = np.nanstd(out, axis=1, keepdims=True)
+        scale[scale == 0] = 1
+        out /= scale
+        return self._derived(out)
+
+    def detect_peaks(self, height=None, distance=1):
+        """
+        Peaky všech spekter najednou: lokální maxima nad prahem `height`, která jsou
+        zároveň maximem v okolí ±`distance` bodů.
+
+        Výběr podle vzdálenosti je oknem (maximum filtr), ne hladovým výběrem jako
+        ve find_peaks: ze dvou blízkých peaků zůstane vyšší, na plošině její levý okraj.
+
+        Returns:
+            tuple: (řádky, sloupce) – index spektra a index bodu každého peaku; uloží se do `peaks`.
+        """
+        data = self.data
+        inner = data[:, 1:-1]
+        mask = (inner > data[:, :-2]) & (inner >= data[:, 2:])
+        if height is not None:
+            mask &= inner >= height
+        if distance > 1:
+            mask &= inner >= maximum_filter1d(data, 2 * int(distance) + 1, axis=1, mode='nearest')[:, 1:-1]
+        rows, columns = np.nonzero(mask)
+        self.peaks = (rows, columns + 1)
+        return self.peaks
+
+    def peaks_of(self, index):
+        """Indexy peaků spektra `index` z posledního detect_peaks."""
+        if self.peaks is None:
+            return None
+        rows, columns = self.peaks
+        lo, hi = np.searchsorted(rows, [index, index + 1])
+        return columns[lo:hi]
@@ -0,0 +1,88 @@
+# stitching.py
+"""
+Spojení přerušené křivky (čárkované úseky, překryv textem, příliš mnoho clusterů)
+z mnoha fragmentů kontur do jedné křivky monotónní v x.
+
+Konce fragmentů se indexují v KD-stromu, takže hledání navazujících fragmentů
+stojí O(n log n) i pro tisíce malých fragmentů.
+"""
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+
+def fragment_center_lines(contours):
+    """
+    Pro všechny kontury najednou spočítá středové linky (průměr y v každém integer sloupci x).
+
+    Returns:
+        list of ndarray: Pro každou konturu pole (M, 2) s (y, x), seřazené podle x.
+    """
+    lengths = np.array([len(c) for c in contours])
+    points = np.concatenate(contours)
+    fragment = np.repeat(np.arange(len(contours)), lengths)
+    x_int = np.rint(points[:, 1]).astype(np.int64)
+
+    # Jedna skupina = (fragment, sloupec); np.unique vrací skupiny seřazené podle fragmentu a x
+    width = x_int.max() + 1
+    keys, inverse, counts = np.unique(fragment * width + x_int, return_inverse=True, return_counts=True)
+    y_mean = np.bincount(inverse, weights=points[:, 0]) / counts
+    frag_of_key = keys // width
+    splits = np.flatnonzero(np.diff(frag_of_key)) + 1
+    lines = np.column_stack([y_mean, (keys % width).astype(float)])
+    return np.split(lines, splits)
+
+
+def stitch_contours(contours, tolerance):
+    """
+    Spojí fragmenty kontur do jedné křivky monotónní v x.
+
+    Konce všech fragmentů (nejlevější a nejpravější bod středové linky) se vloží
+    do KD-stromu a fragmenty, jejichž konce leží do vzdálenosti `tolerance`,
+    se spojí do skupin. Vybere se skupina pokrývající nejvíce sloupců; její body
+    se zprůměrují po sloupcích (stejně jako v contours_to_center_line) a mezery
+    mezi fragmenty se doplní lineární interpolací.
+
+    Parameters:
+        contours (list of ndarray): Kontury z find_contours, každá Nx2 (y, x).
+        tolerance (float): Maximální vzdálenost navazujících konců v pixelech.
+
+    Returns:
+        center_line (ndarray): Pole (M, 2) s (y, x) pro každý integer sloupec od začátku do konce křivky.
+    """
+    if not contours:
+        raise ValueError("Nebyla nalezena žádná kontura v obrázku.")
+    lines = fragment_center_lines(contours)
+    n = len(lines)
+    # Body 0..n-1 jsou levé konce, n..2n-1 pravé konce fragmentů
+    endpoints = np.array([line[0] for line in lines] + [line[-1] for line in lines])
+    pairs = cKDTree(endpoints).query_pairs(tolerance, output_type='ndarray') % n
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+    _, group = connected_components(graph, directed=False)
+
+    # Skupina s největším počtem pokrytých sloupců
+    lengths = np.array([len(line) for line in lines])
+    points = np.concatenate(lines)
+    point_group = np.repeat(group, lengths)
+    xs = points[:, 1].astype(np.int64)
+    x0 = xs.min()
+    width = xs.max() - x0 + 1
+    covered = np.zeros((group.max() + 1, width), dtype=bool)
+    covered[point_group, xs - x0] = True
+    best = np.argmax(covered.sum(axis=1))
+
+    # Sloučení bodů skupiny: průměr y ve sloupci, chybějící sloupce doplníme interpolací
+    selected = point_group == best
+    cols = xs[selected] - x0
+    counts = np.bincount(cols, minlength=width)
+    sums = np.bincount(cols, weights=points[selected, 0], minlength=width)
+    present = np.flatnonzero(counts)
+    all_x = np.arange(present[0], present[-1] + 1)
+    y = np.interp(all_x, present, sums[present] / counts[present])
+    return np.column_stack([y, (all_x + x0).astype(float)])
+
+
+def default_tolerance(shape):
+    """Výchozí tolerance spojování: 2 % šířky obrázku, alespoň 10 px."""
+    return max(10.0, 0.02 * shape[1])
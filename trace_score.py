@@ -0,0 +1,90 @@
+# trace_score.py
+"""
+Hodnocení clusterů jako kandidátů na křivku spektra.
+
+Skóre se počítá z vlastností, které má křivka spektra a nemá pozadí, mřížka ani text:
+
+    coverage   podíl sloupců obrázku, ve kterých cluster něco má (spektrum jde přes celou šířku)
+    single     podíl sloupců s pixely clusteru, kde je jen jeden svislý úsek (funkce y(x))
+    length     nejdelší souvislý úsek obsazených sloupců vůči šířce (křivka není přerušovaná)
+    thin       1 - průměrná výška pixelů clusteru ve sloupci vůči výšce obrázku (pozadí je „tlusté“)
+
+Skóre je součin všech čtyř (0–1). Vše jsou vektorizované součty po sloupcích nad maskou
+zmenšenou na nejvýše SCORE_PIXELS pixelů; kontury se nesestavují (skimage je skládá
+v čistém Pythonu a na zašuměné masce to trvá desítky sekund). Náhledová středová linka
+je průměr řádků ve sloupci (simple_line.mask_to_center_line).
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from pyramid import downsample, preview_factor
+from simple_line import mask_to_center_line, remove_small_components
+
+CRITERIA = ('coverage', 'single', 'length', 'thin')
+# Maska se pro hodnocení zmenší (blok je obsazený, má-li aspoň jeden pixel clusteru)
+SCORE_PIXELS = 250_000
+# Skvrny menší než tento počet pixelů zmenšené masky se ignorují
+MIN_COMPONENT = 8
+
+
+def _longest_run(occupied):
+    """Délka nejdelšího souvislého úseku True."""
+    edges = np.diff(np.concatenate([[0], occupied.view(np.int8), [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    return int((ends - starts).max()) if len(starts) else 0
+
+
+def score_mask(mask):
+    """
+    Parameters:
+        mask (ndarray): Maska clusteru (H, W), True = pixel clusteru.
+
+    Returns:
+        dict: 'score', hodnoty CRITERIA a 'center_line' ((M, 2) s (y, x) v pixelech masky, nebo None).
+    """
+    result = {'score': 0.0, 'center_line': None, **{name: 0.0 for name in CRITERIA}}
+    factor = preview_factor(mask.shape, SCORE_PIXELS)
+    # Minimum negace = „žádný pixel clusteru v bloku“, takže blok zůstane obsazený i kvůli jedinému pixelu
+    small = remove_small_components(~downsample(~mask, factor), MIN_COMPONENT)
+    height, width = small.shape
+    per_column = small.sum(axis=0)
+    occupied = per_column > 0
+    if not occupied.any():
+        return result
+    # Počet svislých úseků ve sloupci = počet začátků (pixel clusteru, nad ním ne)
+    starts = small.copy()
+    starts[1:] &= ~small[:-1]
+    runs = starts.sum(axis=0)
+    result['coverage'] = float(occupied.mean())
+    result['single'] = float(np.mean(runs[occupied] == 1))
+    result['length'] = _longest_run(occupied) / width
+    result['thin'] = float(1.0 - per_column[occupied].mean() / height)
+    # Středy bloků v pixelech původní masky
+    result['center_line'] = mask_to_center_line(small) * factor + (factor - 1) / 2
+    result['score'] = float(np.prod([result[name] for name in CRITERIA]))
+    return result
+
+
+def score_clusters(labels, k, workers=1):
+    """
+    Ohodnotí všechny clustery mapy labelů na pozadí (GUI mezitím nečeká).
+
+    Returns:
+        list of Future: Pro každý cluster 0..k-1 future s výsledkem score_mask (pořadí podle clusteru).
+            Volající si výsledky vyzvedává postupně (např. GUI časovačem); nepotřebné futures
+            zruší (Future.cancel), čekající clustery se pak nehodnotí.
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(lambda n=n: score_mask(labels == n)) for n in range(k)]
+    # Executor se ukončí po doběhnutí úloh, futures zůstanou platné
+    executor.shutdown(wait=False)
+    return futures
+
+
+def best_cluster(scores):
+    """Index clusteru s nejvyšším skóre (None, pokud žádný nemá kladné skóre)."""
+    values = [s['score'] if s is not None else 0.0 for s in scores]
+    if not values or max(values) <= 0:
+        return None
+    return int(np.argmax(values))
@@ -0,0 +1,269 @@
+# watch_folder.py
+"""
+Režim sledování složky: nové obrázky spekter se průběžně digitalizují.
+
+Složka se periodicky prochází (polling, funguje na libovolném souborovém systému
+včetně síťových), nové soubory se po ustálení velikosti zařadí do omezené fronty
+a zpracují v pracovních procesech řetězcem preprocess_image_from_array ->
+kalibrace -> detekce peaků. Výsledky se zapíší vedle obrázku:
+    <název>_spectrum.csv   extrahované spektrum (x, y)
+    <název>_peaks.csv      nalezené peaky (x, y)
+
+Již zpracované soubory se přeskočí podle hashe obsahu (stav je v souboru
+.pictograph_watch.json ve sledované složce), takže přejmenovaná nebo znovu
+nahraná kopie se nezpracuje dvakrát.
+
+Použití:
+    python watch_folder.py SLOŽKA --limits 4000 0 0 100
+    python watch_folder.py SLOŽKA --x-ticks 4000 0 --y-ticks 100 0     # kalibrace z os
+"""
+import argparse
+import collections
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import default_workers
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+STATE_FILE = '.pictograph_watch.json'
+
+
+def file_digest(path, chunk_size=2 ** 20):
+    """Hash obsahu souboru (blake2b)."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_xy_csv(path, x, y):
+    with open(path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["x", "y"])
+        for xi, yi in zip(x, y):
+            writer.writerow([xi, yi])
+
+
+def process_file(path, limits=None, x_ticks=None, y_ticks=None, stitch=False, sensitivity=10.0, min_distance=10,
+                 smoothing=None):
+    """
+    Zpracuje jeden obrázek a zapíše výsledky vedle něj (běží v pracovním procesu).
+
+    Parameters:
+        path (str): Cesta k obrázku.
+        limits (tuple, optional): (x_min, x_max, y_min, y_max) pro obrázek, který je už oříznutý na graf.
+        x_ticks, y_ticks (sequence, optional): Hodnoty značek os pro automatickou kalibraci
+            (viz axis_detection.auto_calibrate); mají přednost před `limits`.
+        stitch (bool): Spojit přerušenou křivku.
+        sensitivity (float): Práh výšky peaku.
+        min_distance (int): Minimální vzdálenost peaků v bodech.
+        smoothing (tuple, optional): (metoda, okno v jednotkách osy x), viz smoothing.smooth.
+
+    Returns:
+        dict: 'points', 'peaks' a cesty k zapsaným souborům.
+    """
+    from core import digitize
+    from image_cache import decode_image
+
+    img = decode_image(path)
+    if x_ticks is not None and y_ticks is not None:
+        from axis_detection import auto_calibrate
+
+        _, calibration = auto_calibrate(img, x_ticks, y_ticks)
+        x, y, w, h = calibration['crop']
+        img = img[y:y + h, x:x + w]
+        limits = (calibration['x_min'], calibration['x_max'], calibration['y_min'], calibration['y_max'])
+    if limits is None:
+        raise ValueError("Chybí meze os nebo hodnoty značek pro kalibraci.")
+
+    result = digitize(img, limits, stitch=stitch, peak_params=(sensitivity, min_distance), smoothing=smoothing)
+    data_x, data_y = result['spectra'][0]
+    peaks = result['peaks'][0]
+
+    stem = os.path.splitext(path)[0]
+    spectrum_path = stem + '_spectrum.csv'
+    peaks_path = stem + '_peaks.csv'
+    write_xy_csv(spectrum_path, data_x, data_y)
+    write_xy_csv(peaks_path, data_x[peaks], data_y[peaks])
+    return {'points': len(data_x), 'peaks': len(peaks), 'spectrum': spectrum_path, 'peaks_csv': peaks_path}
+
+
+class FolderWatcher:
+    """
+    Sleduje složku a zpracovává nové obrázky.
+
+    Nové soubory prochází třemi stavy: čekají na ustálení velikosti (mohou se ještě zapisovat),
+    pak jsou v omezené frontě (max_queue), nakonec se zpracovávají (nejvýše `workers` naráz).
+    Když je fronta plná, další soubory se jen nezaregistrují a vezmou se při některém
+    z příštích průchodů – nárazový příval souborů tak nezvyšuje paměť.
+    """
+
+    def __init__(self, folder, interval=2.0, workers=None, max_queue=64, **options):
+        self.folder = folder
+        self.interval = interval
+        self.workers = workers or default_workers()
+        self.max_queue = max_queue
+        self.options = options  # argumenty process_file
+        self.state_path = os.path.join(folder, STATE_FILE)
+        self.processed = self._load_state()  # hash obsahu -> záznam
+        self.settling = {}  # cesta -> (velikost, mtime) z minulého průchodu, soubor čeká na ustálení
+        self.finished = {}  # cesta -> (velikost, mtime) vyřízeného souboru; změněný soubor se projde znovu
+        self.queue = collections.deque()  # (cesta, (velikost, mtime))
+        self.queued = set()
+        self.running = {}  # Future -> (cesta, (velikost, mtime), hash)
+        self.executor = None
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Stav sledování se nepodařilo načíst, začínám znovu: {e}")
+            return {}
+
+    def _save_state(self):
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.processed, f, indent=1)
+        os.replace(tmp, self.state_path)
+
+    def scan(self):
+        """Projde složku a zařadí ustálené nové soubory do fronty."""
+        busy = self.queued | {path for path, _, _ in self.running.values()}
+        present = set()
+        for entry in sorted(os.scandir(self.folder), key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            present.add(entry.path)
+            if entry.path in busy:
+                continue
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self.finished.get(entry.path) == signature:
+                continue
+            # Soubor se zařadí, až se mezi dvěma průchody nezmění (dopsaný soubor)
+            if self.settling.get(entry.path) != signature:
+                self.settling[entry.path] = signature
+                continue
+            if len(self.queue) >= self.max_queue:
+                continue
+            del self.settling[entry.path]
+            self.queue.append((entry.path, signature))
+            self.queued.add(entry.path)
+        # Smazané soubory
+        for path in list(self.settling):
+            if path not in present:
+                del self.settling[path]
+
+    def dispatch(self):
+        """Odešle soubory z fronty ke zpracování; již zpracovaný obsah přeskočí."""
+        while self.queue and len(self.running) < self.workers:
+            path, signature = self.queue.popleft()
+            self.queued.discard(path)
+            try:
+                digest = file_digest(path)
+            except OSError:
+                # Soubor mezitím zmizel
+                continue
+            running_digests = {d: p for p, _, d in self.running.values()}
+            if digest in self.processed or digest in running_digests:
+                original = self.processed[digest]['source'] if digest in self.processed \
+                    else os.path.basename(running_digests[digest])
+                if original != os.path.basename(path):
+                    print(f"{os.path.basename(path)}: stejný obsah jako {original}, přeskočeno")
+                self.finished[path] = signature
+                continue
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            future = self.executor.submit(process_file, path, **self.options)
+            self.running[future] = (path, signature, digest)
+
+    def collect(self):
+        """Vyzvedne dokončené úlohy a zapíše je do stavu."""
+        done = [future for future in self.running if future.done()]
+        for future in done:
+            path, signature, digest = self.running.pop(future)
+            name = os.path.basename(path)
+            record = {'source': name, 'time': time.time()}
+            try:
+                result = future.result()
+                record.update(points=result['points'], peaks=result['peaks'])
+                print(f"{name}: {result['points']} bodů, {result['peaks']} peaků -> {os.path.basename(result['spectrum'])}")
+            except Exception as e:
+                # Chybný soubor se také zapamatuje, aby se nezpracovával stále dokola
+                record['error'] = str(e)
+                print(f"{name}: chyba při zpracování: {e}")
+            self.processed[digest] = record
+            self.finished[path] = signature
+        if done:
+            self._save_state()
+
+    def step(self):
+        """Jeden průchod: vyzvednutí výsledků, sken složky a odeslání práce."""
+        self.collect()
+        self.scan()
+        self.dispatch()
+
+    def idle(self):
+        return not self.queue and not self.running
+
+    def run(self, once=False):
+        """
+        Sleduje složku do přerušení (Ctrl+C). S `once=True` zpracuje jen soubory, které
+        ve složce už jsou, a skončí.
+        """
+        print(f"Sleduji složku {self.folder} (interval {self.interval} s, procesů {self.workers}).")
+        try:
+            while True:
+                self.step()
+                if once and self.idle() and not self.settling:
+                    break
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            print("Sledování ukončeno.")
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+            self.collect()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Průběžná digitalizace obrázků spekter ve sledované složce.")
+    parser.add_argument('folder', help="Sledovaná složka.")
+    parser.add_argument('--limits', type=float, nargs=4, metavar=('XLEFT', 'XRIGHT', 'YMIN', 'YMAX'),
+                        help="Meze os pro obrázky oříznuté přesně na graf.")
+    parser.add_argument('--x-ticks', type=float, nargs='+',
+                        help="Hodnoty značek osy X zleva doprava (všechny, nebo první a poslední) – kalibrace z os.")
+    parser.add_argument('--y-ticks', type=float, nargs='+',
+                        help="Hodnoty značek osy Y shora dolů (všechny, nebo první a poslední).")
+    parser.add_argument('--stitch', action='store_true', help="Spojit přerušenou křivku.")
+    parser.add_argument('--sensitivity', type=float, default=10.0, help="Práh výšky peaku.")
+    parser.add_argument('--min-distance', type=int, default=10, help="Minimální vzdálenost peaků v bodech.")
+    parser.add_argument('--smooth', choices=('savgol', 'median', 'spline'), help="Vyhlazení spektra před detekcí peaků.")
+    parser.add_argument('--smooth-window', type=float, help="Šířka okna vyhlazení v jednotkách osy x.")
+    parser.add_argument('--interval', type=float, default=2.0, help="Interval procházení složky v sekundách.")
+    parser.add_argument('--workers', type=int, help="Počet pracovních procesů.")
+    parser.add_argument('--queue-size', type=int, default=64, help="Maximální počet souborů čekajících ve frontě.")
+    parser.add_argument('--once', action='store_true', help="Zpracovat existující soubory a skončit.")
+    args = parser.parse_args(argv)
+
+    if args.limits is None and (args.x_ticks is None or args.y_ticks is None):
+        parser.error("zadejte --limits, nebo --x-ticks a --y-ticks")
+
+    watcher = FolderWatcher(args.folder, interval=args.interval, workers=args.workers, max_queue=args.queue_size,
+                            limits=tuple(args.limits) if args.limits else None,
+                            x_ticks=args.x_ticks, y_ticks=args.y_ticks, stitch=args.stitch,
+                            sensitivity=args.sensitivity, min_distance=args.min_distance,
+                            smoothing=(args.smooth, args.smooth_window) if args.smooth else None)
+    watcher.run(once=args.once)
+
+
+if __name__ == '__main__':
+    main()